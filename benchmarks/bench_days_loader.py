@@ -0,0 +1,115 @@
+"""Benchmark of loading days into DataFrame: ORM objects converted by convert_days_model_to_dataframe
+compared with cursor of Core select copied into numpy arrays (read_days_dataframe). Latency and peak memory
+(tracemalloc) of both paths are measured for ranges of synthetic history, for each storage of durations:
+
+    python -m benchmarks.bench_days_loader [--years 10] [--ranges 1 12 120] [--repeat 5]
+"""
+import argparse
+import gc
+import os
+import statistics
+import tempfile
+import time
+import tracemalloc
+from datetime import date, timedelta
+
+
+def convert_days_model_to_dataframe(query_output):
+    """"Converts 'Days' query output into pandas DataFrame (loader of days used before read_days_dataframe)."""
+    import pandas as pd
+
+    id = []
+    ds = []
+    dev = []
+    pol = []
+    ge = []
+    crt = []
+    hs = []
+    alk = []
+    for row in query_output:
+        id.append(row.id)
+        ds.append(row.ds)
+        dev.append(row.dev)
+        pol.append(row.pol)
+        ge.append(row.ge)
+        crt.append(row.crt)
+        hs.append(row.hs)
+        alk.append(row.alk)
+    df = pd.DataFrame(data={'id': id, 'ds': ds, 'dev': dev, 'pol': pol, 'ge': ge, 'crt': crt, 'hs': hs, 'alk': alk})
+
+    df.id = pd.to_datetime(df.id)
+    # Fill nans
+    columns_numerical = df.select_dtypes(include=['float64', 'int']).columns
+    columns_timedelta = df.select_dtypes(include=['timedelta']).columns
+    df[columns_timedelta] = df[columns_timedelta].fillna(timedelta())
+    df[columns_numerical] = df[columns_numerical].fillna(0)
+    return df
+
+
+def measure(func, repeat):
+    """Returns (median seconds, peak bytes allocated during one call) of func()."""
+    timings = []
+    for _ in range(repeat):
+        gc.collect()
+        time_start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - time_start)
+    gc.collect()
+    tracemalloc.start()
+    func()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return statistics.median(timings), peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--years', type=int, default=10)
+    parser.add_argument('--ranges', type=int, nargs='+', default=[1, 12, 120], help='Numbers of months loaded')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    import pandas as pd
+    from mymonth import create_app, db
+    from mymonth.migrations import set_initial_db
+    from mymonth.models import Days, DEFAULT_USER_ID
+    from mymonth.backup import import_data_from_excel
+    from mymonth.datasets import read_days_dataframe
+    from mymonth.utils import UtilsDatetime
+    from benchmarks.synthetic import write_workbook
+
+    last_date = UtilsDatetime(date.today()).month_last_date
+    for storage in ['datetime', 'seconds']:
+        with tempfile.TemporaryDirectory() as temp_dir:
+            app = create_app({'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(temp_dir, 'bench.db')}",
+                              'INTERVAL_STORAGE': storage})
+            with app.app_context():
+                set_initial_db()
+                import_data_from_excel(input_path=write_workbook(os.path.join(temp_dir, 'import_me.xlsx'),
+                                                                 years=args.years))
+                for months in args.ranges:
+                    first_date = (pd.Timestamp(last_date) - pd.offsets.MonthBegin(months)).date()
+
+                    def load_orm():
+                        # Session is emptied, so objects are created again (as in new request)
+                        db.session.expunge_all()
+                        return convert_days_model_to_dataframe(Days.query.filter(
+                            Days.user_id == DEFAULT_USER_ID, Days.id.between(first_date, last_date)).all())
+
+                    def load_cursor():
+                        return read_days_dataframe(first_date, last_date, DEFAULT_USER_ID)
+
+                    df_orm, df_cursor = load_orm(), load_cursor()
+                    pd.testing.assert_frame_equal(df_orm.reset_index(drop=True), df_cursor, check_dtype=False)
+                    time_orm, memory_orm = measure(load_orm, args.repeat)
+                    time_cursor, memory_cursor = measure(load_cursor, args.repeat)
+                    print(f'{storage:8} {months:4} month(s), {len(df_cursor):5} days: '
+                          f'ORM {time_orm * 1000:7.1f} ms {memory_orm / 1024:8.0f} KiB, '
+                          f'cursor {time_cursor * 1000:7.1f} ms {memory_cursor / 1024:8.0f} KiB '
+                          f'({time_orm / time_cursor:.1f}x faster, {memory_orm / memory_cursor:.1f}x less memory)')
+                db.session.remove()
+                db.get_engine(app).dispose()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+"""Benchmark of days_store on synthetic history: load of all days of a user, slices of ranges of dates (views of
+arrays) compared with query of the same days (read_days_dataframe), DataFrame of a month built from slice, totals
+of ranges from prefix sums compared with sums of days and patch of one day:
+
+    python -m benchmarks.bench_days_store [--years 10] [--repeat 200]
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+from datetime import date, timedelta
+
+
+def median_seconds(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        time_start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - time_start)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--years', type=int, default=10)
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args()
+
+    from mymonth import create_app, db, days_store
+    from mymonth.migrations import set_initial_db
+    from mymonth.models import Days, DEFAULT_USER_ID
+    from mymonth.backup import import_data_from_excel
+    from mymonth.datasets import read_days_dataframe, convert_days_columns_to_dataframe
+    from mymonth.daystore import CATEGORIES, DayColumns
+    from mymonth.utils import UtilsDatetime
+    from benchmarks.synthetic import write_workbook
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        app = create_app({'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(temp_dir, 'bench.db')}",
+                          'INTERVAL_STORAGE': 'seconds'})
+        with app.app_context():
+            set_initial_db()
+            import_data_from_excel(input_path=write_workbook(os.path.join(temp_dir, 'import_me.xlsx'),
+                                                             years=args.years))
+            time_load = median_seconds(lambda: DayColumns.load(DEFAULT_USER_ID), 5)
+            columns = days_store.columns(DEFAULT_USER_ID)
+            nb_of_bytes = sum(array.nbytes for array in [columns.ordinals, columns.seconds, columns.alk,
+                                                         columns.valid])
+            print(f'load of {len(columns)} days: {time_load * 1000:.1f} ms, {nb_of_bytes / 1024:.0f} KiB in memory')
+
+            udt = UtilsDatetime(date.today())
+            for name, first_date in [('month', udt.month_first_date),
+                                     ('year', udt.month_last_date - timedelta(days=364)),
+                                     ('all', date.min)]:
+                time_slice = median_seconds(
+                    lambda: days_store.between(DEFAULT_USER_ID, first_date, udt.month_last_date), args.repeat)
+                time_frame = median_seconds(lambda: convert_days_columns_to_dataframe(
+                    days_store.between(DEFAULT_USER_ID, first_date, udt.month_last_date)), args.repeat)
+                time_query = median_seconds(
+                    lambda: read_days_dataframe(first_date, udt.month_last_date, DEFAULT_USER_ID), 20)
+                time_totals = median_seconds(
+                    lambda: days_store.totals(DEFAULT_USER_ID, first_date, udt.month_last_date), args.repeat)
+                day_columns = days_store.between(DEFAULT_USER_ID, first_date, udt.month_last_date)
+                time_sum = median_seconds(lambda: day_columns.seconds[:, day_columns.valid].sum(axis=1), args.repeat)
+                totals = days_store.totals(DEFAULT_USER_ID, first_date, udt.month_last_date)
+                assert [totals[category] for category in CATEGORIES] == \
+                    day_columns.seconds[:, day_columns.valid].sum(axis=1).tolist()
+                print(f'{name:>5}: slice {time_slice * 1e6:7.1f} us, DataFrame from slice {time_frame * 1000:6.2f} ms, '
+                      f'query into DataFrame {time_query * 1000:6.2f} ms, totals {time_totals * 1e6:6.1f} us '
+                      f'(sum of categories of days {time_sum * 1e6:6.1f} us)')
+
+            day = Days.query.get((DEFAULT_USER_ID, date.today()))
+            time_patch = median_seconds(lambda: days_store.patch(DEFAULT_USER_ID, [day]), args.repeat)
+            # Patched copy replaced columns (not loaded again)
+            patched = days_store.columns(DEFAULT_USER_ID)
+            assert patched is not columns and patched.ordinals is columns.ordinals
+            print(f'patch of one day: {time_patch * 1e6:.1f} us')
+            db.session.remove()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+"""Benchmark of expansion of historical scores into days (mymonth.backup.transform_historical_scores_into_daily_data)
+on synthetic sheet with monthly scores since 2000-01 (months are written as '%ym%m', so at most 828 months: till 2068):
+
+    python -m benchmarks.bench_historical [--months 828] [--repeat 5]
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--months', type=int, default=828)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    import numpy as np
+    import pandas as pd
+    from mymonth import create_app, db
+    from mymonth.backup import transform_historical_scores_into_daily_data
+
+    rng = np.random.default_rng(0)
+    months = pd.date_range('2000-01-01', periods=min(args.months, 828), freq='MS')
+    df_historical_scores = pd.DataFrame({'month': months.strftime('%ym%m'),
+                                         'score': rng.random(months.size).round(4),
+                                         'day0': rng.integers(0, 12, months.size),
+                                         'ml': rng.integers(300, 650, months.size)})
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        # Target hours of days are read from calendar (tables target_schedules and target_overrides)
+        app = create_app({'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(temp_dir, 'bench.db')}"})
+        app.app_context().push()
+        db.create_all()
+        input_path = os.path.join(temp_dir, 'historical_scores.xlsx')
+        df_historical_scores.to_excel(input_path, sheet_name='historical_scores', index=False)
+
+        timings_read, timings_transform = [], []
+        for _ in range(args.repeat):
+            time_start = time.perf_counter()
+            pd.read_excel(input_path, sheet_name='historical_scores')
+            time_read = time.perf_counter()
+            df = transform_historical_scores_into_daily_data(input_path, 'historical_scores')
+            timings_read.append(time_read - time_start)
+            timings_transform.append(time.perf_counter() - time_read)
+
+    read, transform = statistics.median(timings_read), statistics.median(timings_transform)
+    print(f'{months.size} months -> {len(df)} days: transform {transform:.3f}s (median of {args.repeat}), '
+          f'of which reading sheet {read:.3f}s, expansion {transform - read:.3f}s')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,36 @@
+"""Benchmark of import from excel (mymonth.backup.import_data_from_excel) on synthetic 10-year workbook.
+Runs on temporary SQLite database:
+
+    python -m benchmarks.bench_import [--years 10] [--chunk-size 1000]
+"""
+import argparse
+import os
+import tempfile
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--years', type=int, default=10)
+    parser.add_argument('--chunk-size', type=int, default=1000)
+    args = parser.parse_args()
+
+    from mymonth import create_app
+    from mymonth.migrations import set_initial_db
+    from mymonth.backup import import_data_from_excel
+    from benchmarks.synthetic import write_workbook
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        app = create_app({'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(temp_dir, 'bench.db')}"})
+        input_path = write_workbook(os.path.join(temp_dir, 'import_me.xlsx'), years=args.years)
+        with app.app_context():
+            set_initial_db()
+            stats = import_data_from_excel(input_path=input_path, chunk_size=args.chunk_size)
+
+    print(f"Imported {stats['rows']} rows ({args.years} years) in "
+          f"{stats['seconds_read_and_convert'] + stats['seconds_write']:.2f}s: "
+          f"read and convert {stats['seconds_read_and_convert']:.2f}s, write {stats['seconds_write']:.2f}s, "
+          f"{stats['rows_per_second']:.0f} rows/s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+"""Benchmark of cold start: import of mymonth, create_app() and first requests, each run in new Python process.
+Also lists heavy modules (pandas, numpy, bokeh) loaded after create_app (should be none):
+
+    python -m benchmarks.bench_startup [--runs 5]
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+# Code run in new process (prints timings as json)
+STARTUP_SCRIPT = '''
+import json, os, sys, tempfile, time
+time_start = time.perf_counter()
+import mymonth
+time_imported = time.perf_counter()
+app = mymonth.create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'bench.db')})
+time_created = time.perf_counter()
+heavy_modules = sorted(name for name in ('pandas', 'numpy', 'bokeh', 'openpyxl') if name in sys.modules)
+from mymonth.migrations import set_initial_db
+with app.app_context():
+    set_initial_db()
+time_initialized = time.perf_counter()
+client = app.test_client()
+status = client.get('/').status_code
+time_first_request = time.perf_counter()
+client.get('/')
+time_second_request = time.perf_counter()
+print(json.dumps({'import': time_imported - time_start, 'create_app': time_created - time_imported,
+                  'set_initial_db': time_initialized - time_created,
+                  'first_request': time_first_request - time_initialized,
+                  'second_request': time_second_request - time_first_request,
+                  'status': status, 'heavy_modules_after_create_app': heavy_modules}))
+'''
+
+
+def run_once():
+    output = subprocess.run([sys.executable, '-c', STARTUP_SCRIPT], capture_output=True, text=True, check=True)
+    return json.loads(output.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    results = [run_once() for _ in range(args.runs)]
+    for phase in ['import', 'create_app', 'set_initial_db', 'first_request', 'second_request']:
+        print(f"{phase:>15}: median {statistics.median(result[phase] for result in results) * 1000:8.1f} ms")
+    print(f"Heavy modules after create_app: {results[0]['heavy_modules_after_create_app'] or 'none'}")
+    print(f"Status of first request: {results[0]['status']}")
+
+
+if __name__ == '__main__':
+    main()
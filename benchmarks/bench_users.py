@@ -0,0 +1,83 @@
+"""Benchmark of dashboard of one user while number of users grows (data of users are partitioned by user_id).
+Days of other users are generated by SQLite in temporary database (durations stored as seconds), interleaved
+by date like rows written by users day by day:
+
+    python -m benchmarks.bench_users [--users 1 100 1000] [--years 2] [--repeat 5]
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+from datetime import date
+
+# Adds days of users between :first_user_id and :last_user_id (random durations and alk)
+INSERT_DAYS_STATEMENT = """
+    INSERT INTO days (user_id, id, ds, dev, pol, ge, crt, hs, alk)
+    WITH RECURSIVE calendar(id) AS (
+        SELECT date(:start_date) UNION ALL SELECT date(id, '+1 day') FROM calendar WHERE id < date(:end_date))
+    SELECT users.id, calendar.id, abs(random()) % 7200, abs(random()) % 7200, abs(random()) % 3600,
+           abs(random()) % 3600, abs(random()) % 3600, abs(random()) % 3600, abs(random()) % 60 / 10.0
+    FROM calendar CROSS JOIN users WHERE users.id BETWEEN :first_user_id AND :last_user_id
+    ORDER BY calendar.id, users.id"""
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, nargs='+', default=[1, 100, 1000])
+    parser.add_argument('--years', type=int, default=2)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    from mymonth import create_app, db, dashboard_cache
+    from mymonth.migrations import set_initial_db
+    from mymonth.models import User, MonthlyTargets, Settings, DEFAULT_USER_ID
+    from mymonth.datasets import MonthSummaryTable
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        app = create_app({'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(temp_dir, 'bench.db')}",
+                          'INTERVAL_STORAGE': 'seconds', 'USER_HEADER': 'X-User'})
+        client = app.test_client()
+        start_date, end_date = date(date.today().year - args.years + 1, 1, 1), date.today()
+        with app.app_context():
+            set_initial_db()
+            db.session.execute('DELETE FROM days')
+            nb_of_users = 0
+            for target_nb_of_users in sorted(args.users):
+                time_start = time.perf_counter()
+                first_user_id = nb_of_users + 1
+                for user_id in range(first_user_id, target_nb_of_users + 1):
+                    if user_id != DEFAULT_USER_ID:
+                        db.session.add(User(id=user_id, name=f'user{user_id}'))
+                        db.session.add(Settings(user_id=user_id, current_month_date=end_date))
+                        db.session.add(MonthlyTargets(user_id=user_id, id=end_date.replace(day=1)))
+                db.session.flush()
+                db.session.execute(INSERT_DAYS_STATEMENT, {'start_date': start_date.isoformat(),
+                                                           'end_date': end_date.isoformat(),
+                                                           'first_user_id': first_user_id,
+                                                           'last_user_id': target_nb_of_users})
+                for user_id in range(first_user_id, target_nb_of_users + 1):
+                    MonthSummaryTable.rebuild(user_id=user_id)
+                db.session.commit()
+                nb_of_users = target_nb_of_users
+                nb_of_days = db.session.execute('SELECT COUNT(*) FROM days').scalar()
+                time_generated = time.perf_counter()
+
+                timings, timings_cached = [], []
+                for _ in range(args.repeat):
+                    dashboard_cache.clear()
+                    time_request = time.perf_counter()
+                    client.get('/', headers={'X-User': 'default'})
+                    time_first = time.perf_counter()
+                    client.get('/', headers={'X-User': 'default'})
+                    timings.append(time_first - time_request)
+                    timings_cached.append(time.perf_counter() - time_first)
+                print(f'{nb_of_users:6} users ({nb_of_days} days, generated in {time_generated - time_start:.1f}s): '
+                      f'dashboard {statistics.median(timings) * 1000:.1f} ms, '
+                      f'cached {statistics.median(timings_cached) * 1000:.1f} ms (median of {args.repeat})')
+            db.session.remove()
+            db.get_engine(app).dispose()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,139 @@
+"""Load test of production server (serve.py) on synthetic history: for each number of workers, server is started
+on temporary copy of database and 'concurrency' client processes send requests for 'duration' seconds.
+Optional share of requests edit today's day (POST), so readers run while other worker writes:
+
+    python -m benchmarks.load_test [--workers 1 2 4] [--concurrency 8] [--duration 10] [--edits 0.05]
+"""
+import argparse
+import http.client
+import multiprocessing
+import os
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date
+from urllib.parse import urlencode
+
+
+def wait_for_server(port, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            connection = http.client.HTTPConnection('127.0.0.1', port, timeout=5)
+            connection.request('GET', '/')
+            connection.getresponse().read()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f'Server on port {port} did not start in {timeout}s')
+
+
+def client(port, url, edits, duration, seed, results):
+    """Sends requests till end of duration. Puts list of (latency, status) into results."""
+    rng = random.Random(seed)
+    edit_url = f'/day/edit/{date.today().isoformat()}'
+    records = []
+    deadline = time.monotonic() + duration
+    while time.monotonic() < deadline:
+        time_start = time.perf_counter()
+        try:
+            connection = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+            if rng.random() < edits:
+                minutes = rng.randint(0, 180)
+                body = urlencode({'ds': f'{minutes}m', 'dev': '', 'pol': '', 'ge': '', 'crt': '', 'hs': '',
+                                  'alk': '', 'submit': 'Submit'})
+                connection.request('POST', edit_url, body=body,
+                                   headers={'Content-Type': 'application/x-www-form-urlencoded'})
+            else:
+                connection.request('GET', url)
+            response = connection.getresponse()
+            response.read()
+            status = response.status
+            connection.close()
+        except OSError:
+            status = None
+        records.append((time.perf_counter() - time_start, status))
+    results.put(records)
+
+
+def run_load(port, url, edits, concurrency, duration):
+    """Returns dict with number of requests, errors, throughput and latency percentiles."""
+    results = multiprocessing.Queue()
+    clients = [multiprocessing.Process(target=client, args=(port, url, edits, duration, seed, results))
+               for seed in range(concurrency)]
+    for process in clients:
+        process.start()
+    records = [record for _ in clients for record in results.get()]
+    for process in clients:
+        process.join()
+    latencies = sorted(latency for latency, status in records)
+    errors = sum(1 for latency, status in records if status is None or status >= 400)
+    return {'requests': len(records), 'errors': errors, 'requests_per_second': len(records) / duration,
+            'p50': statistics.median(latencies), 'p95': latencies[int(0.95 * (len(latencies) - 1))]}
+
+
+def prepare_database(path, years):
+    """Creates database with synthetic history of 'years' years (displayed month is current month)."""
+    from mymonth import create_app, db
+    from mymonth.migrations import set_initial_db
+    from mymonth.models import Settings, DEFAULT_USER_ID
+    from mymonth.backup import import_data_from_excel
+    from benchmarks.synthetic import write_workbook
+
+    app = create_app({'SQLALCHEMY_DATABASE_URI': f'sqlite:///{path}'})
+    with app.app_context():
+        set_initial_db()
+        import_data_from_excel(input_path=write_workbook(os.path.join(os.path.dirname(path), 'import_me.xlsx'),
+                                                         years=years))
+        Settings.query.get(DEFAULT_USER_ID).current_month_date = date.today()
+        db.session.commit()
+        db.session.remove()
+        db.get_engine(app).dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--concurrency', type=int, default=8, help='Number of client processes')
+    parser.add_argument('--duration', type=float, default=10, help='Seconds of load for each number of workers')
+    parser.add_argument('--edits', type=float, default=0.0, help='Share of requests that edit a day (POST)')
+    parser.add_argument('--url', default='/')
+    parser.add_argument('--years', type=int, default=2)
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--threaded', action='store_true')
+    args = parser.parse_args()
+
+    serve_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'serve.py')
+    print(f'{os.cpu_count()} CPU(s), {args.concurrency} clients, {args.duration:.0f}s per run, '
+          f'{args.edits:.0%} edits, url {args.url}')
+    with tempfile.TemporaryDirectory() as temp_dir:
+        database_path = os.path.join(temp_dir, 'prepared.db')
+        prepare_database(database_path, args.years)
+        for workers in args.workers:
+            # Each run starts with the same database and empty cache
+            run_database_path = os.path.join(temp_dir, f'load_{workers}.db')
+            shutil.copy(database_path, run_database_path)
+            environment = dict(os.environ, MYMONTH_DATABASE_URI=f'sqlite:///{run_database_path}',
+                               MYMONTH_DASHBOARD_CACHE_PATH=os.path.join(temp_dir, f'cache_{workers}.db'),
+                               MYMONTH_JOBS_RESULTS_DIR=os.path.join(temp_dir, 'jobs'))
+            command = [sys.executable, serve_path, '--port', str(args.port), '--workers', str(workers)]
+            if args.threaded:
+                command.append('--threaded')
+            server = subprocess.Popen(command, env=environment, stderr=subprocess.DEVNULL)
+            try:
+                wait_for_server(args.port)
+                result = run_load(args.port, args.url, args.edits, args.concurrency, args.duration)
+            finally:
+                server.terminate()
+                server.wait()
+            print(f"{workers:3} worker(s): {result['requests_per_second']:7.1f} req/s, "
+                  f"p50 {result['p50'] * 1000:7.1f} ms, p95 {result['p95'] * 1000:7.1f} ms, "
+                  f"{result['requests']} requests, {result['errors']} errors")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+"""Check of number of SQL statements of routes (mymonth.profiler) on synthetic history. Fails (exit code 1)
+if any route exceeds its budget or repeats identical statement (budgets are also checked by
+tests/test_query_budget.py):
+
+    python -m benchmarks.query_budget [--years 2] [--explain-slower-than 0.01]
+"""
+import argparse
+import os
+import sys
+import tempfile
+from datetime import date
+
+# Route (GET) -> maximum number of statements. Dashboard is checked without and with cache.
+BUDGETS = {
+    '/': 5,
+    '/ (cached)': 2,
+    f'/day/edit/{date.today().isoformat()}': 1,
+    f'/edit_month_target/{date.today().replace(day=1).isoformat()}': 1,
+    '/export_to_excel?format=csv': 1,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--years', type=int, default=2)
+    parser.add_argument('--explain-slower-than', type=float, default=None,
+                        help='Prints EXPLAIN QUERY PLAN of statements slower than [s]')
+    args = parser.parse_args()
+
+    from mymonth import create_app, db, dashboard_cache, sql_profiler
+    from mymonth.migrations import set_initial_db
+    from mymonth.models import Settings, DEFAULT_USER_ID
+    from mymonth.backup import import_data_from_excel
+    from benchmarks.synthetic import write_workbook
+
+    failed = []
+    with tempfile.TemporaryDirectory() as temp_dir:
+        app = create_app({'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(temp_dir, 'budget.db')}"})
+        client = app.test_client()
+        with app.app_context():
+            set_initial_db()
+            import_data_from_excel(input_path=write_workbook(os.path.join(temp_dir, 'import_me.xlsx'),
+                                                             years=args.years))
+            Settings.query.get(DEFAULT_USER_ID).current_month_date = date.today()
+            db.session.commit()
+
+            for route, budget in BUDGETS.items():
+                url = route.replace(' (cached)', '')
+                if url == route:
+                    dashboard_cache.clear()
+                with sql_profiler.profile(args.explain_slower_than) as log:
+                    status = client.get(url).status_code
+                result = 'OK' if status < 400 and log.count <= budget and not log.repeated() else 'FAILED'
+                if result == 'FAILED':
+                    failed.append(route)
+                print(f'{result:6} {route} (status {status}, budget {budget}): {log.report()}')
+            db.session.remove()
+            db.get_engine(app).dispose()
+
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
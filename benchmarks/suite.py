@@ -0,0 +1,144 @@
+"""Benchmark suite of dashboard, exports, import and utilities on synthetic histories (default: 1, 5 and 20 years).
+Each history is imported into temporary SQLite database. Results (seconds) are written as json, so runs
+of different commits can be compared:
+
+    python -m benchmarks.suite [--years 1 5 20] [--repeat 5] [--output results.json]
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, datetime
+
+
+def measure(func, repeat):
+    """Runs func 'repeat' times. Returns dict with min, median and mean duration in seconds."""
+    timings = []
+    for _ in range(repeat):
+        time_start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - time_start)
+    return {'min': min(timings), 'median': statistics.median(timings), 'mean': statistics.mean(timings),
+            'repeat': repeat}
+
+
+def get_environment():
+    """Returns versions of python, main libraries and git commit of benchmarked code."""
+    import flask
+    import numpy
+    import pandas
+    import sqlalchemy
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {'commit': commit, 'python': platform.python_version(), 'flask': flask.__version__,
+            'pandas': pandas.__version__, 'numpy': numpy.__version__, 'sqlalchemy': sqlalchemy.__version__,
+            'timestamp': datetime.now().isoformat(timespec='seconds')}
+
+
+def benchmark_history(years, repeat, temp_dir):
+    """Returns results of all benchmarks for synthetic history of 'years' years."""
+    from mymonth import create_app, db, dashboard_cache, jobs
+    from mymonth.migrations import set_initial_db
+    from mymonth.models import Days, Settings, DEFAULT_USER_ID
+    from mymonth.backup import import_data_from_excel, transform_historical_scores_into_daily_data
+    from mymonth.datasets import DataSet
+    from mymonth.daystore import CATEGORIES
+    from mymonth.graphs import MonthlyGraph
+    from mymonth.utils import UtilsDataConversion
+    from benchmarks.synthetic import write_workbook
+
+    input_path = write_workbook(os.path.join(temp_dir, f'history_{years}y.xlsx'), years=years)
+    app = create_app({'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(temp_dir, f'history_{years}y.db')}",
+                      'IMPORT_EXCEL_PATH': input_path})
+    client = app.test_client()
+    results = {}
+
+    def get(url):
+        response = client.get(url)
+        if response.status_code >= 400:
+            raise RuntimeError(f'{url} returned status {response.status_code}')
+        return response.data
+
+    def run_job(url):
+        # Import and xlsx export run as background jobs: submitted by route, timed until finished
+        job = jobs.wait(json.loads(get(url))['id'])
+        if job.status != 'finished':
+            raise RuntimeError(f'Job of {url} failed: {job.error}')
+        if job.result_path is not None:
+            get(f'/jobs/{job.id}/file')
+
+    with app.app_context():
+        set_initial_db()
+        results['import_data_from_excel'] = measure(lambda: import_data_from_excel(input_path=input_path), 1)
+        Settings.query.get(DEFAULT_USER_ID).current_month_date = date.today()
+        db.session.commit()
+        results['rows_days'] = Days.query.count()
+
+        def get_home_without_cache():
+            dashboard_cache.clear()
+            get('/')
+
+        def get_dataset():
+            dataset = DataSet(date.today())
+            dataset.create_month_summary()
+            return dataset.tracking_current_score_series
+
+        results['home'] = measure(get_home_without_cache, repeat)
+        results['home_cached'] = measure(lambda: get('/'), repeat)
+        results['monthly_graph'] = measure(lambda: MonthlyGraph(Days), repeat)
+        results['dataset'] = measure(get_dataset, repeat)
+        results['export_xlsx'] = measure(lambda: run_job('/export_to_excel'), repeat)
+        results['export_csv'] = measure(lambda: get('/export_to_excel?format=csv'), repeat)
+        results['import_db'] = measure(lambda: run_job('/import_from_excel'), repeat)
+        results['transform_historical_scores_into_daily_data'] = measure(
+            lambda: transform_historical_scores_into_daily_data(input_path, 'historical_scores'), repeat)
+
+        # Utilities on all durations of history
+        import pandas as pd
+        strings = pd.read_excel(input_path, sheet_name='days')[CATEGORIES].stack().tolist()
+        timedeltas = UtilsDataConversion.timedelta_from_string_array(strings)
+        results['rows_durations'] = len(strings)
+        results['timedelta_from_string'] = measure(
+            lambda: [UtilsDataConversion.timedelta_from_string(value) for value in strings], repeat)
+        results['timedelta_from_string_array'] = measure(
+            lambda: UtilsDataConversion.timedelta_from_string_array(strings), repeat)
+        python_timedeltas = pd.Series(timedeltas).dt.to_pytimedelta()
+        results['string_from_timedelta'] = measure(
+            lambda: [UtilsDataConversion.string_from_timedelta(value) for value in python_timedeltas], repeat)
+        results['string_from_timedelta_array'] = measure(
+            lambda: UtilsDataConversion.string_from_timedelta_array(timedeltas), repeat)
+        db.session.remove()
+        db.get_engine(app).dispose()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--years', type=int, nargs='+', default=[1, 5, 20])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--output', help='Path of json file with results (default: standard output)')
+    args = parser.parse_args()
+
+    output = {'environment': get_environment(), 'results': {}}
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for years in args.years:
+            print(f'Benchmark of {years} year(s) of history...', file=sys.stderr)
+            output['results'][f'{years}y'] = benchmark_history(years, args.repeat, temp_dir)
+
+    if args.output is None:
+        print(json.dumps(output, indent=2))
+    else:
+        with open(args.output, 'w') as output_file:
+            json.dump(output, output_file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
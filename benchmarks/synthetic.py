@@ -0,0 +1,54 @@
+"""Module contains:
+ - Generators of synthetic history (days, monthly targets and historical scores) used by benchmarks
+"""
+from datetime import date
+import numpy as np
+import pandas as pd
+from mymonth.daystore import CATEGORIES
+
+
+def _random_durations(rng, size):
+    """Returns array of duration strings like '1h 5m' (about 40% of cells are empty)."""
+    hours = rng.integers(0, 4, size)
+    minutes = rng.integers(0, 60, size)
+    durations = np.array([f'{h}h {m}m' if h else f'{m}m' for h, m in zip(hours, minutes)], dtype=object)
+    durations[(rng.random(size) < 0.4) | ((hours == 0) & (minutes == 0))] = None
+    return durations
+
+
+def generate_history(years, end_date=None, seed=0):
+    """Returns (df_days, df_monthlytargets, df_historical_scores) with daily records of last 'years' years
+    (till end of month of end_date) in format of import_me.xlsx. Historical scores cover 2 years before."""
+    if end_date is None:
+        end_date = date.today()
+    rng = np.random.default_rng(seed)
+    last_date = pd.Timestamp(end_date) + pd.offsets.MonthEnd(0)
+    first_date = pd.Timestamp(last_date.year - years + 1, 1, 1)
+
+    days = pd.date_range(first_date, last_date, freq='D')
+    df_days = pd.DataFrame({'id': days})
+    for col in CATEGORIES:
+        df_days[col] = _random_durations(rng, days.size)
+    df_days['alk'] = rng.choice([0.0, 0.0, 1.5, 3.9, 7.8, np.nan], days.size)
+
+    months = pd.date_range(first_date, last_date, freq='MS')
+    df_monthlytargets = pd.DataFrame({'id': months, 'ds': '10h', 'dev': '1d 18h', 'pol': '15h', 'ge': '5h',
+                                      'crt': None, 'hs': '30m', 'alk': 3.12, 'days0': 12})
+
+    historical_months = pd.date_range(pd.Timestamp(first_date.year - 2, 1, 1), first_date - pd.Timedelta(days=1),
+                                      freq='MS')
+    df_historical_scores = pd.DataFrame({'month': historical_months.strftime('%ym%m'),
+                                         'score': rng.random(historical_months.size).round(4),
+                                         'day0': rng.integers(0, 12, historical_months.size),
+                                         'ml': rng.integers(300, 650, historical_months.size)})
+    return df_days, df_monthlytargets, df_historical_scores
+
+
+def write_workbook(path, years, end_date=None, seed=0):
+    """Writes synthetic history into excel file with sheets: days, monthly_targets and historical_scores."""
+    df_days, df_monthlytargets, df_historical_scores = generate_history(years, end_date=end_date, seed=seed)
+    with pd.ExcelWriter(path) as excel_writer:
+        df_days.to_excel(excel_writer, sheet_name='days', index=False)
+        df_monthlytargets.to_excel(excel_writer, sheet_name='monthly_targets', index=False)
+        df_historical_scores.to_excel(excel_writer, sheet_name='historical_scores', index=False)
+    return path
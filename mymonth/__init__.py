@@ -1,16 +1,130 @@
+import os
+import click
 from flask import Flask
-from flask_sqlalchemy import SQLAlchemy
+from mymonth.cache import DashboardCache
+from mymonth.columns import Duration
+from mymonth.database import Database
+from mymonth.daystore import DaysStore
+from mymonth.defaults import Defaults
+from mymonth.jobs import JobRunner, make_private_dir
+from mymonth.targets import TargetHours
+from mymonth.metrics import RequestMetrics
+from mymonth.profiler import SqlProfiler
+from mymonth.users import Users
 
-app = Flask(__name__)
+db = Database()
+dashboard_cache = DashboardCache()
+days_store = DaysStore()
+metrics = RequestMetrics()
+sql_profiler = SqlProfiler()
+jobs = JobRunner()
+target_hours = TargetHours()
+users = Users()
 
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///mymonth.db'
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-app.config['SECRET_KEY'] = 'c28e87882654f5d1e84b6e1a0c12a77f'
 
-db = SQLAlchemy(app)
+def create_app(config=None):
+    """Creates application. Nothing is read from database here (see migrations.set_initial_db, run at start
+    of run.py or with 'flask init-db'). Analytics and plotting modules (pandas, bokeh) are imported by routes
+    on first request that needs them.
 
-# Routes
-from mymonth import routes
+    Parameters
+    ----------
+    config : dict, optional
+        Values that overwrite default config (default is None).
+    """
+    app = Flask(__name__)
 
-# Models
-from mymonth import models
+    app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('MYMONTH_DATABASE_URI', 'sqlite:///mymonth.db')
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    # PRAGMAs set on each SQLite connection, e.g. {'journal_mode': 'WAL'} (see server.PRODUCTION_CONFIG)
+    app.config['SQLITE_PRAGMAS'] = {}
+    app.config['SECRET_KEY'] = 'c28e87882654f5d1e84b6e1a0c12a77f'
+    # Number of entries of dashboard cache (dashboard of one user has 5 entries)
+    app.config['DASHBOARD_CACHE_SIZE'] = int(os.environ.get('MYMONTH_DASHBOARD_CACHE_SIZE', 64))
+    # SQLite file of dashboard cache shared by worker processes (if not set, cache is kept in memory of process)
+    app.config['DASHBOARD_CACHE_PATH'] = os.environ.get('MYMONTH_DASHBOARD_CACHE_PATH')
+    # SQLite file of versions of data shared by all processes (e.g. target hours changed by CLI command are loaded
+    # again by server, set in server.production_config), if None, versions are kept in memory of process
+    app.config['VERSIONS_PATH'] = os.environ.get('MYMONTH_VERSIONS_PATH')
+    # Days of users kept in memory of each process as numpy arrays (only last used users are kept). With prefix
+    # sums, 20 years of days of one user take ~0.9 MiB.
+    app.config['DAYS_STORE_MAX_USERS'] = int(os.environ.get('MYMONTH_DAYS_STORE_MAX_USERS', 100))
+    # Storage of durations in database: 'datetime' (Interval) or 'seconds' (integer)
+    app.config['INTERVAL_STORAGE'] = os.environ.get('MYMONTH_INTERVAL_STORAGE', 'datetime')
+    # Excel file imported by route import_from_excel
+    app.config['IMPORT_EXCEL_PATH'] = os.environ.get('MYMONTH_IMPORT_EXCEL_PATH',
+                                                     os.path.join('mymonth', 'static', 'initial_data', 'import_me.xlsx'))
+    # Timing of request phases exposed on /metrics (Prometheus text format)
+    app.config['METRICS_ENABLED'] = os.environ.get('MYMONTH_METRICS_ENABLED', '0') == '1'
+    app.config['METRICS_WINDOW'] = 1000
+    # Number and time of SQL statements of each request in log (EXPLAIN QUERY PLAN of statements slower than [s])
+    app.config['SQL_PROFILER_ENABLED'] = os.environ.get('MYMONTH_SQL_PROFILER_ENABLED', '0') == '1'
+    app.config['SQL_PROFILER_EXPLAIN_SECONDS'] = None
+    # Import and export run as background jobs (threads of application process); files of exports are kept in
+    # JOBS_RESULTS_DIR until job is removed (only last JOBS_KEEP jobs are kept)
+    app.config['JOBS_MAX_WORKERS'] = 1
+    app.config['JOBS_KEEP'] = 100
+    app.config['JOBS_RESULTS_DIR'] = os.environ.get('MYMONTH_JOBS_RESULTS_DIR', 'jobs')
+    # State of jobs is written to JOBS_RESULTS_DIR, so it's available in all worker processes
+    app.config['JOBS_SHARED_STATE'] = False
+    # Target hours of weekdays (Monday first) used before first schedule in table target_schedules
+    app.config['TARGET_HOURS_PER_WEEKDAY'] = Defaults.productive_hours_per_weekday
+    # Header with name of user set by authenticating proxy (each user has own data). If not set, all requests
+    # use default user. Users that are not in database are created on first request if USER_AUTO_CREATE is set.
+    app.config['USER_HEADER'] = os.environ.get('MYMONTH_USER_HEADER')
+    app.config['USER_AUTO_CREATE'] = os.environ.get('MYMONTH_USER_AUTO_CREATE', '1') == '1'
+    if config is not None:
+        app.config.update(config)
+    # Relative paths of files shared by processes are in instance folder, accessible only by user of application
+    # (pickled cache and state of jobs are trusted when read)
+    for name in ['DASHBOARD_CACHE_PATH', 'VERSIONS_PATH', 'JOBS_RESULTS_DIR']:
+        if app.config[name] is not None and not os.path.isabs(app.config[name]):
+            app.config[name] = os.path.join(make_private_dir(app.instance_path), app.config[name])
+
+    Duration.storage = app.config['INTERVAL_STORAGE']
+    db.init_app(app)
+    dashboard_cache.init_app(app)
+    days_store.init_app(app)
+    metrics.init_app(app)
+    sql_profiler.init_app(app)
+    jobs.init_app(app)
+    target_hours.init_app(app)
+    users.init_app(app)
+
+    # Routes
+    from mymonth.routes import bp
+    app.register_blueprint(bp)
+
+    @app.cli.command('init-db')
+    def init_db_command():
+        """Creates missing tables, converts durations and sets initial values."""
+        from mymonth.migrations import set_initial_db
+        set_initial_db()
+
+    @app.cli.command('create-user')
+    @click.argument('name')
+    def create_user_command(name):
+        """Adds user NAME (value of header USER_HEADER) with initial data."""
+        from mymonth.users import create_user
+        click.echo(create_user(name))
+
+    @app.cli.command('set-schedule')
+    @click.argument('valid_from', type=click.DateTime(formats=['%Y-%m-%d']))
+    @click.argument('hours', type=float, nargs=7)
+    def set_schedule_command(valid_from, hours):
+        """Sets target hours of weekdays (Monday first) valid from date VALID_FROM."""
+        from mymonth.targets import set_schedule, commit_change
+        set_schedule(valid_from.date(), hours)
+        commit_change()
+
+    @app.cli.command('set-target')
+    @click.argument('day', type=click.DateTime(formats=['%Y-%m-%d']))
+    @click.argument('hours', type=float, required=False)
+    @click.option('--note', help='E.g. name of holiday.')
+    def set_target_command(day, hours, note):
+        """Sets target hours of one date (e.g. 0 for holiday). Without HOURS, date uses its schedule again."""
+        from mymonth.targets import set_override, commit_change
+        set_override(day.date(), hours, note=note)
+        commit_change()
+
+    return app
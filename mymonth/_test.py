@@ -1,6 +1,15 @@
-import pandas as pd
-import numpy as npt
+"""Manual check of DataSet of one month (database of config MYMONTH_DATABASE_URI):
+
+    python -m mymonth._test
+"""
+from datetime import date
+
+from mymonth import create_app
 from mymonth.datasets import DataSet
-from datetime import datetime, date
+from mymonth.models import DEFAULT_USER_ID
 
-ds = DataSet(date(2021, 3, 1))
+if __name__ == '__main__':
+    app = create_app()
+    with app.app_context():
+        ds = DataSet(date(2021, 3, 1), user_id=DEFAULT_USER_ID)
+        print(ds.tracking_df_daily_datetime)
@@ -1,10 +1,30 @@
+import csv
+import io
 import os
+import time
+from zipfile import BadZipFile
 import pandas as pd
 import numpy as np
-from mymonth.utils import UtilsDatetime, UtilsDataConversion
-from mymonth.defaults import Defaults
+from openpyxl import Workbook
+from sqlalchemy import select, func
+from mymonth import db, dashboard_cache, days_store, target_hours
+from mymonth.models import Days, MonthlyTargets, Settings, DEFAULT_USER_ID
+from mymonth.columns import Duration
+from mymonth.daystore import CATEGORIES
+from mymonth.jobs import JobError, write_atomically
+from mymonth.datasets import MonthSummaryTable, backfill_month
+from mymonth.utils import UtilsDataConversion
 from datetime import timedelta
 
+DEFAULT_EXCEL_PATH = os.path.join('mymonth', 'static', 'initial_data', 'import_me.xlsx')
+# Tables exported to excel file (sheet name: table)
+EXPORT_TABLES = {'days': Days.__table__, 'monthly_targets': MonthlyTargets.__table__}
+
+
+def data_columns(table):
+    """Returns columns of table without user_id (files contain data of one user)."""
+    return [column for column in table.columns if column.name != 'user_id']
+
 
 def transform_historical_scores_into_daily_data(input_path, input_sheetname):
     """Data from the past are available only at aggregated levels. This function transforms it into standards daily
@@ -13,54 +33,38 @@ def transform_historical_scores_into_daily_data(input_path, input_sheetname):
     # Load historical data from excel file
     df_historical = pd.read_excel(input_path, sheet_name=input_sheetname)
     df_historical.dropna(inplace=True)
-    df_historical['date'] = pd.to_datetime(df_historical['month'], format='%ym%m')
-    df_historical.set_index('date', inplace=True)
-
-    # Reindexing with all days in each month
-    list_of_indexes = [UtilsDatetime(day).month_all_dates for day in df_historical.index]
-    new_index = []
-    for list_item in list_of_indexes:
-        new_index.extend(list_item)
-    df = df_historical.reindex(new_index, method='ffill').reset_index()
-
-    # Recalculation of day0 and ml
-    count_days_in_month = df.groupby('month').size()
-    count_days_in_month.name = 'nb_of_days'
-    df = df.merge(count_days_in_month, how='left', on='month')
-    df['new_ml'] = df.ml * df.nb_of_days / (df.nb_of_days - df.day0)
+    month_first_dates = pd.to_datetime(df_historical['month'], format='%ym%m')
 
-    df_groups = []
-    for group_name, group_data in list(df.groupby('month')):
-        nb_days0 = group_data.day0.iloc[0]
-        ml_including_days0 = group_data.new_ml.copy()
-        ml_including_days0.iloc[0: nb_days0] = 0
-        group_data['new_ml'] = ml_including_days0
-        df_groups.append(group_data)
-    df = pd.concat(df_groups, ignore_index=True)
+    # Expansion into all days of each month: row of a month is repeated for each day (rows stay sorted by month)
+    nb_of_days = month_first_dates.dt.days_in_month.to_numpy()
+    df = df_historical.loc[df_historical.index.repeat(nb_of_days)].reset_index(drop=True)
+    day_of_month = df.groupby('month').cumcount().to_numpy()
+    df.insert(0, 'date', np.repeat(month_first_dates.to_numpy(), nb_of_days) + day_of_month.astype('timedelta64[D]'))
+    df['nb_of_days'] = np.repeat(nb_of_days, nb_of_days)
+
+    # Recalculation of day0 and ml (first day0 days of a month get 0)
+    df['new_ml'] = df.ml * df.nb_of_days / (df.nb_of_days - df.day0)
+    df['new_ml'] = df['new_ml'].mask(day_of_month < df['day0'].to_numpy(), 0)
 
     # Calculation of Sja and negative hours
     df['sja'] = df.new_ml * 7.8 / 750
     df['negative_hrs'] = (df['sja'] - 2.86).clip(0) * timedelta(minutes=20)
 
     # Calculation of productive hours taking into account negative time from sja
-    df['target_hrs'] = df['date'].map(Defaults.productive_hours_by_weekday)
-    df_positive_hrs_calc = df.groupby('month', as_index=False)[
-        ['negative_hrs', 'target_hrs', 'score', 'nb_of_days']].agg(
-        {'negative_hrs': sum, 'target_hrs': sum, 'score': np.mean, 'nb_of_days': max})
-    df_positive_hrs_calc['avg_positive_hrs'] = (df_positive_hrs_calc['target_hrs'] * df_positive_hrs_calc['score'] +
-                                                df_positive_hrs_calc['negative_hrs']) / df_positive_hrs_calc[
-                                                   'nb_of_days']
-    df = df.merge(df_positive_hrs_calc[['month', 'avg_positive_hrs']], how='left', on='month')
+    df['target_hrs'] = target_hours.timedeltas_for(pd.DatetimeIndex(df['date']))
+    month_groups = df.groupby('month')
+    df['avg_positive_hrs'] = (month_groups['target_hrs'].transform('sum') * month_groups['score'].transform('mean') +
+                              month_groups['negative_hrs'].transform('sum')) / df['nb_of_days']
 
     # Reshape and rename df to match input of daily activities - All set to 'dev' category
     df_import_me = df[['date', 'avg_positive_hrs', 'sja']].copy()
     df_import_me.rename(columns={'date': 'id', 'avg_positive_hrs': 'dev', 'sja': 'alk'}, inplace=True)
-    df_import_me['dev'] = df_import_me['dev'].map(UtilsDataConversion.string_from_timedelta)
+    df_import_me['dev'] = UtilsDataConversion.string_from_timedelta_array(df_import_me['dev'])
     df_import_me['id'] = pd.to_datetime(df_import_me['id'])
     return df_import_me
 
 
-def get_initial_data_from_excel(input_path=os.path.join('mymonth', 'static', 'initial_data', 'import_me.xlsx')):
+def get_initial_data_from_excel(input_path=DEFAULT_EXCEL_PATH):
     """Gets historical data from excel file.
     Combines 2 worksheets:
      - 'days' with historical data based recorded on daily levels, and
@@ -75,3 +79,163 @@ def get_initial_data_from_excel(input_path=os.path.join('mymonth', 'static', 'in
     df = pd.concat([df_days, df_historical_scores], ignore_index=True)
     df.drop_duplicates(subset='id', inplace=True)
     return df
+
+
+def dataframe_to_records(df):
+    """Converts DataFrame into list of dicts with python objects (None for missing values) used by executemany."""
+    df = df.copy()
+    for col in df.select_dtypes(include=['datetime']).columns:
+        df[col] = df[col].dt.date
+    for col in df.select_dtypes(include=['timedelta']).columns:
+        df[col] = pd.Series(df[col].dt.to_pytimedelta(), index=df.index, dtype=object)
+    df = df.astype(object).where(df.notna(), None)
+    return df.to_dict('records')
+
+
+def replace_table_rows(table, df, chunk_size=1000, progress=None, user_id=DEFAULT_USER_ID):
+    """Deletes all rows of a user in table with one statement and inserts rows of df (without column user_id)
+    in chunks (executemany). Runs in current db.session transaction. Returns number of inserted rows.
+    Optional progress(nb_rows) is called after each chunk with number of rows in chunk."""
+    db.session.execute(table.delete().where(table.c.user_id == user_id))
+    records = dataframe_to_records(df.assign(user_id=user_id))
+    for chunk_start in range(0, len(records), chunk_size):
+        chunk = records[chunk_start:chunk_start + chunk_size]
+        db.session.execute(table.insert(), chunk)
+        if progress is not None:
+            progress(len(chunk))
+    return len(records)
+
+
+def import_data_from_excel(input_path=DEFAULT_EXCEL_PATH, chunk_size=1000, progress=None, user_id=DEFAULT_USER_ID):
+    """Overwrites data of a user in tables days and monthly_targets (and month_summary rollup) with data
+    from excel file.
+    All changes are done in one transaction. Returns dict with number of rows and duration of import.
+    Optional progress(rows_done, rows_total) is called when rows are converted and after each written chunk.
+    Raises JobError if content of file is invalid (e.g. not excel file, missing worksheet or column, invalid
+    duration)."""
+    time_start = time.perf_counter()
+    try:
+        # Excel file is opened once for all worksheets
+        excel_file = pd.ExcelFile(input_path)
+        df_days = get_initial_data_from_excel(input_path=excel_file)
+        df_monthlytargets = pd.read_excel(excel_file, sheet_name='monthly_targets')
+
+        # Change columns type from string to timedelta
+        for col in CATEGORIES:
+            df_days[col] = UtilsDataConversion.timedelta_from_string_array(df_days[col])
+            df_monthlytargets[col] = UtilsDataConversion.timedelta_from_string_array(df_monthlytargets[col])
+    except (ValueError, KeyError, BadZipFile) as error:
+        raise JobError(f'Invalid excel file: {error}') from error
+    time_converted = time.perf_counter()
+
+    rows_total = len(df_days) + len(df_monthlytargets)
+    rows_done = 0
+
+    def progress_chunk(nb_rows):
+        nonlocal rows_done
+        rows_done += nb_rows
+        progress(rows_done, rows_total)
+
+    if progress is not None:
+        progress(0, rows_total)
+    try:
+        nb_rows = replace_table_rows(Days.__table__,
+                                     df_days[[column.name for column in data_columns(Days.__table__)]],
+                                     chunk_size=chunk_size, progress=None if progress is None else progress_chunk,
+                                     user_id=user_id)
+        targets_columns = [column.name for column in data_columns(MonthlyTargets.__table__)]
+        nb_rows += replace_table_rows(MonthlyTargets.__table__, df_monthlytargets[targets_columns],
+                                      chunk_size=chunk_size, progress=None if progress is None else progress_chunk,
+                                      user_id=user_id)
+        MonthSummaryTable.rebuild(df_days[['id', *CATEGORIES, 'alk']], user_id=user_id)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    days_store.invalidate(user_id)
+    time_end = time.perf_counter()
+
+    return {'rows': nb_rows,
+            'seconds_read_and_convert': time_converted - time_start,
+            'seconds_write': time_end - time_converted,
+            'rows_per_second': nb_rows / (time_end - time_start)}
+
+
+def iterate_table_chunks(table, chunk_size=1000, user_id=DEFAULT_USER_ID):
+    """Yields rows of a user in table (without column user_id) sorted by id in chunks (lists of lists).
+    Rows are fetched from cursor chunk by chunk, so only one chunk is kept in memory. Intervals are formatted
+    as strings like '1h 30m'."""
+    columns = data_columns(table)
+    interval_indexes = [i for i, column in enumerate(columns) if isinstance(column.type, Duration)]
+    with db.engine.connect() as connection:
+        result = connection.execution_options(stream_results=True).execute(
+            select(columns).where(table.c.user_id == user_id).order_by(table.c.id))
+        while True:
+            rows = result.fetchmany(chunk_size)
+            if not rows:
+                break
+            columns = [list(column) for column in zip(*rows)]
+            for i in interval_indexes:
+                columns[i] = UtilsDataConversion.string_from_timedelta_array(columns[i])
+            yield [list(row) for row in zip(*columns)]
+
+
+def count_export_rows(user_id=DEFAULT_USER_ID):
+    """Returns number of rows of a user in all EXPORT_TABLES."""
+    with db.engine.connect() as connection:
+        return sum(connection.execute(select([func.count()]).select_from(table).where(
+            table.c.user_id == user_id)).scalar() for table in EXPORT_TABLES.values())
+
+
+def write_excel_export(output_file, chunk_size=1000, progress=None, user_id=DEFAULT_USER_ID):
+    """Writes data of a user in tables days and monthly_targets into excel file (or file object) using
+    write-only workbook.
+    Optional progress(nb_rows) is called after each chunk with number of rows in chunk."""
+    workbook = Workbook(write_only=True)
+    for sheet_name, table in EXPORT_TABLES.items():
+        worksheet = workbook.create_sheet(sheet_name)
+        worksheet.freeze_panes = 'A2'
+        worksheet.append([column.name for column in data_columns(table)])
+        for chunk in iterate_table_chunks(table, chunk_size=chunk_size, user_id=user_id):
+            for row in chunk:
+                worksheet.append(row)
+            if progress is not None:
+                progress(len(chunk))
+    workbook.save(output_file)
+
+
+def generate_csv_export(table_name, chunk_size=1000, user_id=DEFAULT_USER_ID):
+    """Yields data of a user in table (one of EXPORT_TABLES) as csv text, chunk by chunk."""
+    table = EXPORT_TABLES[table_name]
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow([column.name for column in data_columns(table)])
+    for chunk in iterate_table_chunks(table, chunk_size=chunk_size, user_id=user_id):
+        writer.writerows(chunk)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue()
+
+
+def import_job(job, input_path, chunk_size=1000, user_id=DEFAULT_USER_ID):
+    """Background job (see jobs.JobRunner) that imports excel file into data of a user. Returns statistics
+    of import."""
+    import_stats = import_data_from_excel(input_path=input_path, chunk_size=chunk_size,
+                                          progress=lambda rows, rows_total: job.update(rows, rows_total),
+                                          user_id=user_id)
+    # Imported days replace all days of a user, so days of displayed month are added again if missing
+    backfill_month(Settings.query.get(user_id).current_month_date, user_id)
+    db.session.commit()
+    days_store.invalidate(user_id)
+    dashboard_cache.bump(user_id=user_id)
+    return import_stats
+
+
+def export_job(job, chunk_size=1000, user_id=DEFAULT_USER_ID):
+    """Background job (see jobs.JobRunner) that writes excel export of data of a user to job.result_path
+    (atomically). Returns number of exported rows."""
+    job.update(rows_total=count_export_rows(user_id))
+    write_atomically(job.result_path, lambda output_file: write_excel_export(output_file, chunk_size=chunk_size,
+                                                                        progress=job.add_rows, user_id=user_id))
+    return job.rows
@@ -0,0 +1,219 @@
+"""Module contains:
+ - Cache of data computed for dashboard (datasets, summaries, bokeh components) shared between requests,
+ - Stores of cache: in memory of process (default) or in SQLite file shared by worker processes
+   (config DASHBOARD_CACHE_PATH)
+ - Store of data versions shared by all processes of application (config VERSIONS_PATH)
+"""
+import os
+import pickle
+import sqlite3
+from collections import OrderedDict
+from datetime import date
+from functools import lru_cache
+from threading import Lock, local
+
+
+class MemoryCacheStore:
+    """Entries (LRU) and data versions kept in memory of process."""
+    def __init__(self, max_size=64):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._versions = {}
+        self._lock = Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self._entries:
+                return default
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def versions(self, names):
+        with self._lock:
+            return [self._versions.get(name, 0) for name in names]
+
+    def increment(self, names):
+        """Increases versions of names by 1. Returns new versions."""
+        with self._lock:
+            for name in names:
+                self._versions[name] = self._versions.get(name, 0) + 1
+            return [self._versions[name] for name in names]
+
+
+class SqliteCacheStore:
+    """
+    Entries (pickled values) and data versions kept in SQLite file, so all worker processes share them:
+    data computed by one worker are read by others and writes in one worker (see DashboardCache.bump) are
+    seen by all. When number of entries exceeds max_size, oldest written entries are removed.
+    Each thread of each process opens its own connection on first use.
+    Values are unpickled, so file must be writable only by user of application (default path of create_app is
+    in its instance folder).
+    """
+    def __init__(self, path, max_size=64):
+        self.path = path
+        self.max_size = max_size
+        self._local = local()
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        # Connection of parent process is not used in forked worker
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            connection.execute('PRAGMA journal_mode = WAL')
+            # Cache can be rebuilt, so it's not synced to disk after each write
+            connection.execute('PRAGMA synchronous = OFF')
+            connection.execute('CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, value BLOB NOT NULL)')
+            connection.execute('CREATE TABLE IF NOT EXISTS versions (name TEXT PRIMARY KEY, '
+                               'version INTEGER NOT NULL)')
+            self._local.connection, self._local.pid = connection, os.getpid()
+        return connection
+
+    def get(self, key, default=None):
+        row = self._connection().execute('SELECT value FROM entries WHERE key = ?', (key, )).fetchone()
+        return default if row is None else pickle.loads(row[0])
+
+    def set(self, key, value):
+        connection = self._connection()
+        value = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        with connection:
+            connection.execute('BEGIN IMMEDIATE')
+            # Replaced entry gets new rowid, so rowids are in order of writes
+            connection.execute('INSERT OR REPLACE INTO entries (key, value) VALUES (?, ?)', (key, value))
+            connection.execute('DELETE FROM entries WHERE rowid <= (SELECT MAX(rowid) FROM entries) - ?',
+                               (self.max_size, ))
+
+    def clear(self):
+        self._connection().execute('DELETE FROM entries')
+
+    def versions(self, names):
+        rows = self._connection().execute(f'SELECT name, version FROM versions '
+                                          f'WHERE name IN ({", ".join("?" * len(names))})', names).fetchall()
+        versions = dict(rows)
+        return [versions.get(name, 0) for name in names]
+
+    def increment(self, names):
+        """Increases versions of names by 1. Returns new versions (read in the same transaction, so they include
+        only this increase)."""
+        connection = self._connection()
+        with connection:
+            connection.execute('BEGIN IMMEDIATE')
+            connection.executemany('INSERT OR IGNORE INTO versions (name, version) VALUES (?, 0)',
+                                   [(name, ) for name in names])
+            connection.executemany('UPDATE versions SET version = version + 1 WHERE name = ?',
+                                   [(name, ) for name in names])
+            versions = dict(connection.execute(f'SELECT name, version FROM versions '
+                                               f'WHERE name IN ({", ".join("?" * len(names))})', names).fetchall())
+        return [versions[name] for name in names]
+
+
+@lru_cache(maxsize=None)
+def _sqlite_version_store(path):
+    return SqliteCacheStore(path)
+
+
+def create_version_store(app):
+    """Returns store of data versions (see increment and versions of stores) of application: SqliteCacheStore
+    in file of config VERSIONS_PATH, shared by worker processes and CLI commands (e.g. flask set-schedule), or
+    MemoryCacheStore of process if VERSIONS_PATH is None. Stores of the same file are one object."""
+    path = app.config.get('VERSIONS_PATH')
+    return MemoryCacheStore() if path is None else _sqlite_version_store(path)
+
+
+class DashboardCache:
+    """
+    LRU cache of data computed for dashboard, shared by all users.
+    Entries are keyed by (name, user, month, data version, today). Data version of a month of a user is increased
+    by routes that write to database (see bump), so entries computed from old data are never read
+    again and are evicted as least recently used.
+    Entries are kept in store: MemoryCacheStore or, if config DASHBOARD_CACHE_PATH is set, SqliteCacheStore
+    shared by worker processes. Versions are kept in store of create_version_store, so changes written by other
+    processes (e.g. target hours changed by CLI command) are seen too.
+    """
+    def __init__(self, app=None, max_size=64):
+        """
+        Parameters
+        ----------
+        app : Flask (default is None)
+            Application with optional config DASHBOARD_CACHE_SIZE, DASHBOARD_CACHE_PATH and VERSIONS_PATH.
+        max_size : int (default is 64)
+            Maximum number of entries kept in cache, shared by all users (dashboard of one user has 5 entries),
+            so it should grow with number of active users (see server.production_config).
+        """
+        self.max_size = max_size
+        self.store = MemoryCacheStore(max_size)
+        self.versions = MemoryCacheStore()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.max_size = app.config.get('DASHBOARD_CACHE_SIZE', self.max_size)
+        path = app.config.get('DASHBOARD_CACHE_PATH')
+        self.store = MemoryCacheStore(self.max_size) if path is None else SqliteCacheStore(path, self.max_size)
+        self.versions = create_version_store(app)
+
+    @staticmethod
+    def _month_id(input_date):
+        """Returns first day of a month (months are identified in the same way as MonthlyTargets)."""
+        return date(input_date.year, input_date.month, 1)
+
+    @classmethod
+    def _version_names(cls, user_id, month):
+        """Returns names of versions of data that entry of a user and a month depends on: data of all users
+        (e.g. target hours), all data of a user (month is None) or all months of a user and the month."""
+        if month is None:
+            return ['epoch', f'all:{user_id}']
+        return ['epoch', f'months:{user_id}', f'month:{user_id}:{cls._month_id(month).isoformat()}']
+
+    def _key(self, name, user_id, month):
+        version = tuple(self.versions.versions(self._version_names(user_id, month)))
+        month = None if month is None else self._month_id(month)
+        # Values depend on today's date (e.g. data till today), so they expire at midnight
+        return repr((name, user_id, month, version, date.today()))
+
+    def bump(self, *months, user_id=None):
+        """Marks data of months (any date within month) of a user as changed. If no month is given, all months
+        of a user are changed. If user_id is None, data of all users are changed (e.g. target hours)."""
+        if user_id is None:
+            self.versions.increment(['epoch'])
+            self.store.clear()
+            return
+        names = [f'all:{user_id}']
+        if not months:
+            names.append(f'months:{user_id}')
+        names += [self._version_names(user_id, month)[-1] for month in months]
+        self.versions.increment(names)
+
+    def get_or_set(self, name, user_id, month, func):
+        """Returns cached value of entry 'name' of a user for a month. If it does not exist, it's calculated
+        with func().
+
+        Parameters
+        ----------
+        name : str
+            Name of cached value.
+        user_id : int
+            User whose data are used by func.
+        month : date or None
+            Any date of month that value depends on. If None, value depends on data of all months.
+        func : callable
+            Function without arguments that returns value to be cached.
+        """
+        key = self._key(name, user_id, month)
+        value = self.store.get(key)
+        if value is None:
+            value = func()
+            self.store.set(key, value)
+        return value
+
+    def clear(self):
+        self.store.clear()
@@ -0,0 +1,46 @@
+"""Module contains:
+ - Custom column types used by models
+"""
+from datetime import timedelta
+from sqlalchemy.types import TypeDecorator, Interval, Integer
+
+# SQLite expression converting duration kept as datetime (starting at 1970-01-01) into integer seconds
+SQLITE_SECONDS_FROM_DATETIME = 'CAST(round((julianday({column}) - 2440587.5) * 86400) AS INTEGER)'
+
+
+class Duration(TypeDecorator):
+    """
+    Duration (timedelta) column with two storage formats (config INTERVAL_STORAGE):
+     - 'datetime' (default): Interval, on SQLite kept as datetime starting at 1970-01-01,
+     - 'seconds': integer number of seconds, so SQL can SUM durations directly.
+    ORM attributes are timedelta objects in both formats. Existing databases are converted
+    with migrations.migrate_tables.
+    """
+    impl = Interval
+    storage = 'datetime'
+
+    @classmethod
+    def stores_seconds(cls):
+        return cls.storage == 'seconds'
+
+    def load_dialect_impl(self, dialect):
+        if self.stores_seconds():
+            return dialect.type_descriptor(Integer())
+        return dialect.type_descriptor(Interval())
+
+    @classmethod
+    def sqlite_seconds(cls, column):
+        """Returns SQLite expression of duration column in seconds (0 for NULL), e.g. to SUM durations."""
+        if cls.stores_seconds():
+            return f'COALESCE({column}, 0)'
+        return f'COALESCE({SQLITE_SECONDS_FROM_DATETIME.format(column=column)}, 0)'
+
+    def process_bind_param(self, value, dialect):
+        if value is not None and self.stores_seconds():
+            return int(round(value.total_seconds()))
+        return value
+
+    def process_result_value(self, value, dialect):
+        if value is not None and self.stores_seconds():
+            return timedelta(seconds=value)
+        return value
@@ -0,0 +1,49 @@
+"""Module contains:
+ - Flask-SQLAlchemy extension that sets PRAGMAs of each new SQLite connection (config SQLITE_PRAGMAS),
+   e.g. WAL journal and busy timeout, so worker processes read while other process writes
+ - Registration of listeners of statements of all engines (used by metrics and SQL profiler)
+"""
+from functools import partial
+
+from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+def listen_all_engines(listeners):
+    """Registers listeners (dict event name: function) of all engines, so engine of Flask-SQLAlchemy (created on
+    first use) is included. Listener that is already registered is skipped (e.g. init_app of next application)."""
+    for name, listener in listeners.items():
+        if not event.contains(Engine, name, listener):
+            event.listen(Engine, name, listener)
+
+
+def set_sqlite_pragmas(dbapi_connection, connection_record, pragmas):
+    """Listener of 'connect' event of engine: executes PRAGMA name = value for each item of pragmas."""
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
+    finally:
+        cursor.close()
+
+
+class Database(SQLAlchemy):
+    """
+    SQLAlchemy extension of application. SQLite engines get listener that sets config SQLITE_PRAGMAS
+    (dict name: value, default is empty) on every new connection.
+    Pool of connections is set by config SQLALCHEMY_ENGINE_OPTIONS (by default Flask-SQLAlchemy opens new
+    SQLite connection for each checkout).
+    """
+    def apply_driver_hacks(self, app, sa_url, options):
+        if sa_url.drivername == 'sqlite':
+            # Removed from options in create_engine (not an argument of sqlalchemy.create_engine)
+            options['sqlite_pragmas'] = dict(app.config.get('SQLITE_PRAGMAS') or {})
+        return super().apply_driver_hacks(app, sa_url, options)
+
+    def create_engine(self, sa_url, engine_opts):
+        pragmas = engine_opts.pop('sqlite_pragmas', None)
+        engine = super().create_engine(sa_url, engine_opts)
+        if pragmas:
+            event.listen(engine, 'connect', partial(set_sqlite_pragmas, pragmas=pragmas))
+        return engine
@@ -2,104 +2,171 @@
  - DataBase (db) queries and their outputs,
  - Datasets that are displayed in routes
 """
-from datetime import date, datetime
+from dataclasses import dataclass
+from functools import cached_property, lru_cache
+from datetime import date, datetime, timedelta
 import pandas as pd
 import numpy as np
-from mymonth import db
+from sqlalchemy import text
+from mymonth import db, target_hours, days_store
+from mymonth.columns import Duration
+from mymonth.daystore import ALK_UNITS, CATEGORIES, read_days_arrays
+from mymonth.models import Days, MonthlySummary, User, DEFAULT_USER_ID
 from mymonth.utils import UtilsDatetime, UtilsDataConversion as udc
 
 pd.options.display.expand_frame_repr = False
 pd.options.display.min_rows = 31
 
 
+# Compiled statements shared by queries of this module. Statements use bound parameters,
+# so each of them is compiled once and reused for all dates (see read_sql).
+COMPILED_CACHE = {}
+# Decimals of average ml per day of a month (like ROUND of SqlAggregates), so error of float sums does not change
+# labels (int) of monthly graph
+ML_DECIMALS = 9
+
+
+def read_sql(statement, connection, start_date, end_date, user_id, **kwargs):
+    """Returns DataFrame with output of statement (text with bound parameters :start_date, :end_date
+    and :user_id).
+
+    Parameters
+    ----------
+    statement : TextClause
+        Statement created once (e.g. class attribute), so its compiled form is reused.
+    connection : Engine or Connection
+        Connection used for query.
+    start_date, end_date : date
+        Values of bound parameters.
+    user_id : int
+        Value of bound parameter (user whose rows are selected).
+    kwargs
+        Passed to pandas read_sql_query (e.g. index_col, parse_dates).
+    """
+    return pd.read_sql_query(sql=statement, con=connection.execution_options(compiled_cache=COMPILED_CACHE),
+                             params={'start_date': start_date.isoformat(), 'end_date': end_date.isoformat(),
+                                     'user_id': user_id},
+                             **kwargs)
+
+
+def timedelta_df_from_seconds(input_df):
+    """Converts DataFrame with numbers of seconds into timedelta columns (NaN are converted to 0)."""
+    return pd.DataFrame({column: pd.to_timedelta(input_df[column].fillna(0), unit='s') for column in input_df.columns},
+                        index=input_df.index)
+
+
 class DataSet:
     """
     A class used to easily query database. Contains predefines queries
     and methods to extract and convert data using pandas DataFrame.
+    DataFrames are queried and calculated on first access and memoized (see refresh).
+    Data of one user are selected: days are sliced from days_store, targets by range of primary key (user_id, id).
     """
-    db_connection = db.engine
+    targets_statement = text('SELECT id, ds, dev, pol, ge, crt, hs FROM monthly_targets '
+                             'WHERE user_id = :user_id AND id BETWEEN :start_date AND :end_date')
 
-    def __init__(self, month_reference_date=None):
+    def __init__(self, month_reference_date=None, end_month_date=None, user_id=DEFAULT_USER_ID):
         """
         Parameters
         ----------
         month_reference_date : datetime (default is today)
             The reference date that is used to determine query period, if applicable.
+        end_month_date : datetime, optional
+            Any date of last month of query period (default is None).
+            If None, query period is one month of month_reference_date.
+        user_id : int (default is DEFAULT_USER_ID)
+            User whose data are queried.
         """
+        self.user_id = user_id
         if month_reference_date is None:
             self.month_reference_date = date.today()
         else:
             self.month_reference_date = month_reference_date
 
-        # Attributes of days table
-        self.days_table_name = 'days'
-        self.days_query_columns_datetime = ['id', 'ds', 'dev', 'pol', 'ge', 'crt', 'hs']
-        self.days_query_columns_float = ['alk']
-
-        # Attributes of monthly_targets table
-        self.targets_table_name = 'monthly_targets'
-        self.targets_query_columns_datetime = ['id', 'ds', 'dev', 'pol', 'ge', 'crt', 'hs']
-        self.targets_query_columns_float = ['alk']
+        # Query period (all days of months between month_reference_date and end_month_date)
+        self.start_date = UtilsDatetime(self.month_reference_date).month_first_date
+        self.end_date = UtilsDatetime(self.month_reference_date if end_month_date is None
+                                      else end_month_date).month_last_date
+        if self.end_date < self.start_date:
+            raise ValueError(f'Last month ({end_month_date}) is before first month ({self.month_reference_date})')
 
         # Attributes of tracking table
-        self.tracking_columns_datetime = ['ds', 'dev', 'pol', 'ge', 'crt', 'hs']
+        self.tracking_columns_datetime = CATEGORIES
 
-        # Database raw tables preprocessed
-        self.days_df_datetime = self.create_days_df_datetime()
-        self.days_df_numeric = None
-        self.targets_df_datetime = self.create_df_targets_datetime()
         self.targets_df_numeric = None
-
-        # Tracking tables
-        self.tracking_df_daily_datetime = self.create_tracking_df_daily_datetime()
-        self.tracking_current_score_series = self.create_tracking_current_score_series()
         self.tracking_df_daily_numeric = None
 
-    def get_sql_statement(self, table, columns=None, use_reference_date=False, filter_dates_column='id',
-                          start_date=None, end_date=None):
-        """Returns sql_query that will be get data from database with pandas read_sql_query.
+    @classmethod
+    def for_months(cls, start_month_date, end_month_date, user_id=DEFAULT_USER_ID):
+        """Returns DataSet of all months between months of start_month_date and end_month_date (e.g. quarter)."""
+        return cls(start_month_date, end_month_date=end_month_date, user_id=user_id)
 
-        Parameters
-        ----------
-        table : string
-            Name of a table in database.
-        columns : list, optional
-            Columns passed to SELECT statement (default is None).
-            If None, all columns are passed ('SELECT *').
-        use_reference_date : bool (default is False)
-            Month Reference date will be used to generate first and last day of query period.
-            If False: all dates are used.
-        filter_dates_column : str (default is id)
-            Name of column to WHERE statement applies.
-        start_date : date (default is None)
-            First selection date.
-        end_date : date (default is None)
-            Last selection date.
-        """
-        if columns is None:
-            columns = '*'
-        elif isinstance(columns, (list, tuple)):
-            columns = ', '.join(columns)
-
-        if use_reference_date:
-            udt = UtilsDatetime(self.month_reference_date)
-            start_date = udt.month_first_date.isoformat()
-            end_date = udt.month_last_date.isoformat()
-
-        if start_date is not None and end_date is not None:
-            where_statement = f'WHERE {filter_dates_column} BETWEEN "{start_date}" AND "{end_date}"'
-        elif start_date is not None and end_date is None:
-            where_statement = f'WHERE {filter_dates_column} >= "{start_date}"'
-        elif start_date is None and end_date is not None:
-            where_statement = f'WHERE {filter_dates_column} <= "{end_date}"'
-        else:
-            where_statement = ''
-        return f'SELECT {columns} FROM {table} {where_statement}'
+    @classmethod
+    def for_year(cls, year, user_id=DEFAULT_USER_ID):
+        """Returns DataSet of all months of a year."""
+        return cls(date(year, 1, 1), end_month_date=date(year, 12, 31), user_id=user_id)
+
+    @property
+    def is_single_month(self):
+        return (self.start_date.year, self.start_date.month) == (self.end_date.year, self.end_date.month)
+
+    def refresh(self):
+        """Clears memoized DataFrames, so they are queried again on next access (e.g. after changes in database)."""
+        for cls in type(self).__mro__:
+            for name, value in vars(cls).items():
+                if isinstance(value, cached_property):
+                    self.__dict__.pop(name, None)
+
+    def __getstate__(self):
+        # Columns of all days are not pickled with DataSet (e.g. into shared dashboard cache)
+        state = self.__dict__.copy()
+        state.pop('day_columns', None)
+        return state
+
+    # Database raw tables preprocessed
+    @cached_property
+    def day_columns(self):
+        """Returns DayColumns of all days of user from days_store, read once, so all values of DataSet are
+        calculated from the same days (columns are replaced, not changed, by writes)."""
+        return days_store.columns(self.user_id)
+
+    @cached_property
+    def days_df(self):
+        """Returns days of query period sliced from days_store (no query), index id. Missing alk is kept as NaN."""
+        return convert_days_columns_to_dataframe(self.day_columns.between(self.start_date, self.end_date),
+                                                 fill_missing=False).set_index('id')
+
+    @cached_property
+    def days_df_datetime(self):
+        return self.create_days_df_datetime()
+
+    @cached_property
+    def days_df_numeric(self):
+        return self.create_days_df_numeric()
+
+    @cached_property
+    def targets_df_datetime(self):
+        return self.create_df_targets_datetime()
+
+    @cached_property
+    def targets_df_daily_datetime(self):
+        return self.create_targets_df_daily_datetime()
+
+    # Tracking tables
+    @cached_property
+    def tracking_df_daily_datetime(self):
+        return self.create_tracking_df_daily_datetime()
+
+    @cached_property
+    def tracking_current_score_series(self):
+        return self.create_tracking_current_score_series()
 
     @staticmethod
     def _format_df_with_timedelta(input_df):
-        """Formats and cleans dataframe with only datetime columns"""
-        df = input_df.copy()
+        """Formats and cleans dataframe with only duration columns (raw values read from database)"""
+        if Duration.stores_seconds():
+            return timedelta_df_from_seconds(input_df)
+        df = input_df.astype('datetime64[ns]')
         # Change NaN/NaT into zeros
         df.fillna(datetime(1970, 1, 1), inplace=True)
         # Convert datetimes (data type used in db to keep intervals) to timedeltas
@@ -107,29 +174,40 @@ class DataSet:
         return df
 
     def create_days_df_datetime(self):
-        """Returns and cleans datetime columns from table days"""
-        sql_query = self.get_sql_statement(self.days_table_name, columns=self.days_query_columns_datetime,
-                                           use_reference_date=True)
-        df = pd.read_sql_query(sql=sql_query, con=self.db_connection,
-                               index_col='id', parse_dates=self.days_query_columns_datetime)
-        df = self._format_df_with_timedelta(df)
-        return df
+        """Returns duration columns of days (timedeltas, missing values are 0)"""
+        return self.days_df[CATEGORIES]
+
+    def create_days_df_numeric(self):
+        """Returns float columns of days (missing values are kept as NaN)"""
+        return self.days_df[['alk']]
 
     def create_df_targets_datetime(self):
         """Returns and cleans datetime columns from table monthly_targets"""
-        sql_query = self.get_sql_statement(self.targets_table_name, columns=self.targets_query_columns_datetime,
-                                           use_reference_date=True)
-        df = pd.read_sql_query(sql=sql_query, con=self.db_connection,
-                               index_col='id', parse_dates=self.targets_query_columns_datetime)
-        df = self._format_df_with_timedelta(df)
+        df = read_sql(self.targets_statement, db.engine, self.start_date, self.end_date, self.user_id,
+                      index_col='id', parse_dates=['id'])
+        return self._format_df_with_timedelta(df)
+
+    def create_targets_df_daily_datetime(self):
+        """Returns targets of each day of query period (index id): targets of a month are spread evenly
+        over days of the month. Months without targets get zeros."""
+        days_index = pd.date_range(self.start_date, self.end_date, name='id')
+        # Targets are kept with id of first day of a month
+        month_first_days = days_index.to_period('M').to_timestamp()
+        df = self.targets_df_datetime.reindex(month_first_days).fillna(pd.Timedelta(0))
+        df = df.div(np.asarray(days_index.days_in_month), axis=0)
+        df.index = days_index
         return df
 
     def create_tracking_df_daily_datetime(self):
         """Returns dataset to display hours spend vs targets on a daily level"""
-        actuals = self.days_df_datetime.cumsum()
-        # Reindex targets and get cumulative values
-        targets = self.targets_df_datetime / actuals.shape[0]
-        targets = targets.reindex(actuals.index, method='ffill').cumsum()
+        # Running sums of days from prefix sums of days_store (no sum over days)
+        day_columns = self.day_columns.between(self.start_date, self.end_date)
+        running_seconds = self.day_columns.prefix_sums().running_totals(self.start_date, self.end_date)
+        actuals = pd.DataFrame(running_seconds[:len(CATEGORIES), day_columns.valid].T.astype('timedelta64[s]'),
+                               index=pd.DatetimeIndex(day_columns.dates(), name='id'),
+                               columns=CATEGORIES).astype('timedelta64[ns]')
+        # Cumulative daily targets (for days in table days)
+        targets = self.targets_df_daily_datetime.cumsum().reindex(actuals.index)
         df = actuals - targets
         # Convert output to hours
         for column in self.tracking_columns_datetime:
@@ -137,8 +215,8 @@ class DataSet:
         # Add total column
         df['all'] = df.sum(axis=1)
         # Extra content for bokeh
-        # If ref_date is for current month, display only data till today
-        if df.index[0].strftime('%Ym%m') == date.today().strftime('%Ym%m'):
+        # If query period includes current month, display only data till today
+        if self.start_date <= date.today() <= self.end_date:
             df = df[df.index <= datetime.today()]
         # Date to display on axis
         df['date_str'] = [i.strftime('%d %b') for i in df.index]
@@ -149,20 +227,337 @@ class DataSet:
     def create_tracking_current_score_series(self):
         current_score = np.ceil(self.tracking_df_daily_datetime.select_dtypes('number').iloc[0] * 60).astype(int)
         current_score_sign = np.sign(current_score).map(lambda x: '-' if x < 0 else '+')
-        current_score = (abs(current_score).astype(str)+'m').map(udc.timedelta_from_string).map(udc.string_from_timedelta)
+        current_score = udc.string_from_timedelta_array(pd.to_timedelta(abs(current_score), unit='m'))
         current_score = current_score_sign + current_score
         return current_score
 
+    def create_month_summary(self):
+        """Returns MonthSummary with daily statistics and totals of a month. All values are calculated
+        column-wise (cumulative sums and masks) instead of looping over days.
+        Available only for DataSet of one month."""
+        if not self.is_single_month:
+            raise ValueError('Month summary is available only for DataSet of one month')
+        month_calendar = UtilsDatetime(self.month_reference_date).month_calendar
+        today = pd.Timestamp(date.today())
+        categories = self.tracking_columns_datetime
+
+        df = self.days_df_datetime[categories].sort_index()
+        alk = self.days_df_numeric['alk'].reindex(df.index)
+        alk_filled = alk.fillna(0)
+
+        # Daily values
+        df['s_TargetHours'] = target_hours.timedeltas_for(df.index)
+        df['s_TotalProductive'] = df[categories].sum(axis=1)
+        # Rounded to microseconds like multiplication of python timedelta
+        df['s_TotalNegative'] = ((alk_filled - 2.86).clip(lower=0) * timedelta(minutes=20)).dt.round('us')
+        # Days without target hours (e.g. holidays, see targets.py) get 0%
+        df['s_PercOfTarget'] = ((df['s_TotalProductive'] - df['s_TotalNegative']) / df['s_TargetHours']).where(
+            df['s_TargetHours'] > timedelta(), 0.0)
+
+        # Cumulative values
+        cum_target_hours = df['s_TargetHours'].cumsum()
+        df['cum_PercOfTarget'] = ((df['s_TotalProductive'].cumsum() - df['s_TotalNegative'].cumsum())
+                                  / cum_target_hours).where(cum_target_hours > timedelta(), 0.0)
+        df['cum_alk'] = alk_filled.cumsum() / np.arange(1, df.shape[0] + 1) / 7.8 * 750
+
+        # Values displayed in table (missing alk is shown as empty cell)
+        df['alk'] = alk.astype(object).where(alk.notna(), None)
+        df['style_today_tr_hd'] = np.where(df.index == today, 'today_header', '')
+        df['style_today_tr_td'] = np.where(df.index == today, 'today_cell', '')
+        df.insert(0, 'id', df.index.date)
+
+        # Extra fields to display in row summary (two lookups of prefix sums of days_store for each range)
+        # Days of month till today (all days of past months), used to calculate averages
+        days_elapsed = month_calendar.days_elapsed()
+        prefix_sums = self.day_columns.prefix_sums()
+        month_totals = prefix_sums.totals(self.start_date, self.end_date)
+        till_today_totals = prefix_sums.totals(self.start_date, min(date.today(), self.end_date))
+        totals = {col: timedelta(seconds=month_totals[col]) for col in categories}
+        totalproductive = timedelta(seconds=sum(month_totals[col] for col in categories))
+        totalsja = round(month_totals['alk'] / ALK_UNITS / days_elapsed, 2)
+
+        # Planned till today
+        share_of_month = days_elapsed / month_calendar.nb_of_days
+        targets = self.targets_df_datetime[categories].iloc[0]
+        tilltoday = {col: targets[col].to_pytimedelta() * share_of_month for col in categories}
+        total_tilltoday = timedelta(seconds=sum([tilltoday[col].total_seconds() for col in categories]))
+
+        summary_totals = MonthTotals(
+            **totals, targethours=timedelta(seconds=month_totals['target']), totalproductive=totalproductive,
+            totalnegative=timedelta(microseconds=month_totals['negative']), totalsja=totalsja,
+            totalml=int(round(totalsja / 7.8 * 750, 0)), totaldays0=till_today_totals['day0'],
+            targethours_tilltoday=timedelta(seconds=till_today_totals['target']),
+            **{f'{col}_tilltoday': tilltoday[col] for col in categories}, total_tilltoday=total_tilltoday,
+            # Backlog
+            **{f'{col}_backlog': udc.string_from_timedelta_subtraction(totals[col], tilltoday[col])
+               for col in categories},
+            total_backlog=udc.string_from_timedelta_subtraction(totalproductive, total_tilltoday))
+        return MonthSummary(df_days=df.reset_index(drop=True), totals=summary_totals)
+
+
+@dataclass(frozen=True)
+class MonthTotals:
+    """Totals, values planned till today and backlog of a month (summary rows of home page table).
+    Fields of categories (ds, dev, pol, ge, crt, hs) are sums of a month, fields '<category>_tilltoday' are targets
+    planned till today and fields '<category>_backlog' are differences formatted as strings (e.g. '-1h 30m')."""
+    ds: timedelta
+    dev: timedelta
+    pol: timedelta
+    ge: timedelta
+    crt: timedelta
+    hs: timedelta
+    targethours: timedelta
+    totalproductive: timedelta
+    totalnegative: timedelta
+    totalsja: float
+    totalml: int
+    totaldays0: int
+    targethours_tilltoday: timedelta
+    ds_tilltoday: timedelta
+    dev_tilltoday: timedelta
+    pol_tilltoday: timedelta
+    ge_tilltoday: timedelta
+    crt_tilltoday: timedelta
+    hs_tilltoday: timedelta
+    total_tilltoday: timedelta
+    ds_backlog: str
+    dev_backlog: str
+    pol_backlog: str
+    ge_backlog: str
+    crt_backlog: str
+    hs_backlog: str
+    total_backlog: str
+
+
+@dataclass
+class MonthSummary:
+    """Daily statistics and totals of a month displayed on home page.
+
+    Attributes
+    ----------
+    df_days : DataFrame
+        One row per day of a month with categories, alk and calculated daily and cumulative values.
+    totals : MonthTotals
+        Totals, values planned till today and backlog of a month (summary rows of home page table).
+    """
+    df_days: pd.DataFrame
+    totals: MonthTotals
+
+    @cached_property
+    def days(self):
+        """Returns rows of df_days as named tuples (attribute access like in Days model)."""
+        return list(self.df_days.itertuples(index=False, name='Day'))
+
+
+def read_days_dataframe(start_date, end_date, user_id=DEFAULT_USER_ID, connection=None, chunk_size=1000):
+    """Returns days of a user between start_date and end_date read from database as DataFrame with columns id
+    (datetime), categories (timedelta) and alk (missing values are 0). Columns are read into numpy arrays without
+    ORM objects (see daystore.read_days_arrays).
+
+    Parameters
+    ----------
+    start_date, end_date : date
+        First and last date of selected days.
+    user_id : int (default is DEFAULT_USER_ID)
+        User whose days are selected.
+    connection : Connection, optional
+        Connection used for query (default is db.engine).
+    chunk_size : int (default is 1000)
+        Number of rows fetched at once.
+    """
+    df = pd.DataFrame(read_days_arrays(start_date, end_date, user_id, connection=connection, chunk_size=chunk_size))
+    df['id'] = df['id'].astype('datetime64[ns]')
+    df[CATEGORIES] = df[CATEGORIES].astype('timedelta64[ns]').fillna(pd.Timedelta(0))
+    df['alk'] = df['alk'].fillna(0)
+    return df
+
+
+def convert_days_columns_to_dataframe(day_columns, fill_missing=True):
+    """Converts valid days of DayColumns (see days_store) into DataFrame in format of read_days_dataframe.
+    If fill_missing is False, missing alk is kept as NaN."""
+    valid = day_columns.valid
+    all_valid = valid.all()
+    seconds = day_columns.seconds if all_valid else day_columns.seconds[:, valid]
+    alk = day_columns.alk if all_valid else day_columns.alk[valid]
+    data = {'id': day_columns.dates().astype('datetime64[ns]')}
+    for category, values in zip(CATEGORIES, seconds.astype('timedelta64[s]').astype('timedelta64[ns]')):
+        data[category] = values
+    # Values are copied (astype), so DataFrame is not changed by later patches of days_store
+    data['alk'] = np.nan_to_num(alk) if fill_missing else alk.copy()
+    return pd.DataFrame(data)
+
+
+def get_summary_per_month(df_days):
+    """Translates daily data into monthly summary (score, day0, ml and hours used to calculate score)."""
+    df_days['month'] = df_days.id.dt.strftime('%ym%m')
+    df_days['month_first_day'] = df_days.id
+    df_days.alk.fillna(0, inplace=True)
+    df_days.loc[(df_days.alk == 0), 'day0'] = 1
+    df_days['ml'] = df_days.alk / 7.8 * 750
+    df_days['productive_hrs'] = df_days.select_dtypes(include=['timedelta']).sum(axis=1)
+    df_days.loc[df_days['productive_hrs'] == 0, 'productive_hrs'] = timedelta()
+    df_days['target_hrs'] = target_hours.timedeltas_for(pd.DatetimeIndex(df_days.id))
+    df_days['negative_hrs'] = (df_days['alk'] - 2.86).clip(0) * timedelta(minutes=20)
+
+    df_month_score = df_days.groupby('month')[['productive_hrs', 'target_hrs', 'negative_hrs']].sum()
+    df_month_score['score'] = (df_month_score.productive_hrs - df_month_score.negative_hrs) / df_month_score.target_hrs
+    df_month_alk = df_days.groupby('month')[['day0', 'ml', 'id', 'month_first_day']].agg({'day0': sum, 'ml': sum, 'id': 'count', 'month_first_day': 'first'})
+    df_months = df_month_score.join(df_month_alk)
+    df_months['ml'] = (df_months.ml / df_months.id).round(ML_DECIMALS)
+    df_months.rename(columns={'id': 'nb_of_days'}, inplace=True)
+    return df_months[['score', 'day0', 'ml', 'month_first_day', 'productive_hrs', 'target_hrs', 'negative_hrs',
+                      'nb_of_days']]
+
+
+class SqlAggregates:
+    """
+    Aggregations of table days calculated by SQLite: GROUP BY month for monthly summaries, so only small results
+    are read into pandas. If database is not SQLite, callers use pandas instead (get_summary_per_month).
+    """
+    categories = CATEGORIES
+
+    @classmethod
+    def is_available(cls):
+        return db.engine.dialect.name == 'sqlite'
+
+    @classmethod
+    @lru_cache(maxsize=None)
+    def _summary_per_month_statement(cls, storage, target_seconds_sql):
+        """Returns statement of summary_per_month for storage format of durations and SQL expression of target
+        seconds by schedules (created once per format and schedules). Overrides of targets are joined."""
+        productive_seconds = ' + '.join(Duration.sqlite_seconds(column) for column in cls.categories)
+        override_seconds = Duration.sqlite_seconds('target_overrides.target_hrs')
+        return text(f"""
+            SELECT MIN(id) AS month_first_day, SUM(productive) AS productive_hrs, SUM(target) AS target_hrs,
+                   SUM(negative) AS negative_hrs, SUM(alk = 0) AS day0,
+                   ROUND(AVG(alk / 7.8 * 750), {ML_DECIMALS}) AS ml, COUNT(*) AS nb_of_days
+            FROM (SELECT days.id AS id, strftime('%Y-%m', days.id) AS month, {productive_seconds} AS productive,
+                         CASE WHEN target_overrides.id IS NULL THEN {target_seconds_sql}
+                              ELSE {override_seconds} END AS target,
+                         MAX(COALESCE(alk, 0) - 2.86, 0) * 1200 AS negative, COALESCE(alk, 0) AS alk
+                  FROM days LEFT JOIN target_overrides ON target_overrides.id = days.id
+                  WHERE days.user_id = :user_id AND days.id BETWEEN :start_date AND :end_date)
+            GROUP BY month ORDER BY month""")
+
+    @classmethod
+    def summary_per_month(cls, start_date, end_date, user_id=DEFAULT_USER_ID, connection=None):
+        """Returns monthly summaries of days of a user between start_date and end_date calculated with
+        GROUP BY month. Output has format of get_summary_per_month (one row per month).
+
+        Parameters
+        ----------
+        start_date, end_date : date
+            First and last date of selected days.
+        user_id : int (default is DEFAULT_USER_ID)
+            User whose days are selected.
+        connection : Connection, optional
+            Connection used for query (default is db.engine).
+        """
+        statement = cls._summary_per_month_statement(Duration.storage,
+                                                     target_hours.calendar().sqlite_seconds('days.id'))
+        df = read_sql(statement,
+                      db.engine if connection is None else connection, start_date, end_date, user_id,
+                      parse_dates=['month_first_day'])
+        for column in ['productive_hrs', 'target_hrs', 'negative_hrs']:
+            df[column] = pd.to_timedelta(df[column], unit='s')
+        df['score'] = (df.productive_hrs - df.negative_hrs) / df.target_hrs
+        df['day0'] = df.day0.astype(float)
+        df.index = df.month_first_day.dt.strftime('%ym%m').rename('month')
+        return df[['score', 'day0', 'ml', 'month_first_day', 'productive_hrs', 'target_hrs', 'negative_hrs',
+                   'nb_of_days']]
+
+
+class MonthSummaryTable:
+    """
+    Maintains table month_summary - monthly rollup of table days (of each user).
+    Rows are recalculated only for months that were changed, so reading monthly
+    summaries does not depend on length of history.
+    Changes are added to db.session (commit is done by caller).
+    """
+    read_statement = text('SELECT id, score, day0, ml FROM month_summary '
+                          'WHERE user_id = :user_id AND id BETWEEN :start_date AND :end_date ORDER BY id')
+
+    @staticmethod
+    def _save(df_months, user_id, replace_existing=True):
+        """Adds (or replaces) rows of month_summary of a user with output of get_summary_per_month"""
+        save = db.session.merge if replace_existing else db.session.add
+        for month in df_months.itertuples():
+            save(MonthlySummary(user_id=user_id, id=UtilsDatetime(month.month_first_day).month_first_date,
+                                score=float(month.score), day0=int(month.day0), ml=float(month.ml),
+                                productive_hrs=pd.Timedelta(month.productive_hrs).to_pytimedelta(),
+                                target_hrs=pd.Timedelta(month.target_hrs).to_pytimedelta(),
+                                negative_hrs=pd.Timedelta(month.negative_hrs).to_pytimedelta(),
+                                nb_of_days=int(month.nb_of_days)))
+
+    @classmethod
+    def update_month(cls, month_date, user_id=DEFAULT_USER_ID):
+        """Recalculates summary of a month of month_date of a user. Only days of this month are read."""
+        udt = UtilsDatetime(month_date)
+        # Pending changes are flushed and reloaded, so values have types of database columns
+        db.session.flush()
+        if SqlAggregates.is_available():
+            df_months = SqlAggregates.summary_per_month(udt.month_first_date, udt.month_last_date, user_id,
+                                                        connection=db.session.connection())
+        else:
+            df_days = read_days_dataframe(udt.month_first_date, udt.month_last_date, user_id,
+                                          connection=db.session.connection())
+            df_months = get_summary_per_month(df_days) if not df_days.empty else None
+        if df_months is None or df_months.empty:
+            MonthlySummary.query.filter_by(user_id=user_id, id=udt.month_first_date).delete()
+            return
+        cls._save(df_months, user_id)
+
+    @classmethod
+    def rebuild(cls, df_days=None, start_date=None, user_id=None):
+        """Recalculates summaries of all months (e.g. after import of all days) or of months since start_date.
+
+        Parameters
+        ----------
+        df_days : DataFrame, optional
+            All days of a user in format of read_days_dataframe, used if summaries are calculated
+            with pandas (default is None). If None, days are read from database.
+        start_date : date, optional
+            Any date of first recalculated month (default is None: all months are recalculated).
+        user_id : int, optional
+            User whose summaries are recalculated (default is None: all users, e.g. after change of target hours).
+        """
+        if user_id is None:
+            for (user_id, ) in db.session.query(User.id).order_by(User.id).all():
+                cls.rebuild(start_date=start_date, user_id=user_id)
+            return
+
+        first_date = date.min if start_date is None else UtilsDatetime(start_date).month_first_date
+        MonthlySummary.query.filter(MonthlySummary.user_id == user_id, MonthlySummary.id >= first_date).delete()
+        if SqlAggregates.is_available():
+            db.session.flush()
+            df_months = SqlAggregates.summary_per_month(first_date, date.max, user_id,
+                                                        connection=db.session.connection())
+        else:
+            if df_days is None:
+                db.session.flush()
+                df_days = read_days_dataframe(first_date, date.max, user_id, connection=db.session.connection())
+            elif start_date is not None:
+                df_days = df_days[df_days.id >= pd.Timestamp(first_date)]
+            df_months = get_summary_per_month(df_days.copy()) if not df_days.empty else None
+        if df_months is not None and not df_months.empty:
+            cls._save(df_months, user_id, replace_existing=False)
+
+    @classmethod
+    def read(cls, start_date, end_date, user_id=DEFAULT_USER_ID):
+        """Returns summaries of months of a user between start_date and end_date in format of
+        get_summary_per_month: index is month ('21m03'), columns are score, day0, ml and month_first_day."""
+        df = read_sql(cls.read_statement, db.engine, start_date, end_date, user_id, parse_dates=['id'])
+        df['month'] = df.id.dt.strftime('%ym%m')
+        df['day0'] = df.day0.astype(float)
+        df.rename(columns={'id': 'month_first_day'}, inplace=True)
+        return df.set_index('month')[['score', 'day0', 'ml', 'month_first_day']]
+
 
-def get_day_of_month_for_avg_sja(month_start_date, month_end_date):
-    # todo - datasets (it's only used for days statistics)
-    """Returns day of month that is used to divide SJA to get average monthly consumption.
-    If month was in the past - get last day of given month. If month is in the future - get first day of given month."""
-    # If in current month
-    if month_start_date <= date.today() <= month_end_date:
-        day_counter = date.today().day
-    elif date.today() > month_end_date:
-        day_counter = month_end_date.day
-    else:
-        day_counter = month_start_date.day
-    return day_counter
+def backfill_month(month_date, user_id=DEFAULT_USER_ID):
+    """Adds missing days of a month of a user (e.g. when month is opened for the first time) with one statement and
+    updates summary of the month. Returns number of added days (not committed)."""
+    udt = UtilsDatetime(month_date)
+    nb_of_added_days = Days.backfill(udt.month_first_date, udt.month_last_date, user_id)
+    if nb_of_added_days:
+        MonthSummaryTable.update_month(month_date, user_id)
+    return nb_of_added_days
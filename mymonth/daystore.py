@@ -0,0 +1,360 @@
+"""Module contains:
+ - Columns of all days of a user (seconds of categories, alk) kept in numpy arrays indexed by day ordinal,
+ - Prefix sums of columns, so totals of any range of dates are two lookups,
+ - Store of columns of users kept in memory of process: loaded once and patched on each write of days
+"""
+import copy
+from collections import OrderedDict
+from datetime import date
+from threading import Lock
+
+from mymonth.cache import MemoryCacheStore, create_version_store
+from mymonth.targets import EPOCH_ORDINAL
+
+CATEGORIES = ['ds', 'dev', 'pol', 'ge', 'crt', 'hs']
+# Units of alk in prefix sums (integers, so differences of prefix sums are exact)
+ALK_UNITS = 1000000
+
+
+def read_days_arrays(start_date, end_date, user_id, connection=None, chunk_size=1000):
+    """Returns dict with numpy array of each column of days of a user between start_date and end_date
+    (ordered by date): id (datetime64[D]), categories (timedelta64, NaT if missing on other databases than SQLite)
+    and alk (float64, NaN if missing). Rows are fetched from cursor of Core select (no ORM objects) chunk by chunk
+    and each column of a chunk is copied into preallocated array. On SQLite, dates and durations are selected as
+    integers (days since 1970-01-01 and seconds, 0 if missing), so no Python date and timedelta objects are created.
+
+    Parameters
+    ----------
+    start_date, end_date : date
+        First and last date of selected days.
+    user_id : int
+        User whose days are selected.
+    connection : Connection, optional
+        Connection used for query, e.g. db.session.connection() to include changes not committed yet
+        (default is db.engine).
+    chunk_size : int (default is 1000)
+        Number of rows fetched at once.
+    """
+    import numpy as np
+    from sqlalchemy import literal_column, select
+    from mymonth import db
+    from mymonth.columns import Duration
+    from mymonth.models import Days
+
+    table = Days.__table__
+    columns = ['id'] + CATEGORIES + ['alk']
+    connection = db.engine if connection is None else connection
+    if connection.dialect.name == 'sqlite':
+        selected = [literal_column('CAST(julianday(id) - 2440587.5 AS INTEGER)')]
+        selected += [literal_column(Duration.sqlite_seconds(column)) for column in CATEGORIES] + [table.c.alk]
+        dtypes = ['datetime64[D]'] + ['timedelta64[s]'] * len(CATEGORIES) + ['float64']
+    else:
+        selected = [table.c[column] for column in columns]
+        dtypes = ['datetime64[D]'] + ['timedelta64[us]'] * len(CATEGORIES) + ['float64']
+    # Primary key is (user_id, id), so there is at most one row per date (arrays grow only for very long ranges)
+    capacity = min((end_date - start_date).days + 1, 10000)
+    arrays = [np.empty(capacity, dtype=dtype) for dtype in dtypes]
+
+    statement = select(selected).where(
+        (table.c.user_id == user_id) & table.c.id.between(start_date, end_date)).order_by(table.c.id)
+    nb_of_rows = 0
+    result = connection.execution_options(stream_results=True).execute(statement)
+    try:
+        while True:
+            rows = result.fetchmany(chunk_size)
+            if not rows:
+                break
+            chunk_end = nb_of_rows + len(rows)
+            if chunk_end > capacity:
+                capacity = max(2 * capacity, chunk_end)
+                arrays = [np.resize(array, capacity) for array in arrays]
+            for array, values in zip(arrays, zip(*rows)):
+                array[nb_of_rows:chunk_end] = values
+            nb_of_rows = chunk_end
+    finally:
+        result.close()
+    return {column: array[:nb_of_rows] for column, array in zip(columns, arrays)}
+
+
+class DayColumns:
+    """
+    Days of one user between first and last date in numpy arrays indexed by date.toordinal() - first ordinal,
+    so days of any range of dates are one slice (see between):
+     - ordinals (int32): date.toordinal() of each position,
+     - seconds (int32, one row per category of CATEGORIES): durations, 0 if missing,
+     - alk (float64): NaN if missing (float32 would change values like 0.1 shown on home page),
+     - valid (bool): day has row in table days (dates without row have zeros).
+    """
+    def __init__(self, ordinals, seconds, alk, valid):
+        self.ordinals = ordinals
+        self.seconds = seconds
+        self.alk = alk
+        self.valid = valid
+        self._prefix_sums = None
+
+    @classmethod
+    def load(cls, user_id, connection=None):
+        """Returns DayColumns of all days of a user read from table days (one query)."""
+        import numpy as np
+
+        arrays = read_days_arrays(date.min, date.max, user_id, connection=connection)
+        day_ordinals = arrays['id'].astype('int64') + EPOCH_ORDINAL
+        first_ordinal = int(day_ordinals[0]) if day_ordinals.size else date.today().toordinal()
+        last_ordinal = int(day_ordinals[-1]) if day_ordinals.size else first_ordinal - 1
+        positions = day_ordinals - first_ordinal
+        nb_of_days = last_ordinal - first_ordinal + 1
+
+        seconds = np.zeros((len(CATEGORIES), nb_of_days), dtype='int32')
+        for row, category in zip(seconds, CATEGORIES):
+            durations = arrays[category]
+            row[positions] = np.where(np.isnat(durations), 0, durations.astype('timedelta64[s]').astype('int64'))
+        alk = np.full(nb_of_days, np.nan)
+        alk[positions] = arrays['alk']
+        valid = np.zeros(nb_of_days, dtype=bool)
+        valid[positions] = True
+        ordinals = np.arange(first_ordinal, last_ordinal + 1, dtype='int32')
+        return cls(ordinals, seconds, alk, valid)
+
+    def __len__(self):
+        return self.ordinals.size
+
+    @property
+    def first_ordinal(self):
+        return int(self.ordinals[0]) if len(self) else 0
+
+    def _position(self, input_date):
+        return input_date.toordinal() - self.first_ordinal
+
+    def between(self, start_date, end_date):
+        """Returns DayColumns of dates between start_date and end_date (views of arrays, no copy). Dates outside
+        of columns are not included. Views are changed by later patches (values should be copied if kept)."""
+        start = min(max(self._position(start_date), 0), len(self))
+        end = min(max(self._position(end_date) + 1, start), len(self))
+        return DayColumns(self.ordinals[start:end], self.seconds[:, start:end], self.alk[start:end],
+                          self.valid[start:end])
+
+    def dates(self):
+        """Returns dates of valid days (datetime64[D])."""
+        return (self.ordinals[self.valid] - EPOCH_ORDINAL).astype('datetime64[D]')
+
+    def prefix_sums(self):
+        """Returns PrefixSums of columns (built on first use, targets are summed again after change of target hours,
+        must be called in application context if calendar of target hours is not loaded)."""
+        from mymonth import target_hours
+
+        if len(self):
+            calendar = target_hours.calendar(date.fromordinal(self.first_ordinal),
+                                             date.fromordinal(int(self.ordinals[-1])))
+        else:
+            calendar = target_hours.calendar()
+        prefix_sums = self._prefix_sums
+        if prefix_sums is None:
+            prefix_sums = self._prefix_sums = PrefixSums(self, calendar)
+        elif prefix_sums.calendar is not calendar:
+            prefix_sums = self._prefix_sums = prefix_sums.with_calendar(self, calendar)
+        return prefix_sums
+
+    def patched(self, days):
+        """Returns copy of columns with values of days (Days objects) and prefix sums updated (if they are built).
+        Columns are never changed in place, so columns already read by other threads stay consistent.
+        Returns None if any day is outside of columns."""
+        positions = [self._position(day.id) for day in days]
+        if any(position < 0 or position >= len(self) for position in positions):
+            return None
+        # Dates of columns do not change, so ordinals are shared
+        patched = DayColumns(self.ordinals, self.seconds.copy(), self.alk.copy(), self.valid.copy())
+        prefix_sums = None if self._prefix_sums is None else self._prefix_sums.copy()
+        for position, day in zip(positions, days):
+            if prefix_sums is not None:
+                old_values = prefix_sums.daily_values(patched, position, position + 1)
+            for row, category in zip(patched.seconds, CATEGORIES):
+                duration = getattr(day, category)
+                row[position] = 0 if duration is None else int(round(duration.total_seconds()))
+            patched.alk[position] = float('nan') if day.alk is None else day.alk
+            patched.valid[position] = True
+            if prefix_sums is not None:
+                prefix_sums.add(position, prefix_sums.daily_values(patched, position, position + 1) - old_values)
+        patched._prefix_sums = prefix_sums
+        return patched
+
+
+class PrefixSums:
+    """
+    Prefix sums of DayColumns of one user: column i of sums is total of days before position i, so total of any
+    range of dates is difference of two columns (two lookups), whatever the length of range. Only valid days
+    are summed (rows of sums, all integers, so differences are exact):
+     - categories of CATEGORIES: seconds,
+     - target: target seconds (see target_hours),
+     - negative: microseconds of negative hours (20 minutes per alk above 2.86),
+     - alk: alk in units of 1 / ALK_UNITS (missing alk is 0),
+     - days: number of days,
+     - day0: number of days with alk 0 (or missing).
+    Change of one day is added to columns after it in copy of sums (see DayColumns.patched), so sums are not
+    built again.
+    """
+    names = CATEGORIES + ['target', 'negative', 'alk', 'days', 'day0']
+
+    def __init__(self, day_columns, calendar):
+        """
+        Parameters
+        ----------
+        day_columns : DayColumns
+            All days of a user.
+        calendar : TargetCalendar
+            Calendar of target hours that covers dates of day_columns.
+        """
+        import numpy as np
+
+        self.calendar = calendar
+        self.first_ordinal = day_columns.first_ordinal
+        self.sums = np.zeros((len(self.names), len(day_columns) + 1), dtype='int64')
+        np.cumsum(self.daily_values(day_columns, 0, len(day_columns)), axis=1, out=self.sums[:, 1:])
+
+    def daily_values(self, day_columns, start, end):
+        """Returns values summed by prefix sums (one row per name) of days of day_columns between positions start
+        and end (excluded)."""
+        import numpy as np
+
+        valid = day_columns.valid[start:end]
+        alk = np.nan_to_num(day_columns.alk[start:end])
+        values = np.zeros((len(self.names), end - start), dtype='int64')
+        values[:len(CATEGORIES)] = day_columns.seconds[:, start:end]
+        if end > start:
+            values[len(CATEGORIES)] = self.calendar.seconds_between(
+                date.fromordinal(int(day_columns.ordinals[start])), date.fromordinal(int(day_columns.ordinals[end - 1])))
+        values[len(CATEGORIES) + 1] = np.round((alk - 2.86).clip(0) * 1200 * 1000000)
+        values[len(CATEGORIES) + 2] = np.round(alk * ALK_UNITS)
+        values[len(CATEGORIES) + 3] = 1
+        values[len(CATEGORIES) + 4] = alk <= 0
+        # Dates without row in table days are not summed
+        values[:, ~valid] = 0
+        return values
+
+    def _bounds(self, start_date, end_date):
+        """Returns columns of sums of dates between start_date and end_date (clipped to dates of days)."""
+        nb_of_days = self.sums.shape[1] - 1
+        start = min(max(start_date.toordinal() - self.first_ordinal, 0), nb_of_days)
+        end = min(max(end_date.toordinal() - self.first_ordinal + 1, start), nb_of_days)
+        return start, end
+
+    def totals(self, start_date, end_date):
+        """Returns dict with totals (name: int) of days between start_date and end_date (0 if there are no days)."""
+        start, end = self._bounds(start_date, end_date)
+        return dict(zip(self.names, (self.sums[:, end] - self.sums[:, start]).tolist()))
+
+    def running_totals(self, start_date, end_date):
+        """Returns array of totals (one row per name) from start_date till each date between start_date and
+        end_date (one column per date of DayColumns.between)."""
+        start, end = self._bounds(start_date, end_date)
+        return self.sums[:, start + 1:end + 1] - self.sums[:, start:start + 1]
+
+    def copy(self):
+        prefix_sums = copy.copy(self)
+        prefix_sums.sums = self.sums.copy()
+        return prefix_sums
+
+    def with_calendar(self, day_columns, calendar):
+        """Returns copy of sums with target seconds of calendar (e.g. after change of target hours)."""
+        import numpy as np
+
+        prefix_sums = self.copy()
+        prefix_sums.calendar = calendar
+        row = len(CATEGORIES)
+        np.cumsum(prefix_sums.daily_values(day_columns, 0, len(day_columns))[row], out=prefix_sums.sums[row, 1:])
+        return prefix_sums
+
+    def add(self, position, change):
+        """Adds change of values (one column of daily_values) of day at position (only to copy that is not shared
+        yet, see DayColumns.patched)."""
+        self.sums[:, position + 1:] += change
+
+
+class DaysStore:
+    """
+    DayColumns of users kept in memory of process, so views of days read only slices of arrays instead of
+    querying table days. Columns of a user are loaded on first use (or by preload, before worker processes are
+    forked) and replaced by patched copies by routes that write days (see patch and invalidate).
+    Each write increases data version of a user in store of versions (see cache.create_version_store) shared by
+    worker processes, so columns loaded by other processes are loaded again on their next use.
+    Only last used DAYS_STORE_MAX_USERS users are kept.
+    """
+    def __init__(self, app=None, max_users=100):
+        self.max_users = max_users
+        self.versions = MemoryCacheStore()
+        self._columns = OrderedDict()
+        self._lock = Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.max_users = app.config.get('DAYS_STORE_MAX_USERS', self.max_users)
+        self.versions = create_version_store(app)
+        self.clear()
+
+    @staticmethod
+    def _version_name(user_id):
+        return f'days:{user_id}'
+
+    def _keep(self, user_id, version, columns):
+        with self._lock:
+            self._columns[user_id] = (version, columns)
+            self._columns.move_to_end(user_id)
+            while len(self._columns) > self.max_users:
+                self._columns.popitem(last=False)
+
+    def columns(self, user_id):
+        """Returns DayColumns of all days of a user (must be called in application context if columns are not
+        loaded yet or were changed by other process)."""
+        # Version is read before days, so days written meanwhile are loaded again on next use
+        (version, ) = self.versions.versions([self._version_name(user_id)])
+        with self._lock:
+            loaded = self._columns.get(user_id)
+            if loaded is not None and loaded[0] == version:
+                self._columns.move_to_end(user_id)
+                return loaded[1]
+        columns = DayColumns.load(user_id)
+        self._keep(user_id, version, columns)
+        return columns
+
+    def between(self, user_id, start_date, end_date):
+        """Returns DayColumns of a user of dates between start_date and end_date (views, no copy)."""
+        return self.columns(user_id).between(start_date, end_date)
+
+    def totals(self, user_id, start_date, end_date):
+        """Returns dict with totals of days of a user between start_date and end_date (any range, e.g. month till
+        today, week or quarter): two lookups of prefix sums (see PrefixSums)."""
+        return self.columns(user_id).prefix_sums().totals(start_date, end_date)
+
+    def running_totals(self, user_id, start_date, end_date):
+        """Returns array of totals of days of a user from start_date till each date between start_date and end_date
+        (see PrefixSums.running_totals)."""
+        return self.columns(user_id).prefix_sums().running_totals(start_date, end_date)
+
+    def preload(self, user_ids):
+        """Loads columns of users (e.g. in master process, so worker processes share them)."""
+        for user_id in list(user_ids)[-self.max_users:]:
+            self.columns(user_id)
+
+    def patch(self, user_id, days):
+        """Replaces loaded columns of a user by copy with values of days (Days objects, called after commit) and
+        marks days of a user as changed."""
+        (version, ) = self.versions.increment([self._version_name(user_id)])
+        with self._lock:
+            loaded = self._columns.pop(user_id, None)
+        # Columns are patched only if no other write happened since they were loaded (e.g. in other process),
+        # otherwise they are loaded again on next use
+        if loaded is not None and loaded[0] + 1 == version:
+            columns = loaded[1].patched(days)
+            if columns is not None:
+                self._keep(user_id, version, columns)
+
+    def invalidate(self, user_id):
+        """Marks all days of a user as changed (e.g. after import or after days were added): columns are loaded
+        again on next use (called after commit)."""
+        self.versions.increment([self._version_name(user_id)])
+        with self._lock:
+            self._columns.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._columns.clear()
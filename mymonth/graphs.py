@@ -1,95 +1,41 @@
 # todo - create proper classes
 from datetime import date, timedelta
 import pandas as pd
-import numpy as np
 from bokeh.embed import components
 from bokeh.models import ColumnDataSource, Range1d, NumeralTickFormatter, LinearAxis, LabelSet
-from bokeh.plotting import figure, show, output_file
+from bokeh.plotting import figure
 
-from mymonth.defaults import Defaults
-from mymonth.datasets import DataSet
-from mymonth.utils import UtilsDataConversion as udc
+from mymonth import metrics, days_store
+from mymonth.models import DEFAULT_USER_ID
+from mymonth.daystore import ALK_UNITS, CATEGORIES
+from mymonth.datasets import MonthSummaryTable, ML_DECIMALS
 from mymonth.utils import mapper_suffix_to_day
 
 
 class MonthlyGraph:
     # todo - rename and move to graphs.py
-    def __init__(self, db_table):
+    def __init__(self, db_table, user_id=DEFAULT_USER_ID):
         self.db_table = db_table
-        self.db_table_query_output = self.get_historical_data_from_db()
-        self.df_days = self.convert_days_model_to_dataframe(self.db_table_query_output)
-        self.df_months = self.get_summary_per_month(self.df_days)
-        # Append current month summary
-        self.df_months = self.df_months.append(self.get_summary_for_current_month())
+        self.user_id = user_id
+        with metrics.phase('pandas'):
+            self.df_months = self.get_historical_summary_from_db(user_id=user_id)
+            # Append current month summary
+            self.df_months = pd.concat([self.df_months, self.get_summary_for_current_month()])
         # Graph
         self.bokeh_monthly_components = self.get_monthly_graph_components(self.df_months)
 
-    def get_historical_data_from_db(self, reference_date=None, display_years=2):
-        # todo - move to datasets
-        """Returns DataFrame with all entries between:
-         - last day of previous month (selection=reference_date), and:
-         - first day of current year - 'display_years'."""
+    @staticmethod
+    def get_historical_summary_from_db(reference_date=None, display_years=2, user_id=DEFAULT_USER_ID):
+        """Returns DataFrame with monthly summaries (from table month_summary) of a user of months between:
+         - previous month (selection=reference_date), and:
+         - first month of current year - 'display_years'."""
 
         if reference_date is None:
             reference_date = date.today()
 
         query_last_date = date(reference_date.year, reference_date.month, 1) - timedelta(days=1)
         query_first_date = date(reference_date.year - display_years, 1, 1)
-        query_output = self.db_table.query.filter(self.db_table.id.between(query_first_date, query_last_date)).all()
-        return query_output
-
-    @staticmethod
-    def convert_days_model_to_dataframe(query_output):
-        # todo - move to datasets and make it smarter
-        """"Converts 'Days' query output into pandas DataFrame."""
-        id = []
-        ds = []
-        dev = []
-        pol = []
-        ge = []
-        crt = []
-        hs = []
-        alk = []
-        for row in query_output:
-            id.append(row.id)
-            ds.append(row.ds)
-            dev.append(row.dev)
-            pol.append(row.pol)
-            ge.append(row.ge)
-            crt.append(row.crt)
-            hs.append(row.hs)
-            alk.append(row.alk)
-        df = pd.DataFrame(data={'id': id, 'ds': ds, 'dev': dev, 'pol': pol, 'ge': ge, 'crt': crt, 'hs': hs, 'alk': alk})
-
-        df.id = pd.to_datetime(df.id)
-        # Fill nans
-        columns_numerical = df.select_dtypes(include=['float64', 'int']).columns
-        columns_timedelta = df.select_dtypes(include=['timedelta']).columns
-        df[columns_timedelta] = df[columns_timedelta].fillna(timedelta())
-        df[columns_numerical] = df[columns_numerical].fillna(0)
-        return df
-
-    @staticmethod
-    def get_summary_per_month(df_days):
-        # todo - move to datasets
-        """Translates daily data into monthly summary"""
-        df_days['month'] = df_days.id.dt.strftime('%ym%m')
-        df_days['month_first_day'] = df_days.id
-        df_days.alk.fillna(0, inplace=True)
-        df_days.loc[(df_days.alk == 0), 'day0'] = 1
-        df_days['ml'] = df_days.alk / 7.8 * 750
-        df_days['productive_hrs'] = df_days.select_dtypes(include=['timedelta']).sum(axis=1)
-        df_days.loc[df_days['productive_hrs'] == 0, 'productive_hrs'] = timedelta()
-        df_days['target_hrs'] = df_days.id.map(Defaults.productive_hours_by_weekday)
-        df_days['negative_hrs'] = (df_days['alk'] - 2.86).clip(0) * timedelta(minutes=20)
-
-        df_month_score = df_days.groupby('month')[['productive_hrs', 'target_hrs', 'negative_hrs']].sum()
-        df_month_score['score'] = (df_month_score.productive_hrs - df_month_score.negative_hrs) / df_month_score.target_hrs
-        df_month_alk = df_days.groupby('month')[['day0', 'ml', 'id', 'month_first_day']].agg({'day0': sum, 'ml': sum, 'id': 'count', 'month_first_day': 'first'})
-        df_months = df_month_score.join(df_month_alk)
-        df_months['ml'] = df_months.ml / df_months.id
-        df_months = df_months[['score', 'day0', 'ml', 'month_first_day']]
-        return df_months
+        return MonthSummaryTable.read(query_first_date, query_last_date, user_id)
 
     def get_summary_for_current_month(self, reference_date=None):
         # todo - move to datasets
@@ -99,13 +45,25 @@ class MonthlyGraph:
 
         query_last_date = reference_date
         query_first_date = date(reference_date.year, reference_date.month, 1)
-        query_output = self.db_table.query.filter(self.db_table.id.between(query_first_date, query_last_date)).all()
-
-        df_days = self.convert_days_model_to_dataframe(query_output)
-        df_months = self.get_summary_per_month(df_days)
-        return df_months
+        # Totals of month till today are two lookups of prefix sums of days_store
+        totals = days_store.totals(self.user_id, query_first_date, query_last_date)
+        nb_of_days = totals['days']
+        df_months = pd.DataFrame({
+            'productive_hrs': pd.to_timedelta([sum(totals[category] for category in CATEGORIES)], unit='s'),
+            'target_hrs': pd.to_timedelta([totals['target']], unit='s'),
+            'negative_hrs': pd.to_timedelta([totals['negative']], unit='us'),
+            'day0': [float(totals['day0'])],
+            'ml': [round(totals['alk'] / ALK_UNITS / nb_of_days / 7.8 * 750, ML_DECIMALS) if nb_of_days else 0.0],
+            'month_first_day': [pd.Timestamp(query_first_date)]},
+            index=pd.Index([query_first_date.strftime('%ym%m')], name='month'))
+        df_months['score'] = (df_months.productive_hrs - df_months.negative_hrs) / df_months.target_hrs
+        if not nb_of_days:
+            # Month without days has no summary row
+            df_months = df_months.iloc[:0]
+        return df_months[['score', 'day0', 'ml', 'month_first_day']]
 
     @staticmethod
+    @metrics.timed('bokeh')
     def get_monthly_graph_components(df_month):
         # todo - move to graphs
         df_month['labels_ml'] = df_month['ml'].astype(int).astype(str)
@@ -151,6 +109,48 @@ class MonthlyGraph:
 
 class Graph:
     @staticmethod
+    @metrics.timed('bokeh')
+    def get_graph_components_daily_progress(df_days, month_calendar):
+        """Returns bokeh components for graph with cumulative ml and % of target (df_days of MonthSummary,
+        month_calendar is utils.MonthCalendar of the month)."""
+        y_alk_cum = df_days['cum_alk'].tolist()
+        y_alk_cum_text = [str(int(value)) for value in y_alk_cum]
+        y_score_cum = df_days['cum_PercOfTarget'].tolist()
+        y_score_cum_text = [str(int(round(value, 2)*100)) for value in y_score_cum]
+        x_days = month_calendar.days_of_month.tolist()
+        # Bar is displayed only for today
+        y_todaybar_top = [None] * month_calendar.nb_of_days
+        today_index = month_calendar.day_index(date.today())
+        if today_index is not None:
+            y_todaybar_top[today_index] = max(y_alk_cum)
+
+        source = ColumnDataSource(data=dict(x_days=x_days, y_alk_cum=y_alk_cum, y_score_cum=y_score_cum, y_score_cum_text=y_score_cum_text, y_alk_cum_text=y_alk_cum_text, y_todaybar_top=y_todaybar_top))
+
+        plot = figure(title='Daily Progress', x_axis_label='day', y_axis_label='ml cumm.%', plot_width=600, plot_height=400, toolbar_location=None)
+
+        # Today selection
+        plot.vbar(x='x_days', width=1, top='y_todaybar_top', source=source, color='#98FB98', alpha=0.5)
+
+        # Alk
+        plot.line(x='x_days', y='y_alk_cum', color="maroon", source=source)
+        plot.circle(x='x_days', y='y_alk_cum', color="maroon", fill_color="white", size=5, source=source)
+        labels_alk = LabelSet(x='x_days', y='y_alk_cum', text='y_alk_cum_text', text_font_size='10px', text_color='maroon', y_offset=5, level='annotation', source=source, render_mode='canvas')
+
+        # Score
+        plot.extra_y_ranges['y_axis_for_target_perc'] = Range1d(min(0, min(source.data.get('y_score_cum'))), max(max(source.data.get('y_score_cum')), 1)*1.05)
+        plot.line(x='x_days', y='y_score_cum', source=source, color="cornflowerblue", y_range_name='y_axis_for_target_perc')
+        plot.circle(x='x_days', y='y_score_cum', source=source, color="cornflowerblue", fill_color="white", size=5, y_range_name='y_axis_for_target_perc')
+        labels_score = LabelSet(x='x_days', y='y_score_cum', text='y_score_cum_text', text_font_size='10px', text_color='cornflowerblue', y_offset=5, y_range_name='y_axis_for_target_perc', level='annotation', source=source, render_mode='canvas')
+
+        ax_right = LinearAxis(y_range_name="y_axis_for_target_perc", axis_label="% of target cum.")
+        ax_right.axis_label_text_color = "blue"
+        plot.add_layout(ax_right, 'right')
+        plot.add_layout(labels_score)
+        plot.add_layout(labels_alk)
+        return components(plot)
+
+    @staticmethod
+    @metrics.timed('bokeh')
     def get_graph_components_tracking_daily_time(input_df, score=None):
         """Returns bokeh components for graph."""
         df = input_df.copy()
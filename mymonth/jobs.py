@@ -0,0 +1,244 @@
+"""Module contains:
+ - Runner of background jobs (import and export of database) in local thread pool, with status and progress
+"""
+import json
+import os
+import re
+import tempfile
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import datetime
+from threading import Lock
+
+from flask import current_app
+
+
+class JobError(Exception):
+    """Expected failure of job caused by its input (e.g. invalid import file). Its message is shown in status
+    of job, messages of other exceptions are only logged."""
+
+
+class Job:
+    """State of one background job. Updated by job function (see update) and read by status route (to_dict)."""
+    # Minimum interval [s] between calls of on_change after progress updates
+    progress_interval = 0.5
+
+    def __init__(self, name, owner=None, on_change=None):
+        self.id = uuid.uuid4().hex
+        self.name = name
+        # Id of user that submitted job (only owner can read its status and file)
+        self.owner = owner
+        self.status = 'queued'  # queued, running, finished or failed
+        self.rows = 0
+        self.rows_total = None
+        self.error = None
+        self.result = None
+        # Path and download name of file written by job (e.g. export)
+        self.result_path = None
+        self.result_name = None
+        self.created = datetime.now()
+        self.finished = None
+        self.future = None
+        # Called with job after change of status or progress (e.g. to share state with other processes)
+        self.on_change = on_change
+        self._last_change = 0.0
+
+    @property
+    def progress(self):
+        """Returns fraction of processed rows (None if number of rows is not known yet)."""
+        if self.status == 'finished':
+            return 1.0
+        if not self.rows_total:
+            return None
+        return min(self.rows / self.rows_total, 1.0)
+
+    def update(self, rows=None, rows_total=None):
+        if rows is not None:
+            self.rows = rows
+        if rows_total is not None:
+            self.rows_total = rows_total
+        self.changed(progress_only=True)
+
+    def add_rows(self, nb_rows):
+        self.rows += nb_rows
+        self.changed(progress_only=True)
+
+    def changed(self, progress_only=False):
+        """Calls on_change (changes of progress at most once per progress_interval)."""
+        if self.on_change is None:
+            return
+        now = time.monotonic()
+        if not progress_only or now - self._last_change >= self.progress_interval:
+            self._last_change = now
+            self.on_change(self)
+
+    def to_dict(self):
+        return {'id': self.id, 'name': self.name, 'status': self.status, 'progress': self.progress,
+                'rows': self.rows, 'rows_total': self.rows_total, 'error': self.error, 'result': self.result,
+                'has_file': self.result_path is not None,
+                'created': self.created.isoformat(timespec='seconds'),
+                'finished': None if self.finished is None else self.finished.isoformat(timespec='seconds')}
+
+    def state(self):
+        """Returns attributes of job as json serializable dict (see from_state)."""
+        return {'id': self.id, 'name': self.name, 'owner': self.owner, 'status': self.status, 'rows': self.rows,
+                'rows_total': self.rows_total, 'error': self.error, 'result': self.result,
+                'result_path': self.result_path, 'result_name': self.result_name,
+                'created': self.created.isoformat(),
+                'finished': None if self.finished is None else self.finished.isoformat()}
+
+    @classmethod
+    def from_state(cls, state):
+        """Returns Job (without future) with attributes from output of state."""
+        job = cls(state['name'], owner=state['owner'])
+        for attribute in ['id', 'status', 'rows', 'rows_total', 'error', 'result', 'result_path', 'result_name']:
+            setattr(job, attribute, state[attribute])
+        job.created = datetime.fromisoformat(state['created'])
+        job.finished = None if state['finished'] is None else datetime.fromisoformat(state['finished'])
+        return job
+
+
+class JobRunner:
+    """
+    Runs jobs in thread pool of application process (config JOBS_MAX_WORKERS, default 1, so jobs that write
+    into SQLite database never wait for each other). Jobs run in application context, so they use db.session
+    like routes. Only last JOBS_KEEP jobs are kept (files of removed jobs are deleted).
+    Pool is created with first job (not in create_app), so no threads exist before workers are forked.
+    If config JOBS_SHARED_STATE is set (several worker processes), state of each job is also written
+    to JOBS_RESULTS_DIR, so status of job is available in all workers.
+    """
+    def __init__(self, app=None, max_workers=1, keep=100):
+        """
+        Parameters
+        ----------
+        app : Flask (default is None)
+            Application with optional config JOBS_MAX_WORKERS, JOBS_KEEP and JOBS_RESULTS_DIR.
+        max_workers : int (default is 1)
+            Number of threads running jobs.
+        keep : int (default is 100)
+            Maximum number of jobs kept for status route.
+        """
+        self.max_workers = max_workers
+        self.keep = keep
+        self.results_dir = os.path.join(tempfile.gettempdir(), 'mymonth_jobs')
+        self.shared_state = False
+        self._executor = None
+        self._jobs = OrderedDict()
+        self._lock = Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.max_workers = app.config.get('JOBS_MAX_WORKERS', self.max_workers)
+        self.keep = app.config.get('JOBS_KEEP', self.keep)
+        self.results_dir = app.config.get('JOBS_RESULTS_DIR', self.results_dir)
+        self.shared_state = app.config.get('JOBS_SHARED_STATE', self.shared_state)
+
+    def submit(self, name, func, *args, result_name=None, owner=None, **kwargs):
+        """Runs func(job, *args, **kwargs) in background (in application context). Returns Job.
+        Value returned by func is kept as job.result (must be json serializable). If job writes a file,
+        result_name is its download name and func writes it to job.result_path. Owner is id of user that
+        submitted job."""
+        app = current_app._get_current_object()
+        job = Job(name, owner=owner, on_change=self._save_state if self.shared_state else None)
+        if result_name is not None or self.shared_state:
+            make_private_dir(self.results_dir)
+        if result_name is not None:
+            job.result_name = result_name
+            job.result_path = os.path.join(self.results_dir, f'{job.id}_{result_name}')
+        job.changed()
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='mymonth-job')
+            self._jobs[job.id] = job
+            self._remove_old_jobs()
+            job.future = self._executor.submit(self._run, app, job, func, args, kwargs)
+        return job
+
+    @staticmethod
+    def _run(app, job, func, args, kwargs):
+        with app.app_context():
+            job.status = 'running'
+            job.changed()
+            try:
+                job.result = func(job, *args, **kwargs)
+                job.status = 'finished'
+            except JobError as error:
+                app.logger.warning(f'Job {job.name} {job.id} failed: {error}')
+                job.error = str(error)
+                job.status = 'failed'
+            except Exception:
+                app.logger.exception(f'Job {job.name} {job.id} failed')
+                job.error = f'Job {job.name} failed because of internal error'
+                job.status = 'failed'
+            job.finished = datetime.now()
+            job.changed()
+
+    def _remove_old_jobs(self):
+        finished_jobs = [job for job in self._jobs.values() if job.status in ['finished', 'failed']]
+        for job in finished_jobs[:max(len(self._jobs) - self.keep, 0)]:
+            del self._jobs[job.id]
+            for path in [job.result_path, self._state_path(job.id) if self.shared_state else None]:
+                if path is not None and os.path.exists(path):
+                    os.remove(path)
+
+    def _state_path(self, job_id):
+        return os.path.join(self.results_dir, f'{job_id}.json')
+
+    def _save_state(self, job):
+        state = json.dumps(job.state()).encode()
+        write_atomically(self._state_path(job.id), lambda output_file: output_file.write(state))
+
+    def _in_results_dir(self, path):
+        results_dir = os.path.realpath(self.results_dir)
+        return os.path.commonpath([results_dir, os.path.realpath(path)]) == results_dir
+
+    def get(self, job_id):
+        """Returns Job or None. Jobs of other worker processes are read from their state (if shared). Job whose
+        file is not in results_dir is not returned, so its state can't make file route send other files."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is not None or not self.shared_state or not re.fullmatch('[0-9a-f]{32}', job_id):
+            return job
+        try:
+            with open(self._state_path(job_id), 'rb') as state_file:
+                job = Job.from_state(json.loads(state_file.read()))
+        except FileNotFoundError:
+            return None
+        if job.result_path is not None and not self._in_results_dir(job.result_path):
+            current_app.logger.warning(f'State of job {job_id} has file outside of {self.results_dir}')
+            return None
+        return job
+
+    def wait(self, job_id, timeout=None):
+        """Waits until job of this process is done (e.g. in benchmarks). Returns Job."""
+        job = self.get(job_id)
+        if job.future is not None:
+            wait([job.future], timeout=timeout)
+        return job
+
+
+def make_private_dir(path):
+    """Creates directory (with parents) accessible only by user of process. Returns path. Raises PermissionError
+    if directory exists and belongs to other user (files in it are trusted, e.g. cache and state of jobs)."""
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    if hasattr(os, 'getuid'):
+        if os.stat(path).st_uid != os.getuid():
+            raise PermissionError(f'Directory {path} belongs to other user')
+        os.chmod(path, 0o700)
+    return path
+
+
+def write_atomically(path, write):
+    """Calls write(file_object) on temporary file next to path, then renames it to path. Other processes
+    never see partially written file and path is not changed if write fails."""
+    temp_path = f'{path}.part'
+    try:
+        with open(temp_path, 'wb') as output_file:
+            write(output_file)
+        os.replace(temp_path, path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
@@ -0,0 +1,247 @@
+"""Module contains:
+ - Timing of request phases (sql, pandas, bokeh, jinja) with histograms (since start) and quantiles of recent
+   requests exposed on /metrics in Prometheus text format (config METRICS_ENABLED)
+"""
+import time
+from bisect import bisect_left
+from collections import deque
+from functools import wraps
+from threading import Lock, local
+
+from flask import Response, request
+
+from mymonth.database import listen_all_engines
+
+# Upper bounds of histogram buckets [s]
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Quantiles of durations of recent requests (gauges)
+QUANTILES = (0.5, 0.9, 0.99)
+
+
+class _NoPhase:
+    """Context manager that does nothing (used when metrics are disabled or outside of request)."""
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+NO_PHASE = _NoPhase()
+
+
+class PhaseTimer:
+    """
+    Exclusive time of phases of one request. Time of nested phase (e.g. sql inside pandas) is counted only
+    in nested phase, so durations of all phases add up to duration of request. Time outside of any phase is
+    counted as 'other'.
+    """
+    def __init__(self):
+        self.start = self._mark = time.perf_counter()
+        self._stack = []
+        self._current = 'other'
+        self.durations = {}
+
+    def _switch(self, phase):
+        now = time.perf_counter()
+        self.durations[self._current] = self.durations.get(self._current, 0.0) + now - self._mark
+        self._current = phase
+        self._mark = now
+
+    def enter(self, phase):
+        self._stack.append(self._current)
+        self._switch(phase)
+
+    def exit(self):
+        self._switch(self._stack.pop())
+
+    def stop(self):
+        """Returns total duration of request (remaining time is added to current phase)."""
+        self._switch(self._current)
+        return self._mark - self.start
+
+
+class Histogram:
+    """
+    Durations since start of process: counts of buckets, sum and count only grow (Prometheus histogram).
+    Last 'window' durations are also kept for quantiles of recent requests.
+    """
+    def __init__(self, window):
+        self.bucket_counts = [0] * (len(BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self.recent = deque(maxlen=window)
+
+    def observe(self, duration):
+        self.bucket_counts[bisect_left(BUCKETS, duration)] += 1
+        self.sum += duration
+        self.count += 1
+        self.recent.append(duration)
+
+    def snapshot(self):
+        """Returns copy (exported outside of lock)."""
+        histogram = Histogram(0)
+        histogram.bucket_counts, histogram.sum, histogram.count = list(self.bucket_counts), self.sum, self.count
+        histogram.recent = sorted(self.recent)
+        return histogram
+
+    def quantile(self, q):
+        """Returns quantile q of recent durations of snapshot (nearest rank)."""
+        return self.recent[min(int(q * len(self.recent)), len(self.recent) - 1)]
+
+
+class _Phase:
+    def __init__(self, timer, name):
+        self.timer = timer
+        self.name = name
+
+    def __enter__(self):
+        self.timer.enter(self.name)
+        return self
+
+    def __exit__(self, *exc_info):
+        self.timer.exit()
+        return False
+
+
+class RequestMetrics:
+    """
+    Durations of requests and their phases per endpoint. Histograms on /metrics count all requests since start
+    (cumulative, so rates can be calculated by Prometheus). Quantiles are calculated from last 'window' durations
+    of each endpoint (and phase) and describe recent requests.
+    If disabled (default), nothing is registered in application and phase() returns shared no-op context.
+    """
+    def __init__(self, app=None, window=1000):
+        """
+        Parameters
+        ----------
+        app : Flask (default is None)
+            Application with optional config METRICS_ENABLED and METRICS_WINDOW.
+        window : int (default is 1000)
+            Number of last durations of each endpoint and phase used for quantiles.
+        """
+        self.enabled = False
+        self.window = window
+        self._local = local()
+        self._lock = Lock()
+        self._requests = {}
+        self._histograms = {}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.enabled = app.config.get('METRICS_ENABLED', self.enabled)
+        self.window = app.config.get('METRICS_WINDOW', self.window)
+        if not self.enabled:
+            return
+
+        app.before_request(self._start_request)
+        app.teardown_request(self._stop_request)
+        app.add_url_rule('/metrics', 'metrics', self.metrics_view)
+        listen_all_engines({'before_cursor_execute': self._before_cursor_execute,
+                            'after_cursor_execute': self._after_cursor_execute,
+                            'handle_error': self._after_cursor_execute})
+
+    def _timer(self):
+        return getattr(self._local, 'timer', None)
+
+    def phase(self, name):
+        """Returns context manager that counts its time as phase 'name' of current request."""
+        if not self.enabled:
+            return NO_PHASE
+        timer = self._timer()
+        if timer is None:
+            return NO_PHASE
+        return _Phase(timer, name)
+
+    def timed(self, name):
+        """Decorator that counts time of function as phase 'name' of current request."""
+        def decorator(func):
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.phase(name):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def _start_request(self):
+        self._local.timer = None if request.endpoint == 'metrics' else PhaseTimer()
+
+    def _stop_request(self, exception=None):
+        timer = self._timer()
+        self._local.timer = None
+        if timer is None:
+            return
+        total = timer.stop()
+        self.observe(request.endpoint or 'none', total, timer.durations)
+
+    def _before_cursor_execute(self, *args):
+        timer = self._timer()
+        if timer is not None:
+            timer.enter('sql')
+
+    def _after_cursor_execute(self, *args):
+        timer = self._timer()
+        if timer is not None and timer._current == 'sql':
+            timer.exit()
+
+    def observe(self, endpoint, total, phases):
+        """Adds duration of request (total) and durations of its phases (dict: phase -> seconds)."""
+        with self._lock:
+            self._requests[endpoint] = self._requests.get(endpoint, 0) + 1
+            for phase, duration in [(None, total), *phases.items()]:
+                key = endpoint, phase
+                if key not in self._histograms:
+                    self._histograms[key] = Histogram(self.window)
+                self._histograms[key].observe(duration)
+
+    def clear(self):
+        with self._lock:
+            self._requests.clear()
+            self._histograms.clear()
+
+    @staticmethod
+    def _histogram_lines(name, labels, histogram):
+        lines = []
+        cumulative = 0
+        for upper_bound, count in zip([*BUCKETS, '+Inf'], histogram.bucket_counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{labels},le="{upper_bound}"}} {cumulative}')
+        lines.append(f'{name}_sum{{{labels}}} {histogram.sum}')
+        lines.append(f'{name}_count{{{labels}}} {histogram.count}')
+        return lines
+
+    @staticmethod
+    def _quantile_lines(name, labels, histogram):
+        return [f'{name}{{{labels},quantile="{q}"}} {histogram.quantile(q)}' for q in QUANTILES]
+
+    def export(self):
+        """Returns metrics in Prometheus text format."""
+        with self._lock:
+            requests = sorted(self._requests.items())
+            histograms = sorted(((endpoint, phase or ''), histogram.snapshot())
+                                for (endpoint, phase), histogram in self._histograms.items())
+        labels = [(phase, f'endpoint="{endpoint}"' + (f',phase="{phase}"' if phase else ''), histogram)
+                  for (endpoint, phase), histogram in histograms]
+
+        lines = ['# HELP mymonth_requests_total Number of requests.',
+                 '# TYPE mymonth_requests_total counter']
+        lines += [f'mymonth_requests_total{{endpoint="{endpoint}"}} {count}' for endpoint, count in requests]
+        for name, recent_name, description, of_phases in [
+                ('mymonth_request_duration_seconds', 'mymonth_request_duration_recent_seconds',
+                 'Duration of requests', False),
+                ('mymonth_request_phase_duration_seconds', 'mymonth_request_phase_duration_recent_seconds',
+                 'Duration of phases (sql, pandas, bokeh, jinja, other) of requests', True)]:
+            series = [(histogram_labels, histogram) for phase, histogram_labels, histogram in labels
+                      if bool(phase) == of_phases]
+            lines += [f'# HELP {name} {description}.', f'# TYPE {name} histogram']
+            for histogram_labels, histogram in series:
+                lines += self._histogram_lines(name, histogram_labels, histogram)
+            lines += [f'# HELP {recent_name} {description}: quantiles of last {self.window}.',
+                      f'# TYPE {recent_name} gauge']
+            for histogram_labels, histogram in series:
+                lines += self._quantile_lines(recent_name, histogram_labels, histogram)
+        return '\n'.join(lines) + '\n'
+
+    def metrics_view(self):
+        return Response(self.export(), mimetype='text/plain; version=0.0.4')
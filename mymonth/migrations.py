@@ -0,0 +1,102 @@
+"""Module contains:
+ - Initialization of database (explicit step: run.py or 'flask init-db', never at import),
+ - Migrations of existing databases (skipped if not needed)
+"""
+from flask import current_app
+from sqlalchemy import MetaData, Integer, inspect
+from mymonth import db, days_store, target_hours
+from mymonth.columns import Duration, SQLITE_SECONDS_FROM_DATETIME
+from mymonth.models import Days, Settings, MonthlySummary, User, DEFAULT_USER_ID, DEFAULT_USER_NAME
+from mymonth.users import add_initial_data
+
+# SQLite expressions that convert duration column into storage format (see columns.Duration)
+SQLITE_DURATION_CONVERSIONS = {
+    'seconds': SQLITE_SECONDS_FROM_DATETIME,
+    'datetime': "strftime('%Y-%m-%d %H:%M:%S', {column}, 'unixepoch') || '.000000'",
+}
+
+
+def migrate_tables(engine=None):
+    """Rebuilds tables of SQLite database that differ from models:
+     - duration columns in other storage format are converted into current format (Duration.storage),
+     - tables of single-user databases get column user_id (rows get DEFAULT_USER_ID) and primary key (user_id, id).
+    Each table that needs changes is copied with converted values and replaced by the copy in one transaction.
+    Tables already in current format are skipped. Returns list of migrated tables."""
+    engine = db.engine if engine is None else engine
+    if engine.dialect.name != 'sqlite':
+        return []
+
+    migrated_tables = []
+    for table in db.Model.metadata.sorted_tables:
+        if not engine.has_table(table.name):
+            continue
+        stored_types = {column['name']: column['type'] for column in inspect(engine).get_columns(table.name)}
+        columns_to_convert = [column.name for column in table.columns if isinstance(column.type, Duration) and
+                              isinstance(stored_types[column.name], Integer) != Duration.stores_seconds()]
+        adds_user_id = 'user_id' in table.columns and 'user_id' not in stored_types
+        if not columns_to_convert and not adds_user_id:
+            continue
+
+        conversion = SQLITE_DURATION_CONVERSIONS[Duration.storage]
+        column_names = [column.name for column in table.columns]
+        select_columns = [str(DEFAULT_USER_ID) if name == 'user_id' and adds_user_id else
+                          conversion.format(column=name) if name in columns_to_convert else name
+                          for name in column_names]
+        # Table settings of single-user database may have more rows: first one is kept
+        insert = 'INSERT OR IGNORE' if adds_user_id else 'INSERT'
+        metadata = MetaData()
+        # Referenced tables (users) are in metadata of copy, so its foreign keys are resolved
+        for foreign_key in table.foreign_keys:
+            foreign_key.column.table.tometadata(metadata)
+        new_table = table.tometadata(metadata, name=f'_{table.name}_migrated')
+        with engine.begin() as connection:
+            # Leftover of interrupted migration is removed
+            new_table.drop(connection, checkfirst=True)
+            new_table.create(connection)
+            connection.execute(f'{insert} INTO {new_table.name} ({", ".join(column_names)}) '
+                               f'SELECT {", ".join(select_columns)} FROM {table.name}')
+            connection.execute(f'DROP TABLE {table.name}')
+            connection.execute(f'ALTER TABLE {new_table.name} RENAME TO {table.name}')
+        migrated_tables.append(table.name)
+    return migrated_tables
+
+
+def set_initial_db():
+    """Temporary solution for development. Checks if db exists. If not, creates it. Also sets initial values for current_month_date. 
+    E.g.: if Settings is empty - set reference day to today.
+    Must be called in application context."""
+    from mymonth.datasets import MonthSummaryTable, backfill_month
+
+    if Days.__tablename__ not in inspect(db.engine).get_table_names():
+        current_app.logger.info(f'Creating tables of database {db.engine.url!r}')
+    # Creates only missing tables (e.g. month_summary in existing databases)
+    db.create_all()
+    # Default user owns data of single-user databases and of requests without user (config USER_HEADER)
+    if User.query.get(DEFAULT_USER_ID) is None:
+        db.session.add(User(id=DEFAULT_USER_ID, name=DEFAULT_USER_NAME))
+        db.session.commit()
+    # Converts durations of existing database if storage format was changed (config INTERVAL_STORAGE)
+    # and partitions tables of single-user database by user
+    migrated_tables = migrate_tables()
+    if migrated_tables:
+        current_app.logger.info(f"Tables {', '.join(migrated_tables)} migrated (durations stored as "
+                                f"{current_app.config['INTERVAL_STORAGE']}, primary keys with user_id)")
+
+    add_initial_data(DEFAULT_USER_ID)
+    db.session.commit()
+
+    if MonthlySummary.query.filter_by(user_id=DEFAULT_USER_ID).first() is None and \
+            Days.query.filter_by(user_id=DEFAULT_USER_ID).first() is not None:
+        MonthSummaryTable.rebuild(user_id=DEFAULT_USER_ID)
+        db.session.commit()
+
+    # Calendar of target hours is loaded once (before workers are forked)
+    target_hours.calendar()
+
+    # Days of displayed month (later days are added when displayed month is changed)
+    if backfill_month(Settings.query.get(DEFAULT_USER_ID).current_month_date, DEFAULT_USER_ID):
+        db.session.commit()
+        days_store.invalidate(DEFAULT_USER_ID)
+
+    # Days of users are loaded once (before workers are forked)
+    days_store.preload(user_id for (user_id, ) in db.session.query(User.id).order_by(User.id))
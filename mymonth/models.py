@@ -1,46 +1,149 @@
 from mymonth import db
+from mymonth.columns import Duration
 from datetime import timedelta
+from sqlalchemy import text
+
+# User that owns data of single-user databases (rows created before table users) and of requests without user
+DEFAULT_USER_ID = 1
+DEFAULT_USER_NAME = 'default'
+
+# Adds all dates between start_date and end_date missing in table days of a user (dates are generated by SQLite,
+# see Days.backfill for other databases)
+DAYS_BACKFILL_STATEMENT = text("""
+    INSERT OR IGNORE INTO days (user_id, id)
+    WITH RECURSIVE calendar(id) AS (
+        SELECT date(:start_date) UNION ALL SELECT date(id, '+1 day') FROM calendar WHERE id < date(:end_date))
+    SELECT :user_id, id FROM calendar""")
+
+# Tables partitioned by user: primary key is (user_id, id), so rows of one user are one range of primary key.
+# In SQLite rows are stored in primary key order (WITHOUT ROWID), so range is read from adjacent pages.
+USER_PARTITIONED_TABLE_ARGS = {'sqlite_with_rowid': False}
+
+
+class User(db.Model):
+    """User of application (name is set by authenticating proxy, see users.py)."""
+    __tablename__ = 'users'
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), nullable=False, unique=True)
+
+    def __repr__(self):
+        return f"User(id={self.id}, name={self.name})"
 
 
 class Days(db.Model):
     # todo - set initial values to zero
     """Daily Activities Records."""
+    __table_args__ = USER_PARTITIONED_TABLE_ARGS
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
     id = db.Column(db.Date, primary_key=True)
-    ds = db.Column(db.Interval)   # Data Science
-    dev = db.Column(db.Interval)  # Developer
-    pol = db.Column(db.Interval)  # Polyglot
-    ge = db.Column(db.Interval)   # Gentleman Explorer
-    crt = db.Column(db.Interval)  # Create Read Think
-    hs = db.Column(db.Interval)   # Home Son
+    ds = db.Column(Duration)   # Data Science
+    dev = db.Column(Duration)  # Developer
+    pol = db.Column(Duration)  # Polyglot
+    ge = db.Column(Duration)   # Gentleman Explorer
+    crt = db.Column(Duration)  # Create Read Think
+    hs = db.Column(Duration)   # Home Son
     alk = db.Column(db.Float)     # Alko
 
     def __repr__(self):
-        return f"Days(id={self.id}, ds={self.ds}, dev={self.dev}, pol={self.pol}, ge={self.ge}, crt={self.crt}," \
+        return f"Days(user_id={self.user_id}, id={self.id}, ds={self.ds}, dev={self.dev}, pol={self.pol}, ge={self.ge}, crt={self.crt}," \
                f" hs={self.hs}, alk={self.alk})"
 
+    @staticmethod
+    def backfill(start_date, end_date, user_id=DEFAULT_USER_ID):
+        """Adds empty days of a user between start_date and end_date that do not exist yet, with one statement
+        on SQLite. Other databases select existing dates and insert missing ones (two statements).
+        Runs in current db.session transaction. Returns number of added days."""
+        if db.session.get_bind().dialect.name == 'sqlite':
+            result = db.session.execute(DAYS_BACKFILL_STATEMENT, {'start_date': start_date.isoformat(),
+                                                                  'end_date': end_date.isoformat(),
+                                                                  'user_id': user_id})
+            return result.rowcount
+        existing_dates = {day_id for (day_id, ) in db.session.query(Days.id).filter(
+            Days.user_id == user_id, Days.id.between(start_date, end_date))}
+        missing_days = [{'user_id': user_id, 'id': start_date + timedelta(days=offset)}
+                        for offset in range((end_date - start_date).days + 1)
+                        if start_date + timedelta(days=offset) not in existing_dates]
+        if missing_days:
+            db.session.execute(Days.__table__.insert(), missing_days)
+        return len(missing_days)
+
 
 class Settings(db.Model):
-    """General settings for application"""
-    id = db.Column(db.Integer, primary_key=True)
+    """Settings of each user (e.g. date of displayed month)"""
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
     current_month_date = db.Column(db.Date)
 
     def __repr__(self):
-        return f"Settings(id={self.id}, current_month_date={self.current_month_date})"
+        return f"Settings(user_id={self.user_id}, current_month_date={self.current_month_date})"
 
 
 class MonthlyTargets(db.Model):
     """Target for each month for each category. 
     Id will be set to first date of a month. """
+    __table_args__ = USER_PARTITIONED_TABLE_ARGS
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
     id = db.Column(db.Date, primary_key=True)
-    ds = db.Column(db.Interval, default=timedelta())   # Data Science
-    dev = db.Column(db.Interval, default=timedelta())  # Developer
-    pol = db.Column(db.Interval, default=timedelta())  # Polyglot
-    ge = db.Column(db.Interval, default=timedelta())   # Gentleman Explorer
-    crt = db.Column(db.Interval, default=timedelta())  # Create Read Think
-    hs = db.Column(db.Interval, default=timedelta())   # Home Son
+    ds = db.Column(Duration, default=timedelta())   # Data Science
+    dev = db.Column(Duration, default=timedelta())  # Developer
+    pol = db.Column(Duration, default=timedelta())  # Polyglot
+    ge = db.Column(Duration, default=timedelta())   # Gentleman Explorer
+    crt = db.Column(Duration, default=timedelta())  # Create Read Think
+    hs = db.Column(Duration, default=timedelta())   # Home Son
     alk = db.Column(db.Float, default=0.0)     # Alko
     days0 = db.Column(db.Integer, default=0)     # Alko
 
     def __repr__(self):
-        return f"MonthlyTargets(id={self.id}, ds={self.ds}, dev={self.dev}, pol={self.pol}, ge={self.ge}," \
+        return f"MonthlyTargets(user_id={self.user_id}, id={self.id}, ds={self.ds}, dev={self.dev}, pol={self.pol}, ge={self.ge}," \
                f" crt={self.crt}, hs={self.hs}, alk={self.alk}, days0={self.days0})"
+
+
+class MonthlySummary(db.Model):
+    """Summary of each month calculated from table days (rollup used by monthly graph).
+    Id will be set to first date of a month. """
+    __tablename__ = 'month_summary'
+    __table_args__ = USER_PARTITIONED_TABLE_ARGS
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    id = db.Column(db.Date, primary_key=True)
+    score = db.Column(db.Float)               # (productive - negative) / target hours
+    day0 = db.Column(db.Integer)              # Days with zero alk
+    ml = db.Column(db.Float)                  # Average ml per day
+    productive_hrs = db.Column(Duration)
+    target_hrs = db.Column(Duration)
+    negative_hrs = db.Column(Duration)
+    nb_of_days = db.Column(db.Integer)        # Days recorded in a month
+
+    def __repr__(self):
+        return f"MonthlySummary(user_id={self.user_id}, id={self.id}, score={self.score}, day0={self.day0}, ml={self.ml}," \
+               f" productive_hrs={self.productive_hrs}, target_hrs={self.target_hrs}," \
+               f" negative_hrs={self.negative_hrs}, nb_of_days={self.nb_of_days})"
+
+
+class TargetSchedule(db.Model):
+    """Target (productive) hours of each weekday, valid from date id till next schedule (common for all users).
+    Dates before first schedule use config TARGET_HOURS_PER_WEEKDAY (see targets.TargetHours)."""
+    __tablename__ = 'target_schedules'
+    id = db.Column(db.Date, primary_key=True)
+    mon = db.Column(Duration, nullable=False)
+    tue = db.Column(Duration, nullable=False)
+    wed = db.Column(Duration, nullable=False)
+    thu = db.Column(Duration, nullable=False)
+    fri = db.Column(Duration, nullable=False)
+    sat = db.Column(Duration, nullable=False)
+    sun = db.Column(Duration, nullable=False)
+
+    weekday_columns = ['mon', 'tue', 'wed', 'thu', 'fri', 'sat', 'sun']
+
+    def __repr__(self):
+        return f"TargetSchedule(id={self.id}, mon={self.mon}, tue={self.tue}, wed={self.wed}, thu={self.thu}," \
+               f" fri={self.fri}, sat={self.sat}, sun={self.sun})"
+
+
+class TargetOverride(db.Model):
+    """Target hours of single date that replace its schedule (e.g. holiday with 0 hours, common for all users)."""
+    __tablename__ = 'target_overrides'
+    id = db.Column(db.Date, primary_key=True)
+    target_hrs = db.Column(Duration, nullable=False)
+    note = db.Column(db.String(100))
+
+    def __repr__(self):
+        return f"TargetOverride(id={self.id}, target_hrs={self.target_hrs}, note={self.note})"
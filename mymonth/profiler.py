@@ -0,0 +1,164 @@
+"""Module contains:
+ - Profiler of SQL statements: number of statements and database time per request (config SQL_PROFILER_ENABLED),
+   repeated identical statements (N+1 patterns) and EXPLAIN QUERY PLAN of slow statements,
+ - Query budget for tests, e.g.:
+
+    with sql_profiler.query_budget(5):
+        client.get('/')
+"""
+import time
+from collections import Counter
+from contextlib import contextmanager
+from threading import local
+
+from flask import current_app, request
+
+from mymonth.database import listen_all_engines
+
+
+class StatementLog:
+    """Statements executed while log was active (see SqlProfiler.profile)."""
+    def __init__(self, explain_slower_than=None):
+        """
+        Parameters
+        ----------
+        explain_slower_than : float, optional
+            EXPLAIN QUERY PLAN is recorded for SELECT statements (SQLite) that take at least this many seconds
+            (default is None: plans are not recorded).
+        """
+        self.explain_slower_than = explain_slower_than
+        # Dicts with statement, parameters, seconds and plan (list of rows or None)
+        self.statements = []
+
+    @property
+    def count(self):
+        return len(self.statements)
+
+    @property
+    def seconds(self):
+        return sum(record['seconds'] for record in self.statements)
+
+    def repeated(self):
+        """Returns list of (statement, parameters, count) executed more than once with the same parameters."""
+        counts = Counter((record['statement'], repr(record['parameters'])) for record in self.statements)
+        return [(statement, parameters, count) for (statement, parameters), count in counts.most_common()
+                if count > 1]
+
+    def slow(self):
+        """Returns records of statements with recorded query plan."""
+        return [record for record in self.statements if record['plan'] is not None]
+
+    def report(self):
+        """Returns text summary: totals, repeated statements and plans of slow statements."""
+        lines = [f'{self.count} SQL statement(s) in {self.seconds * 1000:.1f} ms']
+        for statement, parameters, count in self.repeated():
+            lines.append(f'Repeated {count}x: {" ".join(statement.split())} {parameters}')
+        for record in self.slow():
+            lines.append(f'Slow ({record["seconds"] * 1000:.1f} ms): {" ".join(record["statement"].split())}')
+            lines += [f'    {row[-1]}' for row in record['plan']]
+        return '\n'.join(lines)
+
+
+class SqlProfiler:
+    """
+    Records statements executed by all SQLAlchemy engines in logs active in current thread.
+    If enabled (config SQL_PROFILER_ENABLED), each request is profiled and its summary is logged (warning if
+    any statement was repeated). Profiling on demand (profile, query_budget) works also when disabled.
+    """
+    def __init__(self, app=None):
+        self.enabled = False
+        self.explain_slower_than = None
+        self._local = local()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.enabled = app.config.get('SQL_PROFILER_ENABLED', self.enabled)
+        self.explain_slower_than = app.config.get('SQL_PROFILER_EXPLAIN_SECONDS', self.explain_slower_than)
+        if not self.enabled:
+            return
+
+        app.before_request(self._start_request)
+        app.teardown_request(self._stop_request)
+        self._register_events()
+
+    def _register_events(self):
+        listen_all_engines({'before_cursor_execute': self._before_cursor_execute,
+                            'after_cursor_execute': self._after_cursor_execute})
+
+    def _active_logs(self):
+        if not hasattr(self._local, 'logs'):
+            self._local.logs = []
+        return self._local.logs
+
+    @contextmanager
+    def profile(self, explain_slower_than=None):
+        """Returns context manager with StatementLog of statements executed inside of it (in current thread)."""
+        self._register_events()
+        log = StatementLog(explain_slower_than)
+        logs = self._active_logs()
+        logs.append(log)
+        try:
+            yield log
+        finally:
+            logs.remove(log)
+
+    @contextmanager
+    def query_budget(self, max_statements, allow_repeated=True):
+        """Raises AssertionError if code inside of context manager executes more than max_statements statements
+        (or any repeated statement if allow_repeated is False)."""
+        with self.profile() as log:
+            yield log
+        if log.count > max_statements:
+            raise AssertionError(f'Query budget of {max_statements} exceeded.\n{log.report()}')
+        if not allow_repeated and log.repeated():
+            raise AssertionError(f'Repeated statements.\n{log.report()}')
+
+    def _start_request(self):
+        self._local.request_profile = self.profile(self.explain_slower_than)
+        self._local.request_log = self._local.request_profile.__enter__()
+
+    def _stop_request(self, exception=None):
+        request_profile = getattr(self._local, 'request_profile', None)
+        if request_profile is None:
+            return
+        log = self._local.request_log
+        request_profile.__exit__(None, None, None)
+        self._local.request_profile = self._local.request_log = None
+        message = f'{request.method} {request.path}: {log.report()}'
+        if log.repeated() or log.slow():
+            current_app.logger.warning(message)
+        else:
+            current_app.logger.info(message)
+
+    def _before_cursor_execute(self, connection, cursor, statement, parameters, context, executemany):
+        if context is not None and self._active_logs():
+            context._profiler_start = time.perf_counter()
+
+    def _after_cursor_execute(self, connection, cursor, statement, parameters, context, executemany):
+        logs = self._active_logs()
+        start = getattr(context, '_profiler_start', None)
+        if not logs or start is None:
+            return
+        seconds = time.perf_counter() - start
+        plan = None
+        for log in logs:
+            is_slow = log.explain_slower_than is not None and seconds >= log.explain_slower_than
+            if is_slow and plan is None:
+                plan = self._explain(connection, cursor, statement, parameters, executemany)
+            log.statements.append({'statement': statement, 'parameters': parameters, 'seconds': seconds,
+                                   'plan': plan if is_slow else None})
+
+    @staticmethod
+    def _explain(connection, cursor, statement, parameters, executemany):
+        """Returns rows of EXPLAIN QUERY PLAN (SQLite SELECT statements only, otherwise empty list)."""
+        if executemany or connection.dialect.name != 'sqlite' or \
+                not statement.lstrip().upper().startswith(('SELECT', 'WITH')):
+            return []
+        # Plan is read with DBAPI cursor, so it is not recorded as executed statement
+        explain_cursor = cursor.connection.cursor()
+        try:
+            explain_cursor.execute(f'EXPLAIN QUERY PLAN {statement}', parameters)
+            return explain_cursor.fetchall()
+        finally:
+            explain_cursor.close()
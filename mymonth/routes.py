@@ -1,214 +1,117 @@
-from flask import render_template, request, redirect, url_for
+from flask import Blueprint, current_app, render_template, request, redirect, url_for, abort, send_file, Response, \
+    stream_with_context, jsonify, g
 from mymonth import db
-from mymonth import app
+from mymonth import dashboard_cache
+from mymonth import days_store
+from mymonth import metrics
+from mymonth import jobs
+from mymonth import users
+from mymonth.daystore import CATEGORIES
 from mymonth.forms import DayEditForm, EditSettings, CalculatorSJAForm, EditMonthTargetsForm
 from mymonth.models import Days, Settings, MonthlyTargets
 from mymonth.utils import UtilsDatetime, UtilsDataConversion
-from mymonth.datasets import get_day_of_month_for_avg_sja, DataSet
-from mymonth.defaults import Defaults
-from mymonth.graphs import MonthlyGraph, Graph
-from mymonth.backup import get_initial_data_from_excel
-from bokeh.plotting import figure
-from bokeh.embed import components
-from bokeh.models import LinearAxis, Range1d, ColumnDataSource, LabelSet
 
 from datetime import date, timedelta, datetime
-import pandas as pd
-import os
-from artools.utils import show_attributes
 
+# Analytics and plotting modules (datasets, graphs, backup) import pandas and bokeh,
+# so they are imported in routes on first request that needs them
+bp = Blueprint('main', __name__)
+# Each route reads and writes data of user of request (g.user_id)
+bp.before_request(users.load_current_user)
 
-def set_initial_db():
-    """Temporary solution for development. Checks if db exists. If not, creates it. Also sets initial values for current_month_date. 
-    E.g.: if Settings is empty - set reference day to today."""
 
-    if not os.path.exists('mymonth/mymonth.db'):
-        print(f"Database does not exist. Create in")
-        db.create_all()
-
-    if Settings.query.first() is None:
-        db.session.add(Settings(current_month_date=date.today()))
-        db.session.commit()
-
-    if MonthlyTargets.query.first() is None:
-        id_month = date(year=date.today().year, month=date.today().month, day=1)
-        current_month_target = MonthlyTargets(id=id_month)
-        db.session.add(current_month_target)
-        db.session.commit()
-
-
-set_initial_db()
-
-
-@app.route('/', methods=['GET', 'POST'])
+@bp.route('/', methods=['GET', 'POST'])
 def home():
-    ref_date = UtilsDatetime(Settings.query.first().current_month_date)
-
-    # Add day(s) to database if it does not exist yet. 
-    days = Days.query.filter(Days.id >= ref_date.month_first_date).filter(Days.id <= ref_date.month_last_date).all()
-    days_in_db = [day.id for day in days]
-    for day_index in ref_date.month_all_dates:
-        if day_index not in days_in_db:
-            db.session.add(Days(id=day_index))
-    db.session.commit()
-    
-    days = Days.query.filter(Days.id >= ref_date.month_first_date).filter(Days.id <= ref_date.month_last_date).all()
-    
-    # Extra fields to display in row summary (_s)
-    row_with_totals = {'ds': timedelta(), 'dev': timedelta(), 'pol': timedelta(), 'ge': timedelta(), 'crt': timedelta(), 'hs': timedelta()}
-    cum_TargetHours = timedelta()
-    cum_TargetHours_till_today = timedelta()
-    cum_TotalProductive = timedelta()
-    cum_TotalNegative = timedelta()
-    cum_alk = 0
-    cum_days0 = 0 
-
-    for i, day in enumerate(days, start=1):
-        # Target Productive Hours depending on weekday
-        day.s_TargetHours = Defaults.productive_hours_by_weekday(day.id)
-
-        # Total Productive Time
-        day.s_TotalProductive = timedelta(seconds=0)
-        for col in row_with_totals:
-            value = getattr(day, col)
-            if value is not None:
-                row_with_totals[col] += value
-                day.s_TotalProductive += value
-
-        # Total Negative from Alk
-        day.s_TotalNegative = timedelta(seconds=0)
-        if day.alk is not None:
-            day.s_TotalNegative = max(day.alk - 2.86, 0) * timedelta(minutes=20)
-            cum_alk += day.alk
-            if day.id <= date.today() and day.alk <= 0:
-                cum_days0 += 1
-        else:
-            if day.id <= date.today():
-                cum_days0 += 1
-
-        # % of target
-        day.s_PercOfTarget = (day.s_TotalProductive - day.s_TotalNegative) / day.s_TargetHours 
-
-        # Cummulative values 
-        cum_TargetHours += day.s_TargetHours
-        if day.id <= date.today():
-            cum_TargetHours_till_today += day.s_TargetHours
-
-        cum_TotalProductive += day.s_TotalProductive
-        cum_TotalNegative += day.s_TotalNegative
-        day.cum_PercOfTarget = (cum_TotalProductive - cum_TotalNegative) / cum_TargetHours
-        
-        day.cum_alk = (cum_alk / i) / 7.8 * 750
-
-        # Styles:
-        # Rows with today's date
-        day.style_today_tr_hd = ""
-        day.style_today_tr_td = ""
-        if day.id == date.today():
-            day.style_today_tr_hd = "today_header"
-            day.style_today_tr_td = "today_cell"
-
-    day_of_month_for_statistics = get_day_of_month_for_avg_sja(ref_date.month_first_date, ref_date.month_last_date)
-
-    row_with_totals['targethours'] = cum_TargetHours
-    row_with_totals['totalproductive'] = cum_TotalProductive
-    row_with_totals['totalnegative'] = cum_TotalNegative
-    row_with_totals['totalsja'] =  round(cum_alk / day_of_month_for_statistics, 2)
-    row_with_totals['totalml'] = int(round(row_with_totals['totalsja'] / 7.8 * 750, 0))
-    row_with_totals['totaldays0'] = cum_days0
-
-    # Planned till today
-    row_with_totals['targethours_tilltoday'] = cum_TargetHours_till_today
+    from mymonth.datasets import DataSet, backfill_month
+    from mymonth.graphs import Graph
 
+    user_id = g.user_id
     # Change current month settings
     form_settings = EditSettings()
-    settings = Settings.query.first()  # There is only one setting (one date of current month)
-    
-    # MonthlyTargets
-    monthlytargets = MonthlyTargets.query.get(date(year=settings.current_month_date.year, month=settings.current_month_date.month, day=1))
-    monthlytargets.ml = int(round(monthlytargets.alk / 7.8 * 750, 0))
-    monthlytargets.total_allocated = timedelta(seconds=sum([getattr(monthlytargets, hrscol).total_seconds() for hrscol in ['ds', 'dev', 'pol', 'ge', 'crt', 'hs']]))
-    
-    row_with_totals['ds_tilltoday'] = monthlytargets.ds * (day_of_month_for_statistics / ref_date.month_last_date.day)
-    row_with_totals['dev_tilltoday'] = monthlytargets.dev * (day_of_month_for_statistics / ref_date.month_last_date.day)
-    row_with_totals['pol_tilltoday'] = monthlytargets.pol * (day_of_month_for_statistics / ref_date.month_last_date.day)
-    row_with_totals['ge_tilltoday'] = monthlytargets.ge * (day_of_month_for_statistics / ref_date.month_last_date.day)
-    row_with_totals['crt_tilltoday'] = monthlytargets.crt * (day_of_month_for_statistics / ref_date.month_last_date.day)
-    row_with_totals['hs_tilltoday'] = monthlytargets.hs * (day_of_month_for_statistics / ref_date.month_last_date.day)
-    row_with_totals['total_tilltoday'] = timedelta(seconds=sum([row_with_totals[f"{hrscol}_tilltoday"].total_seconds() for hrscol in ['ds', 'dev', 'pol', 'ge', 'crt', 'hs']]))
-
-    # Backlog (normal subtraction of timedelta does not work correctly if bigger is subtrackted from smaller object)
-    row_with_totals['ds_backlog'] = UtilsDataConversion.string_from_timedelta_subtraction(row_with_totals['ds'], row_with_totals['ds_tilltoday'])
-    row_with_totals['dev_backlog'] = UtilsDataConversion.string_from_timedelta_subtraction(row_with_totals['dev'], row_with_totals['dev_tilltoday'])
-    row_with_totals['pol_backlog'] = UtilsDataConversion.string_from_timedelta_subtraction(row_with_totals['pol'], row_with_totals['pol_tilltoday'])
-    row_with_totals['ge_backlog'] = UtilsDataConversion.string_from_timedelta_subtraction(row_with_totals['ge'], row_with_totals['ge_tilltoday'])
-    row_with_totals['crt_backlog'] = UtilsDataConversion.string_from_timedelta_subtraction(row_with_totals['crt'], row_with_totals['crt_tilltoday'])
-    row_with_totals['hs_backlog'] = UtilsDataConversion.string_from_timedelta_subtraction(row_with_totals['hs'], row_with_totals['hs_tilltoday'])
-    row_with_totals['total_backlog'] = UtilsDataConversion.string_from_timedelta_subtraction(row_with_totals['totalproductive'], row_with_totals['total_tilltoday'])
+    settings = Settings.query.get(user_id)  # Each user has one setting (one date of current month)
 
     # Change displayed month
     if request.method == 'POST':
         settings.current_month_date = form_settings.current_month_date.data
         # Check if monthly targets exist
         targets_date = date(year=settings.current_month_date.year, month=settings.current_month_date.month, day=1)
-        if MonthlyTargets.query.get(targets_date) is None:
-            db.session.add(MonthlyTargets(id=targets_date))
+        changed_months = []
+        if MonthlyTargets.query.get((user_id, targets_date)) is None:
+            db.session.add(MonthlyTargets(user_id=user_id, id=targets_date))
+            changed_months.append(targets_date)
+        # Add day(s) to database if they do not exist yet (GET only reads data)
+        days_added = backfill_month(settings.current_month_date, user_id)
+        if days_added:
+            changed_months.append(settings.current_month_date)
+        # Cached dashboard is invalidated after days_store, so it's never computed again from old days
         db.session.commit()
-        return redirect(url_for('home'))
+        if days_added:
+            days_store.invalidate(user_id)
+        if changed_months:
+            dashboard_cache.bump(*changed_months, user_id=user_id)
+        return redirect(url_for('main.home'))
+
+    ref_date = UtilsDatetime(settings.current_month_date)
+
+    # Daily statistics and totals of a month (cached until data of a month changes)
+    with metrics.phase('pandas'):
+        dataset = dashboard_cache.get_or_set('dataset', user_id, ref_date.date,
+                                             lambda: DataSet(ref_date.date, user_id=user_id))
+        month_summary = dashboard_cache.get_or_set('month_summary', user_id, ref_date.date,
+                                                   dataset.create_month_summary)
+    days = month_summary.days
+    row_with_totals = month_summary.totals
+
+    # MonthlyTargets
+    monthlytargets = MonthlyTargets.query.get((user_id, ref_date.month_first_date))
+    monthlytargets.ml = int(round(monthlytargets.alk / 7.8 * 750, 0))
+    monthlytargets.total_allocated = timedelta(seconds=sum([getattr(monthlytargets, hrscol).total_seconds() for hrscol in CATEGORIES]))
 
     # Daily graph
-    y_alk_cum = [row.cum_alk for row in days]
-    y_alk_cum_text = [str(int(row.cum_alk)) for row in days]
-    y_score_cum = [row.cum_PercOfTarget for row in days]
-    y_score_cum_text = [str(int(round(row.cum_PercOfTarget, 2)*100)) for row in days]
-    x_days = [i for i, day in enumerate(ref_date.month_all_dates, start=1)]
-    y_todaybar_top = [max(y_alk_cum) if day==date.today() else None for day in ref_date.month_all_dates]
-
-    source = ColumnDataSource(data=dict(x_days=x_days, y_alk_cum=y_alk_cum, y_score_cum=y_score_cum, y_score_cum_text=y_score_cum_text, y_alk_cum_text=y_alk_cum_text, y_todaybar_top=y_todaybar_top))
-
-    plot = figure(title='Daily Progress', x_axis_label='day', y_axis_label='ml cumm.%', plot_width=600, plot_height=400, toolbar_location=None)  
-
-    # Today selection
-    plot.vbar(x='x_days', width=1, top='y_todaybar_top', source=source, color='#98FB98', alpha=0.5)
-
-    # Alk
-    plot.line(x='x_days', y='y_alk_cum', color="maroon", source=source)
-    plot.circle(x='x_days', y='y_alk_cum', color="maroon", fill_color="white", size=5, source=source)
-    labels_alk = LabelSet(x='x_days', y='y_alk_cum', text='y_alk_cum_text', text_font_size='10px', text_color='maroon', y_offset=5, level='annotation', source=source, render_mode='canvas')
-
-    # Score
-    plot.extra_y_ranges['y_axis_for_target_perc'] = Range1d(min(0, min(source.data.get('y_score_cum'))), max(max(source.data.get('y_score_cum')), 1)*1.05)
-    plot.line(x='x_days', y='y_score_cum', source=source, color="cornflowerblue", y_range_name='y_axis_for_target_perc')
-    plot.circle(x='x_days', y='y_score_cum', source=source, color="cornflowerblue", fill_color="white", size=5, y_range_name='y_axis_for_target_perc')
-    labels_score = LabelSet(x='x_days', y='y_score_cum', text='y_score_cum_text', text_font_size='10px', text_color='cornflowerblue', y_offset=5, y_range_name='y_axis_for_target_perc', level='annotation', source=source, render_mode='canvas')
-
-    ax_right = LinearAxis(y_range_name="y_axis_for_target_perc", axis_label="% of target cum.")
-    ax_right.axis_label_text_color ="blue"
-    plot.add_layout(ax_right, 'right')
-    plot.add_layout(labels_score)
-    plot.add_layout(labels_alk)
-
-    bokeh_daily_script, bokeh_daily_div = components(plot)
-
-    # Monthly graph
-    month_summary_table = MonthlyGraph(Days).df_months.to_html()
-    bokeh_monthly_script, bokeh_monthly_div = MonthlyGraph(Days).bokeh_monthly_components
-    dataset_for_daily_tracking = DataSet(ref_date)
-    bokeh_tracking_time_script, bokeh_bracking_time_div = Graph.get_graph_components_tracking_daily_time(dataset_for_daily_tracking.tracking_df_daily_datetime, dataset_for_daily_tracking.tracking_current_score_series)
-
-    return render_template('home.html', days=days, f_string_from_duration=UtilsDataConversion.string_from_timedelta,
-                           f_string_from_float=UtilsDataConversion.string_from_float_none, form_settings=form_settings, settings=settings,
-                           monthlytargets=monthlytargets, row_with_totals=row_with_totals,
-                           bokeh_daily_script=bokeh_daily_script, bokeh_daily_div=bokeh_daily_div, f_round=round,
-                           month_summary_table=month_summary_table,
-                           bokeh_monthly_script=bokeh_monthly_script, bokeh_monthly_div=bokeh_monthly_div,
-                           bokeh_tracking_time_script=bokeh_tracking_time_script, bokeh_bracking_time_div=bokeh_bracking_time_div)
-
-
-@app.route('/day/edit/<id_day>', methods=['GET', 'POST'])
+    bokeh_daily_script, bokeh_daily_div = dashboard_cache.get_or_set(
+        'bokeh_daily', user_id, ref_date.date,
+        lambda: Graph.get_graph_components_daily_progress(month_summary.df_days, ref_date.month_calendar))
+
+    # Monthly graph (depends on all months)
+    month_summary_table, (bokeh_monthly_script, bokeh_monthly_div) = dashboard_cache.get_or_set(
+        'monthly_graph', user_id, None, lambda: get_monthly_graph_outputs(user_id))
+    bokeh_tracking_time_script, bokeh_bracking_time_div = dashboard_cache.get_or_set(
+        'bokeh_tracking', user_id, ref_date.date, lambda: get_tracking_graph_outputs(dataset))
+
+    with metrics.phase('jinja'):
+        return render_template('home.html', days=days, f_string_from_duration=UtilsDataConversion.string_from_timedelta,
+                               f_string_from_float=UtilsDataConversion.string_from_float_none, form_settings=form_settings, settings=settings,
+                               monthlytargets=monthlytargets, row_with_totals=row_with_totals,
+                               bokeh_daily_script=bokeh_daily_script, bokeh_daily_div=bokeh_daily_div, f_round=round,
+                               month_summary_table=month_summary_table,
+                               bokeh_monthly_script=bokeh_monthly_script, bokeh_monthly_div=bokeh_monthly_div,
+                               bokeh_tracking_time_script=bokeh_tracking_time_script, bokeh_bracking_time_div=bokeh_bracking_time_div)
+
+
+def get_monthly_graph_outputs(user_id):
+    """Returns html table and bokeh components of monthly summary of a user"""
+    from mymonth.graphs import MonthlyGraph
+
+    monthly_graph = MonthlyGraph(Days, user_id)
+    with metrics.phase('pandas'):
+        month_summary_table = monthly_graph.df_months.to_html()
+    return month_summary_table, monthly_graph.bokeh_monthly_components
+
+
+def get_tracking_graph_outputs(dataset):
+    """Returns bokeh components of tracking hours of a month"""
+    from mymonth.graphs import Graph
+
+    with metrics.phase('pandas'):
+        tracking_df, tracking_score = dataset.tracking_df_daily_datetime, dataset.tracking_current_score_series
+    return Graph.get_graph_components_tracking_daily_time(tracking_df, tracking_score)
+
+
+@bp.route('/day/edit/<id_day>', methods=['GET', 'POST'])
 def edit_day(id_day):
-    
-    day = Days.query.get_or_404(date.fromisoformat(id_day))
+    from mymonth.datasets import MonthSummaryTable
+
+    day = Days.query.get_or_404((g.user_id, date.fromisoformat(id_day)))
     form_day = DayEditForm()
     form_calc_sja = CalculatorSJAForm()
     sja_values = dict(zip(['sja1', 'sja2', 'sja3'], [0, 0, 0]))
@@ -232,17 +135,20 @@ def edit_day(id_day):
             day.hs = UtilsDataConversion.timedelta_from_string(form_day.hs.data)
             day.alk = UtilsDataConversion.float_from_string(form_day.alk.data)
 
+            MonthSummaryTable.update_month(day.id, day.user_id)
             db.session.commit()
-            return redirect(url_for('home'))
+            days_store.patch(day.user_id, [day])
+            dashboard_cache.bump(day.id, user_id=day.user_id)
+            return redirect(url_for('main.home'))
     return render_template('edit_day.html', form_day=form_day, form_calc_sja=form_calc_sja, sja_values=sja_values, day=day, f_string_from_duration=UtilsDataConversion.string_from_timedelta, f_string_from_float=UtilsDataConversion.string_from_float_none)
 
 
-@app.route('/edit_month_target/<id_month>', methods=['GET', 'POST'])
+@bp.route('/edit_month_target/<id_month>', methods=['GET', 'POST'])
 def edit_month_target(id_month):
     # Get form
     edit_month_targets_form = EditMonthTargetsForm()
 
-    monthly_targets = MonthlyTargets.query.get_or_404(date.fromisoformat(id_month))
+    monthly_targets = MonthlyTargets.query.get_or_404((g.user_id, date.fromisoformat(id_month)))
 
     if request.method == 'POST':
         monthly_targets.ds = UtilsDataConversion.timedelta_from_string(edit_month_targets_form.ds.data)
@@ -254,59 +160,92 @@ def edit_month_target(id_month):
         monthly_targets.alk = UtilsDataConversion.float_from_string(edit_month_targets_form.alk.data)
         monthly_targets.days0 = UtilsDataConversion.float_from_string(edit_month_targets_form.days0.data)
         db.session.commit() 
-        return redirect(url_for('home')) 
+        dashboard_cache.bump(monthly_targets.id, user_id=monthly_targets.user_id)
+        return redirect(url_for('main.home')) 
 
     return render_template('edit_month_targets.html', edit_month_targets_form=edit_month_targets_form,
                            monthly_targets=monthly_targets, f_string_from_duration=UtilsDataConversion.string_from_timedelta, f_string_from_float=UtilsDataConversion.string_from_float_none)
 
 
-@app.route('/export_to_excel')
+@bp.route('/export_to_excel')
 def export_db():
-    df_days = pd.read_sql_table('days', db.engine)
-    df_monthlytargets = pd.read_sql_table('monthly_targets', db.engine)
-
-    # Change columns type from timedelta/datetime to string
-    for col in ['ds', 'dev', 'pol', 'ge', 'crt', 'hs']:
-        df_days[col] = df_days[col].apply(UtilsDataConversion.string_from_timedelta)
-        df_monthlytargets[col] = df_monthlytargets[col].apply(UtilsDataConversion.string_from_timedelta)
-
-    excel_writer = pd.ExcelWriter(os.path.join('mymonth', 'static', 'initial_data', f'export_{datetime.now().strftime("%Y%m%d%H%M%S")}.xlsx'))
-    df_days.sort_values(by='id').to_excel(excel_writer, sheet_name='days', index=False, freeze_panes=(1, 0))
-    df_monthlytargets.sort_values(by='id').to_excel(excel_writer, sheet_name='monthly_targets', index=False, freeze_panes=(1, 0))
-    excel_writer.save()
-    return redirect(url_for('home'))
-
-
-@app.route('/import_from_excel')
+    """Exports data of user. Query parameters:
+     - format: 'xlsx' (default, all tables) or 'csv' (one table),
+     - table: table exported to csv: 'days' (default) or 'monthly_targets',
+     - chunk_size: number of rows fetched from database at once (default 1000).
+    Csv is streamed as download. Xlsx is written by background job (see job_response): file is downloaded from
+    job_file when job is finished."""
+    from mymonth.backup import export_job, generate_csv_export, EXPORT_TABLES
+
+    export_format = request.args.get('format', 'xlsx')
+    table_name = request.args.get('table', 'days')
+    chunk_size = request.args.get('chunk_size', 1000, type=int)
+    if export_format not in ['xlsx', 'csv'] or table_name not in EXPORT_TABLES or chunk_size < 1:
+        abort(400)
+    file_name = f'export_{datetime.now().strftime("%Y%m%d%H%M%S")}'
+
+    if export_format == 'csv':
+        return Response(stream_with_context(generate_csv_export(table_name, chunk_size=chunk_size,
+                                                                user_id=g.user_id)),
+                        mimetype='text/csv',
+                        headers={'Content-Disposition': f'attachment; filename={file_name}_{table_name}.csv'})
+
+    job = jobs.submit('export', export_job, chunk_size=chunk_size, user_id=g.user_id,
+                      result_name=f'{file_name}.xlsx', owner=g.user_id)
+    return job_response(job)
+
+
+@bp.route('/import_from_excel')
 def import_db():
-    df_days = get_initial_data_from_excel()
-    df_monthlytargets = pd.read_excel(os.path.join('mymonth', 'static', 'initial_data', 'import_me.xlsx'),
-                                      sheet_name='monthly_targets')
-    # Change columns type from string to timedelta (stored as datetime)
-    for col in ['ds', 'dev', 'pol', 'ge', 'crt', 'hs']:
-        df_days[col] = df_days[col].fillna('').apply(UtilsDataConversion.timedelta_from_string)
-        df_monthlytargets[col] = df_monthlytargets[col].fillna('').apply(UtilsDataConversion.timedelta_from_string)
-
-    # Overwrite database with new values
-    all_current_days = Days.query.all()
-    for day in all_current_days:
-        db.session.delete(day)
-    db.session.commit()
-
-    for index, serie in df_days.iterrows():
-        db.session.add(Days(id=serie['id'], ds=serie['ds'], dev=serie['dev'], pol=serie['pol'], ge=serie['ge'],
-                            crt=serie['crt'], hs=serie['hs'], alk=serie['alk']))
-    db.session.commit()
-
-    all_current_targets = MonthlyTargets.query.all()
-    for targets in all_current_targets:
-        db.session.delete(targets)
-    db.session.commit()
-
-    for index, serie in df_monthlytargets.iterrows():
-        db.session.add(MonthlyTargets(id=serie['id'], ds=serie['ds'], dev=serie['dev'], pol=serie['pol'],
-                                      ge=serie['ge'], crt=serie['crt'], hs=serie['hs'], alk=serie['alk'],
-                                      days0=serie['days0']))
-    db.session.commit()
-
-    return redirect(url_for('home'))
+    """Imports excel file (config IMPORT_EXCEL_PATH) into data of user by background job (see job_response)."""
+    from mymonth.backup import import_job
+
+    job = jobs.submit('import', import_job, current_app.config['IMPORT_EXCEL_PATH'], user_id=g.user_id,
+                      owner=g.user_id)
+    return job_response(job)
+
+
+def wants_json():
+    """Checks if client prefers json to html (API clients: Accept application/json, */* or no Accept header)."""
+    return request.accept_mimetypes.best_match(['application/json', 'text/html']) != 'text/html'
+
+
+def job_response(job):
+    """Returns status of just submitted job (202 Accepted) with url of job_status in Location header.
+    Browsers are redirected to page of job_status."""
+    if not wants_json():
+        return redirect(url_for('main.job_status', job_id=job.id), code=303)
+    response = jsonify(job_dict(job))
+    response.status_code = 202
+    response.headers['Location'] = url_for('main.job_status', job_id=job.id)
+    return response
+
+
+def job_dict(job):
+    output = job.to_dict()
+    output['status_url'] = url_for('main.job_status', job_id=job.id)
+    if job.result_path is not None and job.status == 'finished':
+        output['file_url'] = url_for('main.job_file', job_id=job.id)
+    return output
+
+
+@bp.route('/jobs/<job_id>')
+def job_status(job_id):
+    """Returns status, progress and number of processed rows of background job (of user of request).
+    Browsers get page that polls status (as json) and shows link to file when job is finished."""
+    job = jobs.get(job_id)
+    if job is None or job.owner != g.user_id:
+        abort(404)
+    if not wants_json():
+        return render_template('job.html', title=f'Job {job.name}', job=job_dict(job))
+    return jsonify(job_dict(job))
+
+
+@bp.route('/jobs/<job_id>/file')
+def job_file(job_id):
+    """Returns file written by finished background job (e.g. xlsx export) as download."""
+    job = jobs.get(job_id)
+    if job is None or job.owner != g.user_id or job.result_path is None or job.status != 'finished':
+        abort(404)
+    return send_file(job.result_path, as_attachment=True, attachment_filename=job.result_name,
+                     mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
@@ -0,0 +1,151 @@
+"""Module contains:
+ - Configuration of production: SQLite in WAL mode with pool of connections, dashboard cache and state of jobs
+   shared by worker processes,
+ - Production server: worker processes are forked from master process after database is initialized and all of them
+   accept requests on one listening socket (WSGI server of werkzeug in each worker). Master starts new worker
+   if any exits and stops all of them on SIGTERM or SIGINT:
+
+    python serve.py [--host 127.0.0.1] [--port 8000] [--workers 4] [--threaded] [--access-log]
+"""
+import argparse
+import logging
+import os
+import signal
+import socket
+
+from sqlalchemy.pool import QueuePool
+
+from mymonth import create_app
+
+logger = logging.getLogger(__name__)
+
+
+def production_config(threaded=False):
+    """Returns config of application served by worker processes (see serve). Threaded workers serve
+    each request in new thread, otherwise one request at a time."""
+    return {
+        # Readers do not wait for writer (WAL) and writer waits for other writer up to busy_timeout [ms]
+        'SQLITE_PRAGMAS': {'journal_mode': 'WAL', 'synchronous': 'NORMAL', 'busy_timeout': 5000,
+                           'temp_store': 'MEMORY', 'cache_size': -16000, 'mmap_size': 256 * 1024 ** 2},
+        # Connections are kept open (SQLite default is new connection for each checkout): one for requests
+        # (more if threaded) and one for background job. Pool gives each connection to one thread at a time,
+        # so it can be used by other threads later.
+        'SQLALCHEMY_ENGINE_OPTIONS': {'poolclass': QueuePool, 'pool_size': 8 if threaded else 2,
+                                      'max_overflow': 8, 'connect_args': {'check_same_thread': False, 'timeout': 5}},
+        # In instance folder of application (see create_app)
+        'DASHBOARD_CACHE_PATH': os.environ.get('MYMONTH_DASHBOARD_CACHE_PATH', 'dashboard_cache.db'),
+        # Cache is shared by all users: 5 entries of dashboard of each of last 1000 users
+        'DASHBOARD_CACHE_SIZE': int(os.environ.get('MYMONTH_DASHBOARD_CACHE_SIZE', 5 * 1000)),
+        # Versions of data (days of users, target hours) shared by workers and CLI commands, also in instance folder
+        'VERSIONS_PATH': os.environ.get('MYMONTH_VERSIONS_PATH', 'versions.db'),
+        'JOBS_SHARED_STATE': True,
+    }
+
+
+def create_production_app(threaded=False, config=None):
+    """Creates application with production_config (other WSGI servers can use it too, e.g.
+    gunicorn -w 4 'mymonth.server:create_production_app()', after 'flask init-db').
+    CLI commands that change data of running server (e.g. flask set-schedule) use the same files of versions and
+    cache with FLASK_APP='mymonth.server:create_production_app()'."""
+    app_config = production_config(threaded)
+    if config is not None:
+        app_config.update(config)
+    return create_app(app_config)
+
+
+def run_worker(app, host, port, server_socket, threaded=False):
+    """Serves requests accepted on server_socket until process is stopped."""
+    from werkzeug.serving import make_server
+
+    server = make_server(host, port, app, threaded=threaded, fd=server_socket.fileno())
+    server.serve_forever()
+
+
+def serve(app, host='127.0.0.1', port=8000, workers=4, threaded=False):
+    """Serves app with 'workers' processes. Database is initialized (migrations.set_initial_db, also loads days of
+    users into days_store) and dashboard cache is invalidated in master process before workers are forked. Blocks until SIGTERM or SIGINT.
+    If os.fork is not available (Windows), app is served by one process."""
+    from mymonth import db, dashboard_cache
+    from mymonth.migrations import set_initial_db
+
+    with app.app_context():
+        set_initial_db()
+        # Shared cache may contain data of previous run (e.g. before database was replaced)
+        dashboard_cache.bump()
+        db.session.remove()
+        # Connections of master are not used by workers (each worker opens its own)
+        db.get_engine(app).dispose()
+    # Analytics and plotting modules are imported once, so workers share them and do not import them
+    # on first request
+    import mymonth.backup
+    import mymonth.graphs
+
+    server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    server_socket.bind((host, port))
+    server_socket.listen(128)
+    logger.info(f'Serving on http://{host}:{port} with {workers} worker(s)')
+
+    if workers == 1 or not hasattr(os, 'fork'):
+        try:
+            run_worker(app, host, port, server_socket, threaded)
+        finally:
+            server_socket.close()
+        return
+
+    worker_pids = set()
+    stopping = False
+
+    def start_worker():
+        pid = os.fork()
+        if pid == 0:
+            # Worker is stopped by master (SIGTERM), also after Ctrl+C in terminal
+            signal.signal(signal.SIGINT, signal.SIG_IGN)
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            exit_code = 0
+            try:
+                run_worker(app, host, port, server_socket, threaded)
+            except Exception:
+                logger.exception(f'Worker {os.getpid()} failed')
+                exit_code = 1
+            finally:
+                os._exit(exit_code)
+        worker_pids.add(pid)
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in worker_pids:
+            os.kill(pid, signal.SIGTERM)
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    for _ in range(workers):
+        start_worker()
+
+    while worker_pids:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        worker_pids.discard(pid)
+        if not stopping:
+            logger.warning(f'Worker {pid} exited (status {status}), starting new worker')
+            start_worker()
+    server_socket.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--workers', type=int, default=4, help='Number of worker processes')
+    parser.add_argument('--threaded', action='store_true', help='Workers serve each request in new thread')
+    parser.add_argument('--access-log', action='store_true', help='Logs each request')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(process)d %(levelname)s %(message)s')
+    if not args.access_log:
+        logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    serve(create_production_app(args.threaded), host=args.host, port=args.port, workers=args.workers,
+          threaded=args.threaded)
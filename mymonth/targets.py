@@ -0,0 +1,217 @@
+"""Module contains:
+ - Calendar of target (productive) hours of each date: weekday schedules and overrides of single dates
+   (e.g. holidays) stored in database, precomputed into numpy array indexed by day ordinal
+ - Changes of schedules and overrides (monthly rollup is recalculated, calendar is loaded again by all processes)
+"""
+from datetime import date, timedelta
+from threading import Lock
+
+from mymonth.cache import MemoryCacheStore, create_version_store
+from mymonth.defaults import Defaults
+
+# Ordinal of 1970-01-01 (numpy datetime64[D] counts days from this date)
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+# Range of dates covered by calendar (extended if dates outside of it are requested)
+CALENDAR_FIRST_DATE = date(1990, 1, 1)
+CALENDAR_LAST_DATE = date(2099, 12, 31)
+
+
+def weekday_seconds(hours_per_weekday):
+    """Returns tuple of target seconds for weekdays (0-Monday, 6-Sunday) from hours (numbers or timedeltas)."""
+    return tuple(int(round(hours.total_seconds() if isinstance(hours, timedelta) else hours * 3600))
+                 for hours in hours_per_weekday)
+
+
+class TargetCalendar:
+    """
+    Target seconds of each date between first_date and last_date, computed once.
+    Values are kept in read-only numpy array (int64) indexed by date.toordinal() - first_ordinal, so targets
+    of any range of dates are one slice.
+    """
+    def __init__(self, default_seconds, schedules=(), overrides=(), first_date=CALENDAR_FIRST_DATE,
+                 last_date=CALENDAR_LAST_DATE):
+        """
+        Parameters
+        ----------
+        default_seconds : tuple of int
+            Target seconds of weekdays (0-Monday) used before first schedule.
+        schedules : list of (date, tuple of int)
+            Date from which schedule is valid and target seconds of weekdays.
+        overrides : list of (date, int)
+            Target seconds of single dates.
+        first_date, last_date : date
+            Range of dates in calendar.
+        """
+        import numpy as np
+
+        self.default_seconds = tuple(default_seconds)
+        self.schedules = tuple(sorted((valid_from, tuple(seconds)) for valid_from, seconds in schedules))
+        self.overrides = tuple(sorted(overrides))
+        self.first_date = first_date
+        self.last_date = last_date
+        self.first_ordinal = first_date.toordinal()
+
+        ordinals = np.arange(self.first_ordinal, last_date.toordinal() + 1)
+        # Ordinal 1 (0001-01-01) is Monday
+        weekdays = (ordinals - 1) % 7
+        weekly_seconds = np.array([self.default_seconds] + [seconds for _, seconds in self.schedules], dtype='int64')
+        schedule_indexes = np.searchsorted([valid_from.toordinal() for valid_from, _ in self.schedules], ordinals,
+                                           side='right')
+        seconds = weekly_seconds[schedule_indexes, weekdays]
+        for override_date, override_seconds in self.overrides:
+            if first_date <= override_date <= last_date:
+                seconds[override_date.toordinal() - self.first_ordinal] = override_seconds
+        seconds.flags.writeable = False
+        self.seconds = seconds
+
+    def covers(self, start_date, end_date):
+        return self.first_date <= start_date and end_date <= self.last_date
+
+    def seconds_between(self, start_date, end_date):
+        """Returns read-only view (no copy) of target seconds of dates between start_date and end_date."""
+        return self.seconds[start_date.toordinal() - self.first_ordinal:end_date.toordinal() - self.first_ordinal + 1]
+
+    def seconds_for(self, dates):
+        """Returns target seconds of dates (DatetimeIndex or array of datetime64)."""
+        import numpy as np
+
+        ordinals = np.asarray(dates, dtype='datetime64[D]').astype('int64') + EPOCH_ORDINAL
+        return self.seconds[ordinals - self.first_ordinal]
+
+    def sqlite_seconds(self, column):
+        """Returns SQLite expression of target seconds of date column by schedules (without overrides).
+        Weekdays of strftime('%w') start with Sunday (0)."""
+        def weekday_case(seconds):
+            cases = ' '.join(f"WHEN '{(weekday + 1) % 7}' THEN {value}" for weekday, value in enumerate(seconds))
+            return f"CASE strftime('%w', {column}) {cases} END"
+
+        expression = weekday_case(self.default_seconds)
+        for valid_from, seconds in self.schedules:
+            expression = f"CASE WHEN {column} >= '{valid_from.isoformat()}' THEN {weekday_case(seconds)} " \
+                         f"ELSE {expression} END"
+        return expression
+
+
+class TargetHours:
+    """
+    Provides TargetCalendar of application. Calendar is loaded from tables target_schedules and target_overrides
+    on first use (one query per table) and kept in memory till change of schedules or overrides (invalidate).
+    Changes increase version of calendar in store of versions (see cache.create_version_store) shared by worker
+    processes and CLI commands, so calendar loaded by other processes is loaded again on their next use.
+    Default weekday hours (before first schedule) are set by config TARGET_HOURS_PER_WEEKDAY.
+    """
+    version_name = 'target_hours'
+
+    def __init__(self, app=None):
+        self.default_hours = Defaults.productive_hours_per_weekday
+        self.versions = MemoryCacheStore()
+        # (version, TargetCalendar) or None
+        self._loaded = None
+        self._lock = Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.default_hours = tuple(app.config.get('TARGET_HOURS_PER_WEEKDAY', self.default_hours))
+        self.versions = create_version_store(app)
+        self.clear()
+
+    def clear(self):
+        """Removes calendar of this process (e.g. to read changes not committed yet)."""
+        with self._lock:
+            self._loaded = None
+
+    def invalidate(self):
+        """Marks calendar as changed in all processes (called after commit)."""
+        self.versions.increment([self.version_name])
+        self.clear()
+
+    def calendar(self, start_date=None, end_date=None):
+        """Returns TargetCalendar that covers dates between start_date and end_date (must be called in
+        application context if calendar is not loaded yet or was changed by other process)."""
+        # Version is read before schedules, so changes committed meanwhile are loaded again on next use
+        (version, ) = self.versions.versions([self.version_name])
+        loaded = self._loaded
+        if loaded is not None and loaded[0] == version and (start_date is None or
+                                                             loaded[1].covers(start_date, end_date)):
+            return loaded[1]
+
+        from mymonth.models import TargetSchedule, TargetOverride
+
+        schedules = [(schedule.id, weekday_seconds(getattr(schedule, column)
+                                                   for column in TargetSchedule.weekday_columns))
+                     for schedule in TargetSchedule.query.all()]
+        overrides = [(override.id, weekday_seconds([override.target_hrs])[0])
+                     for override in TargetOverride.query.all()]
+        first_date, last_date = CALENDAR_FIRST_DATE, CALENDAR_LAST_DATE
+        if start_date is not None:
+            first_date, last_date = min(first_date, start_date), max(last_date, end_date)
+        calendar = TargetCalendar(weekday_seconds(self.default_hours), schedules, overrides, first_date, last_date)
+        with self._lock:
+            self._loaded = (version, calendar)
+        return calendar
+
+    def seconds_between(self, start_date, end_date):
+        """Returns read-only array of target seconds of dates between start_date and end_date."""
+        return self.calendar(start_date, end_date).seconds_between(start_date, end_date)
+
+    def timedeltas_for(self, dates):
+        """Returns target hours of dates (DatetimeIndex) as numpy array of timedelta64[ns]."""
+        import numpy as np
+
+        if len(dates) == 0:
+            return np.array([], dtype='timedelta64[ns]')
+        calendar = self.calendar(dates.min().date(), dates.max().date())
+        return calendar.seconds_for(dates).astype('timedelta64[s]').astype('timedelta64[ns]')
+
+    def target(self, input_date):
+        """Returns target hours of one date as timedelta."""
+        return timedelta(seconds=int(self.seconds_between(input_date, input_date)[0]))
+
+
+def _after_change(start_date):
+    """Recalculates monthly rollup of months from start_date (of all users) with changes not committed yet."""
+    from mymonth import target_hours
+    from mymonth.datasets import MonthSummaryTable
+
+    target_hours.clear()
+    MonthSummaryTable.rebuild(start_date=start_date)
+
+
+def commit_change():
+    """Commits changes of schedules and overrides, then marks calendar and cached data as changed in all processes
+    (before commit, other processes would load old schedules again)."""
+    from mymonth import db, dashboard_cache, target_hours
+
+    db.session.commit()
+    target_hours.invalidate()
+    dashboard_cache.bump()
+
+
+def set_schedule(valid_from, hours_per_weekday):
+    """Adds (or replaces) schedule valid from date valid_from with target hours (7 numbers, Monday first).
+    Changes are added to db.session (committed by commit_change)."""
+    from mymonth import db
+    from mymonth.models import TargetSchedule
+
+    hours_per_weekday = list(hours_per_weekday)
+    if len(hours_per_weekday) != 7:
+        raise ValueError('Schedule must have target hours of 7 weekdays')
+    db.session.merge(TargetSchedule(id=valid_from, **{column: timedelta(hours=hours) for column, hours
+                                                      in zip(TargetSchedule.weekday_columns, hours_per_weekday)}))
+    db.session.flush()
+    _after_change(valid_from)
+
+
+def set_override(input_date, hours, note=None):
+    """Sets target hours of one date (e.g. 0 for holiday). If hours is None, override is removed.
+    Committed by commit_change like set_schedule."""
+    from mymonth import db
+    from mymonth.models import TargetOverride
+
+    if hours is None:
+        TargetOverride.query.filter_by(id=input_date).delete()
+    else:
+        db.session.merge(TargetOverride(id=input_date, target_hrs=timedelta(hours=hours), note=note))
+    db.session.flush()
+    _after_change(input_date)
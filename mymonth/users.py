@@ -0,0 +1,95 @@
+"""Module contains:
+ - User of request: name of user is read from header set by authenticating proxy (config USER_HEADER).
+   Without header, all requests use default user (single-user application),
+ - Creation of users with initial data (settings, targets and days of current month)
+"""
+from datetime import date
+
+from flask import abort, g, request
+from sqlalchemy.exc import IntegrityError
+
+
+class Users:
+    """
+    Sets id of user of each request in g.user_id (see load_current_user, run before routes of blueprint).
+    Ids of user names are kept in memory (names do not change), so requests of known users do not query database.
+    Unknown users are created on their first request if config USER_AUTO_CREATE is set (default), otherwise
+    they get 403.
+    """
+    def __init__(self, app=None):
+        self.header = None
+        self.auto_create = True
+        self._ids = {}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.header = app.config.get('USER_HEADER', self.header)
+        self.auto_create = app.config.get('USER_AUTO_CREATE', self.auto_create)
+        self._ids = {}
+
+    def load_current_user(self):
+        """Sets g.user_id of request. Aborts with 401 if header with user name is configured but missing."""
+        from mymonth.models import DEFAULT_USER_ID
+
+        if not self.header:
+            g.user_id = DEFAULT_USER_ID
+            return
+        name = request.headers.get(self.header)
+        if not name:
+            abort(401)
+        user_id = self.get_id(name)
+        if user_id is None:
+            abort(403)
+        g.user_id = user_id
+
+    def get_id(self, name):
+        """Returns id of user with name. If user does not exist, it's created (if auto_create is set)
+        or None is returned."""
+        user_id = self._ids.get(name)
+        if user_id is not None:
+            return user_id
+
+        from mymonth.models import User
+
+        user = User.query.filter_by(name=name).first()
+        if user is None:
+            if not self.auto_create:
+                return None
+            user = create_user(name)
+        self._ids[name] = user.id
+        return user.id
+
+
+def add_initial_data(user_id):
+    """Adds settings (displayed month is current month) and targets of current month of a user if user
+    has none (not committed)."""
+    from mymonth import db
+    from mymonth.models import Settings, MonthlyTargets
+
+    if Settings.query.get(user_id) is None:
+        db.session.add(Settings(user_id=user_id, current_month_date=date.today()))
+    if MonthlyTargets.query.filter_by(user_id=user_id).first() is None:
+        db.session.add(MonthlyTargets(user_id=user_id, id=date.today().replace(day=1)))
+    db.session.flush()
+
+
+def create_user(name):
+    """Adds user with initial data and days of current month, in one transaction. If user was created meanwhile
+    (e.g. by first request of user in other worker), existing user is returned. Returns User."""
+    from mymonth import db, days_store
+    from mymonth.models import User
+    from mymonth.datasets import backfill_month
+
+    try:
+        user = User(name=name)
+        db.session.add(user)
+        db.session.flush()
+        add_initial_data(user.id)
+        backfill_month(date.today(), user.id)
+        db.session.commit()
+        days_store.invalidate(user.id)
+    except IntegrityError:
+        db.session.rollback()
+        user = User.query.filter_by(name=name).one()
+    return user
@@ -3,8 +3,68 @@
 """
 from calendar import monthrange
 from datetime import date, timedelta, datetime
+from functools import lru_cache
 import re
-from pandas import NaT
+import sys
+
+# Compiled patterns used to translate output format of durations (e.g. 'd hh mm') into format attributes
+DURATION_FORMAT_PATTERNS = {unit: re.compile(rf'{unit}+\s*') for unit in 'dhms'}
+SECONDS_PER_UNIT = {'d': 86400, 'h': 3600, 'm': 60, 's': 1}
+# Compiled pattern of value followed by unit in duration strings (e.g. '10h 5m' -> ('10', 'h'), ('5', 'm'))
+DURATION_STRING_PATTERN = re.compile(r'(\d+)\s*([dhms])')
+# Valid duration string: only values followed by units (e.g. 'h5' or '5' are invalid), empty string is 0
+DURATION_STRING_VALID_PATTERN = re.compile(r'\s*(?:\d+\s*[dhms]\s*)*')
+
+
+def _is_nat(value):
+    """Checks if value is pandas NaT (pandas is imported only by vectorized functions, so importing utils is fast)."""
+    pandas = sys.modules.get('pandas')
+    return pandas is not None and value is pandas.NaT
+
+
+class MonthCalendar:
+    """
+    Precomputed calendar of one month, created once per (year, month) by UtilsDatetime.month_calendar.
+    Dates are tuple and numpy arrays are read-only, so instance can be shared between requests.
+    """
+    def __init__(self, year, month):
+        import numpy as np
+
+        self.year = year
+        self.month = month
+        self.nb_of_days = monthrange(year=year, month=month)[1]
+        self.first_date = date(year=year, month=month, day=1)
+        self.last_date = date(year=year, month=month, day=self.nb_of_days)
+        self.dates = tuple(date(year=year, month=month, day=day) for day in range(1, self.nb_of_days + 1))
+        self.ordinals = np.arange(self.first_date.toordinal(), self.last_date.toordinal() + 1)
+        # Ordinal 1 (0001-01-01) is Monday
+        self.weekdays = (self.ordinals - 1) % 7
+        self.days_of_month = np.arange(1, self.nb_of_days + 1)
+        for array in [self.ordinals, self.weekdays, self.days_of_month]:
+            array.flags.writeable = False
+
+    def __repr__(self):
+        return f"MonthCalendar(year={self.year}, month={self.month})"
+
+    def days_elapsed(self, today=None):
+        """Returns number of days of month till today (including today): today's day of month if month is current,
+        number of days of month if month is in the past and 1 if month is in the future (e.g. to calculate
+        average alk per day)."""
+        if today is None:
+            today = date.today()
+        return min(max(today.toordinal() - self.first_date.toordinal() + 1, 1), self.nb_of_days)
+
+    def mask_till(self, today=None):
+        """Returns boolean array: True for days of month till today (including today)."""
+        if today is None:
+            today = date.today()
+        return self.ordinals <= today.toordinal()
+
+    def day_index(self, input_date):
+        """Returns index of input_date in arrays of calendar or None if date is not in month."""
+        if self.first_date <= input_date <= self.last_date:
+            return input_date.day - 1
+        return None
 
 
 class UtilsDatetime:
@@ -14,6 +74,17 @@ class UtilsDatetime:
         self.month = input_date.month
         self.year = input_date.year
 
+    @staticmethod
+    @lru_cache(maxsize=None)
+    def get_month_calendar(year, month):
+        """Returns MonthCalendar of a month (created once per month)."""
+        return MonthCalendar(year, month)
+
+    @property
+    def month_calendar(self):
+        """Returns MonthCalendar of a month representing input_date"""
+        return self.get_month_calendar(self.year, self.month)
+
     @property
     def month_first_date(self):
         """Returns first day of a month representing input_date"""
@@ -27,9 +98,8 @@ class UtilsDatetime:
 
     @property
     def month_all_dates(self):
-        """Returns all days of a month as a list"""
-        number_days_in_month = (self.month_last_date - self.month_first_date).days + 1
-        return [date(year=self.year, month=self.month, day=day) for day in range(1, number_days_in_month + 1)]
+        """Returns all days of a month as a tuple (shared by all calls, see month_calendar)"""
+        return self.month_calendar.dates
 
 
 class UtilsDataConversion:
@@ -52,6 +122,38 @@ class UtilsDataConversion:
         seconds = int(duration_dict.get('s', 0))
         return timedelta(days=days, hours=hours, minutes=minutes, seconds=seconds)
 
+    @staticmethod
+    def timedelta_from_string_array(input_strings):
+        """ Vectorized version of timedelta_from_string (same result for each valid string).
+         - input_strings: pandas Series, numpy array or list of strings like '10h 5m'.
+           Empty strings, None and NaN are converted to 0.
+           Values not followed by unit (e.g. 'h5', '5' or number from excel cell) raise ValueError
+           (timedelta_from_string pairs units and values by position, so it reads 'h5' as 5h).
+        Returns pandas Series (with index of input Series) or numpy array of timedelta64[ns].
+        Each distinct string is parsed only once.
+        """
+        import numpy as np
+        import pandas as pd
+
+        codes, unique_strings = pd.factorize(pd.Series(input_strings, dtype=object))
+        unique_strings = pd.Series(unique_strings, dtype=object).astype(str)
+        invalid_strings = unique_strings[~unique_strings.str.fullmatch(DURATION_STRING_VALID_PATTERN)]
+        if not invalid_strings.empty:
+            raise ValueError(f"Invalid duration strings (expected e.g. '10h 5m'): {invalid_strings.tolist()[:5]}")
+        pairs = unique_strings.str.extractall(DURATION_STRING_PATTERN)
+        seconds = pairs[0].astype(np.int64) * pairs[1].map(SECONDS_PER_UNIT)
+        # If unit is repeated, last value is used (like dict in timedelta_from_string)
+        seconds = seconds.groupby([pairs.index.get_level_values(0), pairs[1].values]).last().groupby(level=0).sum()
+
+        unique_seconds = np.zeros(len(unique_strings) + 1, dtype=np.int64)
+        unique_seconds[seconds.index] = seconds.values
+        # Code -1 (None, NaN) points to last element equal to 0
+        output_timedeltas = unique_seconds[codes].astype('timedelta64[s]').astype('timedelta64[ns]')
+
+        if isinstance(input_strings, pd.Series):
+            return pd.Series(output_timedeltas, index=input_strings.index, name=input_strings.name)
+        return output_timedeltas
+
     @staticmethod
     def string_from_timedelta(input_timedelta, output_format=None, show_units_with_zero=False):
         """ Converts timedelta object into string e.g. 2h 35m with a specified output_format.
@@ -69,34 +171,73 @@ class UtilsDataConversion:
         if isinstance(input_timedelta, datetime):
             input_timedelta = input_timedelta - datetime(1970, 1, 1)
 
-        if input_timedelta is None or input_timedelta is NaT or input_timedelta.total_seconds() == 0:
+        if input_timedelta is None or _is_nat(input_timedelta) or input_timedelta.total_seconds() == 0:
             return ''
 
         input_timedelta = input_timedelta.total_seconds()
 
+        output_string = ''
+        for unit, seconds_per_unit, digits, rest in UtilsDataConversion.parse_duration_format(output_format):
+            unit_value = int(input_timedelta // seconds_per_unit)
+            if unit_value > 0 or (unit_value == 0 and show_units_with_zero):
+                input_timedelta -= unit_value * seconds_per_unit
+                output_string += f"{unit_value:0>{digits}}{unit}{rest}"
+        return output_string.strip()
+
+    @staticmethod
+    @lru_cache(maxsize=None)
+    def parse_duration_format(output_format=None):
+        """ Translates output format of durations (see string_from_timedelta) into tuple of
+        (unit, seconds_per_unit, digits, rest) for each unit present in format (ordered from days to seconds).
+        E.g. 'd hh mm' -> (('d', 86400, 1, ' '), ('h', 3600, 2, ' '), ('m', 60, 2, '')).
+        Result is cached, so each format is parsed only once.
+        """
         # Set default output format
         if output_format is None:
             output_format = 'd h m s'
-        # Translate format from string to dict of {time_indicator: {'digits': X, 'rest': Y}
-        # E.g.  'd hh mm' -> {'d': {'digits': 1, 'rest': ' '}, 'h': {'digits': 2, 'rest': ' '}, [...]}
-        seconds_per_unit = {'d': 86400, 'h': 3600, 'm': 60, 's': 1}
-        output_format_attrs = {}
-        for unit in seconds_per_unit:
-            output_format_attrs[unit] = {'digits': 0, 'rest': ''}
-            unit_presence = re.findall(rf'{unit}+\s*', output_format)
+        output_format_attrs = []
+        for unit, pattern in DURATION_FORMAT_PATTERNS.items():
+            unit_presence = pattern.findall(output_format)
             if unit_presence:
-                output_format_attrs[unit]['digits'] = unit_presence[0].count(unit)
-                output_format_attrs[unit]['rest'] = unit_presence[0].replace(unit, '')
+                output_format_attrs.append((unit, SECONDS_PER_UNIT[unit], unit_presence[0].count(unit),
+                                            unit_presence[0].replace(unit, '')))
+        return tuple(output_format_attrs)
 
-        output_string = ''
-        for unit in output_format_attrs:
-            if output_format_attrs[unit]['digits'] > 0:
-                unit_value = int(input_timedelta // seconds_per_unit[unit])
-                if unit_value > 0 or (unit_value == 0 and show_units_with_zero):
-                    input_timedelta -= unit_value * seconds_per_unit[unit]
-                    output_string += f"{unit_value:0>{output_format_attrs[unit]['digits']}}{unit}" \
-                                     f"{output_format_attrs[unit]['rest']}"
-        return output_string.strip()
+    @staticmethod
+    def string_from_timedelta_array(input_timedeltas, output_format=None, show_units_with_zero=False):
+        """ Vectorized version of string_from_timedelta (same output for each element).
+         - input_timedeltas: pandas Series, numpy array or list of timedelta objects.
+           Datetime values (intervals kept in database as datetimes starting at 1970-1-1) are converted to timedelta.
+           Empty, None, NaT, negative or equal to 0 values return empty string ''.
+         - output_format, show_units_with_zero: see string_from_timedelta.
+        Returns pandas Series (with index of input Series) or numpy array of strings.
+        """
+        import numpy as np
+        import pandas as pd
+
+        timedeltas = pd.Series(input_timedeltas)
+        if pd.api.types.is_datetime64_any_dtype(timedeltas):
+            timedeltas = timedeltas - datetime(1970, 1, 1)
+        elif timedeltas.dtype == object:
+            timedeltas = timedeltas.map(lambda x: x - datetime(1970, 1, 1) if isinstance(x, datetime) else x)
+        timedeltas = pd.to_timedelta(timedeltas)
+
+        # Integer division on microseconds (resolution of timedelta.total_seconds)
+        remaining = timedeltas.values.astype('timedelta64[ns]').astype(np.int64) // 1000
+        mask_empty = timedeltas.isna().values | (remaining <= 0)
+        remaining = np.where(mask_empty, 0, remaining)
+        output_strings = np.full(remaining.shape, '', dtype=object)
+        for unit, seconds_per_unit, digits, rest in UtilsDataConversion.parse_duration_format(output_format):
+            unit_value, remaining = np.divmod(remaining, seconds_per_unit * 10 ** 6)
+            mask_display = (unit_value > 0) | ((unit_value == 0) & show_units_with_zero)
+            unit_strings = np.char.mod(f'%0{digits}d{unit}{rest}', unit_value[mask_display]).astype(object)
+            output_strings[mask_display] = output_strings[mask_display] + unit_strings
+        output_strings = np.char.strip(output_strings.astype(str)).astype(object)
+        output_strings[mask_empty] = ''
+
+        if isinstance(input_timedeltas, pd.Series):
+            return pd.Series(output_strings, index=input_timedeltas.index, name=input_timedeltas.name)
+        return output_strings
 
     @staticmethod
     def string_from_timedelta_subtraction(timedelta_1, timedelta_2):
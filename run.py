@@ -1,5 +1,10 @@
-from mymonth import app
+from mymonth import create_app
+from mymonth.migrations import set_initial_db
+
+app = create_app()
 
 
 if __name__ == '__main__':
+    with app.app_context():
+        set_initial_db()
     app.run(debug=True)
@@ -1,4 +1,9 @@
-from mymonth import app
+from mymonth import create_app
+from mymonth.migrations import set_initial_db
+
+app = create_app()
 
 if __name__ == '__main__':
+    with app.app_context():
+        set_initial_db()
     app.run(debug=True, host='192.168.2.68', port=50000)
@@ -0,0 +1,9 @@
+"""Production entry point: pre-forked worker processes (see mymonth.server).
+
+    python serve.py [--host 127.0.0.1] [--port 8000] [--workers 4] [--threaded] [--access-log]
+"""
+from mymonth.server import main
+
+
+if __name__ == '__main__':
+    main()
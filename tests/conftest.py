@@ -0,0 +1,16 @@
+import pytest
+
+from mymonth import create_app, db
+from mymonth.migrations import set_initial_db
+
+
+@pytest.fixture
+def app():
+    """Application with empty in-memory database (initialized like at start of run.py)."""
+    app = create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite://', 'VERSIONS_PATH': None, 'TESTING': True,
+                      'WTF_CSRF_ENABLED': False})
+    with app.app_context():
+        set_initial_db()
+        yield app
+        db.session.remove()
+        db.get_engine(app).dispose()
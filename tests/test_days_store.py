@@ -0,0 +1,114 @@
+"""Prefix sums of days_store: sums updated by patches equal sums built again from database, totals and running
+totals equal sums of days."""
+import random
+from datetime import date, timedelta
+
+import numpy as np
+import pytest
+
+from mymonth import db, days_store, target_hours
+from mymonth.daystore import ALK_UNITS, CATEGORIES, DayColumns, PrefixSums
+from mymonth.models import Days, DEFAULT_USER_ID
+
+FIRST_DATE = date(2019, 12, 30)
+LAST_DATE = date(2021, 1, 3)
+
+
+def random_day(rng, day_id):
+    day = Days(user_id=DEFAULT_USER_ID, id=day_id)
+    for category in CATEGORIES:
+        if rng.random() < 0.7:
+            setattr(day, category, timedelta(minutes=rng.randrange(0, 300), seconds=rng.randrange(0, 60)))
+    if rng.random() < 0.8:
+        day.alk = rng.choice([0.0, 0.1, 1.5, 2.86, 3.2, 7.33])
+    return day
+
+
+@pytest.fixture
+def days(app):
+    """Days of default user between FIRST_DATE and LAST_DATE with empty values and dates without row."""
+    rng = random.Random(7)
+    Days.query.filter_by(user_id=DEFAULT_USER_ID).delete()
+    for offset in range((LAST_DATE - FIRST_DATE).days + 1):
+        day_id = FIRST_DATE + timedelta(days=offset)
+        # First and last date have rows
+        if day_id in (FIRST_DATE, LAST_DATE) or rng.random() < 0.9:
+            db.session.add(random_day(rng, day_id))
+    db.session.commit()
+    days_store.invalidate(DEFAULT_USER_ID)
+    return rng
+
+
+def direct_sums(day_columns, calendar):
+    """Returns sums (dict name: int) of valid days of day_columns calculated day by day."""
+    sums = dict.fromkeys(PrefixSums.names, 0)
+    for position in np.flatnonzero(day_columns.valid):
+        day_date = date.fromordinal(int(day_columns.ordinals[position]))
+        alk = 0.0 if np.isnan(day_columns.alk[position]) else float(day_columns.alk[position])
+        for row, category in enumerate(CATEGORIES):
+            sums[category] += int(day_columns.seconds[row, position])
+        sums['target'] += int(calendar.seconds_between(day_date, day_date)[0])
+        sums['negative'] += round(max(alk - 2.86, 0) * 1200 * 1000000)
+        sums['alk'] += round(alk * ALK_UNITS)
+        sums['days'] += 1
+        sums['day0'] += alk <= 0
+    return sums
+
+
+def edit_day(rng, day_id):
+    day = db.session.merge(random_day(rng, day_id))
+    db.session.commit()
+    days_store.patch(DEFAULT_USER_ID, [day])
+
+
+def test_patched_prefix_sums_equal_built_again(days):
+    rng = days
+    columns = days_store.columns(DEFAULT_USER_ID)
+    columns.prefix_sums()
+    # First, last and middle day, date without row and the same day twice
+    for day_id in [FIRST_DATE, LAST_DATE, date(2020, 6, 15), date(2020, 6, 15), date(2020, 2, 29)]:
+        edit_day(rng, day_id)
+    patched = days_store.columns(DEFAULT_USER_ID)
+    # Columns are replaced by patched copy, columns read before edits are not changed
+    assert patched is not columns
+    assert patched.ordinals is columns.ordinals
+
+    loaded = DayColumns.load(DEFAULT_USER_ID)
+    for name in ['ordinals', 'seconds', 'valid']:
+        np.testing.assert_array_equal(getattr(patched, name), getattr(loaded, name))
+    np.testing.assert_array_equal(patched.alk, loaded.alk)
+    np.testing.assert_array_equal(patched.prefix_sums().sums, loaded.prefix_sums().sums)
+
+
+def test_days_outside_of_columns_are_loaded_again(days):
+    rng = days
+    days_store.columns(DEFAULT_USER_ID).prefix_sums()
+    for day_id in [FIRST_DATE - timedelta(days=3), LAST_DATE + timedelta(days=40)]:
+        edit_day(rng, day_id)
+        columns = days_store.columns(DEFAULT_USER_ID)
+        assert columns.first_ordinal <= day_id.toordinal() <= int(columns.ordinals[-1])
+        np.testing.assert_array_equal(columns.prefix_sums().sums, DayColumns.load(DEFAULT_USER_ID).prefix_sums().sums)
+
+
+def test_totals_equal_sums_of_days(days):
+    rng = days
+    for day_id in [FIRST_DATE, LAST_DATE, date(2020, 3, 1)]:
+        edit_day(rng, day_id)
+    columns = days_store.columns(DEFAULT_USER_ID)
+    calendar = target_hours.calendar()
+    ranges = [(FIRST_DATE, LAST_DATE), (date.min, date.max), (FIRST_DATE, FIRST_DATE), (LAST_DATE, LAST_DATE),
+              (date(2018, 1, 1), date(2018, 12, 31)), (date(2022, 1, 1), date(2022, 1, 31))]
+    for _ in range(30):
+        start_date = FIRST_DATE + timedelta(days=rng.randrange(-10, 380))
+        ranges.append((start_date, start_date + timedelta(days=rng.randrange(0, 100))))
+
+    for start_date, end_date in ranges:
+        day_columns = columns.between(start_date, end_date)
+        assert days_store.totals(DEFAULT_USER_ID, start_date, end_date) == direct_sums(day_columns, calendar)
+
+        running_totals = days_store.running_totals(DEFAULT_USER_ID, start_date, end_date)
+        assert running_totals.shape == (len(PrefixSums.names), len(day_columns))
+        for position in range(0, len(day_columns), 17):
+            expected = direct_sums(columns.between(start_date, date.fromordinal(int(day_columns.ordinals[position]))),
+                                   calendar)
+            assert dict(zip(PrefixSums.names, running_totals[:, position].tolist())) == expected
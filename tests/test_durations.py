@@ -0,0 +1,32 @@
+"""Vectorized parser of duration strings compared with UtilsDataConversion.timedelta_from_string."""
+import numpy as np
+import pandas as pd
+import pytest
+
+from mymonth.utils import UtilsDataConversion
+
+VALID_STRINGS = ['', '0m', '1s', '10h 5m', '5m 10h', '3d', '1h 3s', '30m2s', ' 2h ', '1d 23h 59m 59s', '007m',
+                 '1h 2h', '90m', '10 h 5 m', '48h']
+
+
+def test_parsing_of_array_equals_parsing_of_each_string():
+    reference = [UtilsDataConversion.timedelta_from_string(value) for value in VALID_STRINGS]
+
+    timedeltas = UtilsDataConversion.timedelta_from_string_array(VALID_STRINGS)
+    assert timedeltas.dtype == 'timedelta64[ns]'
+    assert list(pd.to_timedelta(timedeltas)) == reference
+    # Series keeps index and name
+    series = pd.Series(VALID_STRINGS, index=np.arange(len(VALID_STRINGS)) * 3, name='dev')
+    pd.testing.assert_series_equal(UtilsDataConversion.timedelta_from_string_array(series),
+                                   pd.Series(pd.to_timedelta(reference), index=series.index, name='dev'))
+
+
+def test_missing_strings_are_zero():
+    timedeltas = UtilsDataConversion.timedelta_from_string_array([None, np.nan, '', '1h', None])
+    assert list(pd.to_timedelta(timedeltas)) == [pd.Timedelta(0)] * 3 + [pd.Timedelta(hours=1), pd.Timedelta(0)]
+
+
+@pytest.mark.parametrize('invalid_string', ['h5', '5', '5x', '1h 5', 'm', '1.5h', '-1h', 5])
+def test_invalid_strings_are_rejected(invalid_string):
+    with pytest.raises(ValueError, match='Invalid duration strings'):
+        UtilsDataConversion.timedelta_from_string_array(['1h', invalid_string])
@@ -0,0 +1,21 @@
+"""Dashboard read after edit of a day shows new values (cached dashboard and days_store are invalidated)."""
+from datetime import date, timedelta
+
+from mymonth.utils import UtilsDataConversion
+
+
+def test_dashboard_shows_edited_day(app):
+    client = app.test_client()
+    # Dashboard of current month is cached before edit
+    assert client.get('/').status_code == 200
+
+    response = client.post(f'/day/edit/{date.today().isoformat()}',
+                           data={'ds': '7h 13m', 'dev': '', 'pol': '25m', 'ge': '', 'crt': '', 'hs': '', 'alk': '4.5',
+                                 'submit': 'Save'})
+    assert response.status_code == 302
+
+    page = client.get('/').get_data(as_text=True)
+    assert UtilsDataConversion.string_from_timedelta(timedelta(hours=7, minutes=13), 'h mm',
+                                                     show_units_with_zero=True) in page
+    assert UtilsDataConversion.string_from_timedelta(timedelta(hours=7, minutes=38)) in page
+    assert 'value="4.5"' in page
@@ -0,0 +1,92 @@
+"""Exports (and vectorized duration formatting used by them) compared with formatting of each value by
+UtilsDataConversion.string_from_timedelta."""
+import csv
+import io
+from datetime import date, datetime, timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+from openpyxl import load_workbook
+from sqlalchemy import select
+
+from mymonth import db
+from mymonth.backup import EXPORT_TABLES, data_columns, generate_csv_export, write_excel_export
+from mymonth.columns import Duration
+from mymonth.daystore import CATEGORIES
+from mymonth.models import Days, MonthlyTargets, DEFAULT_USER_ID
+from mymonth.utils import UtilsDataConversion
+
+TIMEDELTAS = [None, timedelta(), timedelta(seconds=1), timedelta(minutes=59, seconds=59), timedelta(hours=1),
+              timedelta(hours=7, minutes=13), timedelta(hours=23, minutes=59, seconds=59), timedelta(days=1),
+              timedelta(days=3, hours=2, seconds=5), timedelta(days=400, minutes=1), timedelta(microseconds=1),
+              timedelta(seconds=59, microseconds=999999), timedelta(seconds=-1), timedelta(hours=-5, minutes=3)]
+
+
+def reference_rows(table):
+    """Rows of table (as exported) with intervals formatted one by one."""
+    columns = data_columns(table)
+    with db.engine.connect() as connection:
+        rows = connection.execute(select(columns).where(table.c.user_id == DEFAULT_USER_ID).order_by(table.c.id))
+        return [[UtilsDataConversion.string_from_timedelta(value) if isinstance(column.type, Duration) else value
+                 for column, value in zip(columns, row)] for row in rows]
+
+
+@pytest.fixture
+def days():
+    """Days with missing, zero and sub-minute durations on first and last days of months (and of leap February)."""
+    values = TIMEDELTAS[:10]
+    dates = [date(2020, 1, 1), date(2020, 1, 31), date(2020, 2, 1), date(2020, 2, 28), date(2020, 2, 29),
+             date(2020, 3, 1), date(2020, 12, 31), date(2021, 1, 1)]
+    for i, input_date in enumerate(dates):
+        db.session.add(Days(user_id=DEFAULT_USER_ID, id=input_date, alk=None if i % 3 == 0 else i * 0.5,
+                            **{col: values[(i + shift) % len(values)]
+                               for shift, col in enumerate(CATEGORIES)}))
+    db.session.add(MonthlyTargets(user_id=DEFAULT_USER_ID, id=date(2020, 2, 1), ds=timedelta(hours=40),
+                                  dev=timedelta(), pol=None, days0=3))
+    db.session.commit()
+
+
+@pytest.mark.parametrize('output_format', [None, 'h mm', 'd hh m', 'hmm', 'h', 'ss'])
+@pytest.mark.parametrize('show_units_with_zero', [False, True])
+def test_array_formatting_equals_formatting_of_each_value(output_format, show_units_with_zero):
+    reference = [UtilsDataConversion.string_from_timedelta(value, output_format, show_units_with_zero)
+                 for value in TIMEDELTAS]
+
+    formatted = UtilsDataConversion.string_from_timedelta_array(TIMEDELTAS, output_format, show_units_with_zero)
+    assert list(formatted) == reference
+    # Intervals kept in database as datetimes starting at 1970-1-1
+    datetimes = [None if value is None else datetime(1970, 1, 1) + value for value in TIMEDELTAS[:10]]
+    assert list(UtilsDataConversion.string_from_timedelta_array(datetimes, output_format, show_units_with_zero)) == \
+        reference[:10]
+    # Series with NaT keeps index and name
+    series = pd.Series(pd.to_timedelta(TIMEDELTAS), index=np.arange(len(TIMEDELTAS)) * 2, name='ds')
+    formatted_series = UtilsDataConversion.string_from_timedelta_array(series, output_format, show_units_with_zero)
+    pd.testing.assert_series_equal(formatted_series, pd.Series(reference, index=series.index, name='ds',
+                                                               dtype=object))
+
+
+@pytest.mark.parametrize('chunk_size', [1, 3, 1000])
+def test_csv_export_is_identical(app, days, chunk_size):
+    for table_name, table in EXPORT_TABLES.items():
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow([column.name for column in data_columns(table)])
+        writer.writerows(reference_rows(table))
+
+        assert ''.join(generate_csv_export(table_name, chunk_size=chunk_size)).encode() == \
+            buffer.getvalue().encode()
+
+
+def test_excel_export_has_identical_cells(app, days):
+    output_file = io.BytesIO()
+    write_excel_export(output_file, chunk_size=3)
+
+    workbook = load_workbook(output_file, read_only=True)
+    for sheet_name, table in EXPORT_TABLES.items():
+        header, *rows = [list(row) for row in workbook[sheet_name].values]
+        assert header == [column.name for column in data_columns(table)]
+        # Dates are written as datetimes and empty strings as empty cells (trailing ones are not read)
+        assert [[value.date() if isinstance(value, datetime) else '' if value is None else value for value in row] +
+                [''] * (len(header) - len(row)) for row in rows] == \
+            [['' if value is None else value for value in row] for row in reference_rows(table)]
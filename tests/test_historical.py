@@ -0,0 +1,77 @@
+"""transform_historical_scores_into_daily_data compared with loop over months that expanded historical scores
+before vectorization."""
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+
+from mymonth import target_hours
+from mymonth.backup import transform_historical_scores_into_daily_data
+from mymonth.utils import UtilsDatetime, UtilsDataConversion
+
+
+def reference_daily_data(input_path, input_sheetname):
+    """Expansion of historical scores month by month (scalar target hours and duration formatting)."""
+    df_historical = pd.read_excel(input_path, sheet_name=input_sheetname)
+    df_historical.dropna(inplace=True)
+    df_historical['date'] = pd.to_datetime(df_historical['month'], format='%ym%m')
+    df_historical.set_index('date', inplace=True)
+
+    new_index = []
+    for day in df_historical.index:
+        new_index.extend(UtilsDatetime(day).month_all_dates)
+    df = df_historical.reindex(new_index, method='ffill').reset_index()
+
+    count_days_in_month = df.groupby('month').size()
+    count_days_in_month.name = 'nb_of_days'
+    df = df.merge(count_days_in_month, how='left', on='month')
+    df['new_ml'] = df.ml * df.nb_of_days / (df.nb_of_days - df.day0)
+
+    df_groups = []
+    for _, group_data in list(df.groupby('month')):
+        ml_including_days0 = group_data.new_ml.copy()
+        ml_including_days0.iloc[0: int(group_data.day0.iloc[0])] = 0
+        group_data['new_ml'] = ml_including_days0
+        df_groups.append(group_data)
+    df = pd.concat(df_groups, ignore_index=True)
+
+    df['sja'] = df.new_ml * 7.8 / 750
+    df['negative_hrs'] = (df['sja'] - 2.86).clip(0) * timedelta(minutes=20)
+
+    df['target_hrs'] = df['date'].map(target_hours.target)
+    df_positive_hrs_calc = df.groupby('month', as_index=False)[
+        ['negative_hrs', 'target_hrs', 'score', 'nb_of_days']].agg(
+        {'negative_hrs': sum, 'target_hrs': sum, 'score': np.mean, 'nb_of_days': max})
+    df_positive_hrs_calc['avg_positive_hrs'] = (df_positive_hrs_calc['target_hrs'] * df_positive_hrs_calc['score'] +
+                                                df_positive_hrs_calc['negative_hrs']) / df_positive_hrs_calc[
+                                                   'nb_of_days']
+    df = df.merge(df_positive_hrs_calc[['month', 'avg_positive_hrs']], how='left', on='month')
+
+    df_import_me = df[['date', 'avg_positive_hrs', 'sja']].copy()
+    df_import_me.rename(columns={'date': 'id', 'avg_positive_hrs': 'dev', 'sja': 'alk'}, inplace=True)
+    df_import_me['dev'] = df_import_me['dev'].map(UtilsDataConversion.string_from_timedelta)
+    df_import_me['id'] = pd.to_datetime(df_import_me['id'])
+    return df_import_me
+
+
+def test_expansion_equals_loop_over_months(app, tmp_path):
+    rng = np.random.default_rng(3)
+    months = pd.date_range('2019-01-01', '2021-12-01', freq='MS')
+    df_historical_scores = pd.DataFrame({'month': months.strftime('%ym%m'),
+                                         'score': rng.random(months.size).round(4),
+                                         'day0': rng.integers(1, 12, months.size),
+                                         'ml': rng.integers(300, 650, months.size).astype(float)})
+    # Edge cases: no days0, all days of month are days0 (Feb of leap year), no alk, score 0 and missing score
+    df_historical_scores.loc[0, 'day0'] = 0
+    df_historical_scores.loc[13, 'day0'] = 29
+    df_historical_scores.loc[5, 'ml'] = 0
+    df_historical_scores.loc[7, 'score'] = 0
+    df_historical_scores.loc[9, 'score'] = np.nan
+    input_path = tmp_path / 'historical_scores.xlsx'
+    df_historical_scores.to_excel(input_path, sheet_name='historical_scores', index=False)
+
+    df = transform_historical_scores_into_daily_data(input_path, 'historical_scores')
+
+    pd.testing.assert_frame_equal(df, reference_daily_data(input_path, 'historical_scores'), check_exact=True)
+    assert len(df) == (months[-1] + pd.offsets.MonthEnd() - months[0]).days + 1 - months[9].days_in_month
+    assert (df.loc[df['id'].dt.strftime('%Y-%m') == '2020-02', 'alk'] == 0).all()
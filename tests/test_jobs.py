@@ -0,0 +1,66 @@
+"""Status of failed jobs shows message of expected errors (JobError, e.g. invalid import file) and generic message
+of other errors (their text is only logged)."""
+import pandas as pd
+import pytest
+
+from benchmarks.synthetic import generate_history
+from mymonth import jobs
+from mymonth.jobs import JobError
+
+
+def import_file(app, client, path):
+    """Runs import of file at path (config IMPORT_EXCEL_PATH) and returns status of its job."""
+    app.config['IMPORT_EXCEL_PATH'] = str(path)
+    response = client.get('/import_from_excel', headers={'Accept': 'application/json'})
+    assert response.status_code == 202
+    jobs.wait(response.json['id'], timeout=60)
+    return client.get(response.json['status_url'], headers={'Accept': 'application/json'}).json
+
+
+def write_workbook(path, invalid_duration):
+    """Writes workbook of 1 year with invalid_duration in column ds of first day."""
+    df_days, df_monthlytargets, df_historical_scores = generate_history(1)
+    df_days.loc[0, 'ds'] = invalid_duration
+    with pd.ExcelWriter(path) as excel_writer:
+        df_days.to_excel(excel_writer, sheet_name='days', index=False)
+        df_monthlytargets.to_excel(excel_writer, sheet_name='monthly_targets', index=False)
+        df_historical_scores.to_excel(excel_writer, sheet_name='historical_scores', index=False)
+    return path
+
+
+@pytest.mark.parametrize('invalid_duration', ['h5', 90])
+def test_import_of_invalid_duration_shows_error(app, tmp_path, invalid_duration):
+    status = import_file(app, app.test_client(), write_workbook(tmp_path / 'import_me.xlsx', invalid_duration))
+
+    assert status['status'] == 'failed'
+    assert status['error'].startswith('Invalid excel file: Invalid duration strings')
+    assert repr(str(invalid_duration)) in status['error']
+
+
+def test_import_of_file_that_is_not_excel_shows_error(app, tmp_path):
+    path = tmp_path / 'import_me.xlsx'
+    path.write_text('id,ds\n')
+
+    status = import_file(app, app.test_client(), path)
+
+    assert status['status'] == 'failed'
+    assert status['error'].startswith('Invalid excel file: ')
+
+
+def test_text_of_unexpected_error_is_not_shown(app, tmp_path, caplog):
+    path = tmp_path / 'missing' / 'import_me.xlsx'
+
+    status = import_file(app, app.test_client(), path)
+
+    assert status['status'] == 'failed'
+    assert status['error'] == 'Job import failed because of internal error'
+    assert str(path) in caplog.text
+
+
+def test_job_error_is_shown(app):
+    def failing_job(job):
+        raise JobError('Nothing to import')
+
+    job = jobs.wait(jobs.submit('import', failing_job).id, timeout=60)
+
+    assert (job.status, job.error) == ('failed', 'Nothing to import')
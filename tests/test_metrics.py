@@ -0,0 +1,44 @@
+"""Histograms on /metrics count all requests (cumulative), quantiles describe only recent requests."""
+import re
+
+from mymonth import create_app, metrics
+from mymonth.metrics import RequestMetrics
+
+
+def series(text, name):
+    """Returns dict: labels -> value of series name in Prometheus text."""
+    return {labels: float(value) for labels, value in re.findall(rf'^{name}{{(.*)}} (\S+)$', text, re.MULTILINE)}
+
+
+def test_histogram_is_cumulative_beyond_window():
+    request_metrics = RequestMetrics(window=3)
+    for duration in [0.002, 0.02, 0.2, 2.0, 0.003]:
+        request_metrics.observe('home', duration, {'sql': duration / 2})
+
+    text = request_metrics.export()
+    buckets = series(text, 'mymonth_request_duration_seconds_bucket')
+    assert buckets['endpoint="home",le="0.0025"'] == 1
+    assert buckets['endpoint="home",le="0.005"'] == 2
+    assert buckets['endpoint="home",le="1.0"'] == 4
+    assert buckets['endpoint="home",le="+Inf"'] == 5
+    assert series(text, 'mymonth_request_duration_seconds_count') == {'endpoint="home"': 5}
+    assert series(text, 'mymonth_request_duration_seconds_sum')['endpoint="home"'] == 2.225
+    assert series(text, 'mymonth_request_phase_duration_seconds_count') == {'endpoint="home",phase="sql"': 5}
+    # Quantiles of last 3 requests (0.2, 2.0, 0.003)
+    assert series(text, 'mymonth_request_duration_recent_seconds') == {
+        'endpoint="home",quantile="0.5"': 0.2, 'endpoint="home",quantile="0.9"': 2.0,
+        'endpoint="home",quantile="0.99"': 2.0}
+    assert '# TYPE mymonth_request_duration_recent_seconds gauge' in text
+
+
+def test_requests_are_counted_on_metrics_endpoint():
+    app = create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite://', 'VERSIONS_PATH': None, 'TESTING': True,
+                      'METRICS_ENABLED': True, 'METRICS_WINDOW': 2})
+    client = app.test_client()
+    for _ in range(4):
+        client.get('/jobs/unknown')
+
+    text = client.get('/metrics').get_data(as_text=True)
+    assert series(text, 'mymonth_request_duration_seconds_count') == {'endpoint="main.job_status"': 4}
+    assert len(series(text, 'mymonth_request_duration_recent_seconds')) == 3
+    metrics.clear()
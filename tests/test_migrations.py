@@ -0,0 +1,64 @@
+"""Migration of single-user database (schema before users): tables get user_id of default user and primary key
+(user_id, id), values are kept."""
+from datetime import date, timedelta
+
+import pytest
+from sqlalchemy import create_engine, inspect
+
+from mymonth import create_app, db
+from mymonth.migrations import migrate_tables, set_initial_db
+from mymonth.models import Days, MonthlyTargets, Settings, DEFAULT_USER_ID
+
+# Tables of single-user database (durations stored as datetimes from 1970-01-01, like db.Interval on SQLite)
+SINGLE_USER_SCHEMA = [
+    'CREATE TABLE days (id DATE NOT NULL, ds DATETIME, dev DATETIME, pol DATETIME, ge DATETIME, crt DATETIME, '
+    'hs DATETIME, alk FLOAT, PRIMARY KEY (id))',
+    'CREATE TABLE settings (id INTEGER NOT NULL, current_month_date DATE, PRIMARY KEY (id))',
+    'CREATE TABLE monthly_targets (id DATE NOT NULL, ds DATETIME, dev DATETIME, pol DATETIME, ge DATETIME, '
+    'crt DATETIME, hs DATETIME, alk FLOAT, days0 INTEGER, PRIMARY KEY (id))',
+]
+SINGLE_USER_ROWS = [
+    "INSERT INTO days VALUES ('2021-03-01', '1970-01-01 02:30:00.000000', NULL, '1970-01-01 00:00:00.000000', "
+    "NULL, NULL, '1970-01-02 01:00:00.000000', 3.5)",
+    "INSERT INTO days VALUES ('2021-03-02', NULL, NULL, NULL, NULL, NULL, NULL, NULL)",
+    "INSERT INTO settings VALUES (1, '2021-03-15')",
+    "INSERT INTO settings VALUES (2, '2020-01-01')",
+    "INSERT INTO monthly_targets VALUES ('2021-03-01', '1970-01-01 20:00:00.000000', '1970-01-01 00:00:00.000000', "
+    "'1970-01-01 00:00:00.000000', '1970-01-01 00:00:00.000000', '1970-01-01 00:00:00.000000', "
+    "'1970-01-01 00:00:00.000000', 10.0, 5)",
+]
+
+
+@pytest.mark.parametrize('storage', ['datetime', 'seconds'])
+def test_single_user_database_is_partitioned_by_user(tmp_path, storage):
+    uri = f"sqlite:///{tmp_path / 'single_user.db'}"
+    engine = create_engine(uri)
+    with engine.begin() as connection:
+        for statement in SINGLE_USER_SCHEMA + SINGLE_USER_ROWS:
+            connection.execute(statement)
+    engine.dispose()
+
+    app = create_app({'SQLALCHEMY_DATABASE_URI': uri, 'VERSIONS_PATH': None, 'INTERVAL_STORAGE': storage})
+    with app.app_context():
+        set_initial_db()
+
+        inspector = inspect(db.engine)
+        for table in ['days', 'settings', 'monthly_targets']:
+            assert inspector.get_pk_constraint(table)['constrained_columns'] == ['user_id'] + \
+                (['id'] if table != 'settings' else [])
+        day = Days.query.get((DEFAULT_USER_ID, date(2021, 3, 1)))
+        assert (day.ds, day.dev, day.pol, day.hs, day.alk) == \
+            (timedelta(hours=2, minutes=30), None, timedelta(), timedelta(days=1, hours=1), 3.5)
+        empty_day = Days.query.get((DEFAULT_USER_ID, date(2021, 3, 2)))
+        assert (empty_day.ds, empty_day.alk) == (None, None)
+        # First row of settings is kept
+        assert [(settings.user_id, settings.current_month_date) for settings in Settings.query.all()] == \
+            [(DEFAULT_USER_ID, date(2021, 3, 15))]
+        targets = MonthlyTargets.query.get((DEFAULT_USER_ID, date(2021, 3, 1)))
+        assert (targets.ds, targets.alk, targets.days0) == (timedelta(hours=20), 10.0, 5)
+        assert {user_id for (user_id, ) in db.session.query(Days.user_id).distinct()} == {DEFAULT_USER_ID}
+
+        # Migrated database is not migrated again
+        assert migrate_tables() == []
+        db.session.remove()
+        db.get_engine(app).dispose()
@@ -0,0 +1,141 @@
+"""DataSet.create_month_summary compared with per-day loop that calculated month summary in routes.home."""
+from datetime import date, timedelta
+
+import pytest
+
+from mymonth import db, days_store
+from mymonth.datasets import DataSet
+from mymonth.daystore import CATEGORIES
+from mymonth.models import Days, MonthlyTargets, DEFAULT_USER_ID
+from mymonth.utils import UtilsDatetime, UtilsDataConversion
+
+
+def productive_hours_by_weekday(input_date):
+    """Default target hours: Saturday and Sunday 4 hrs, other weekdays 2 hrs."""
+    return timedelta(hours={0: 2, 1: 2, 2: 2, 3: 2, 4: 2, 5: 4, 6: 4}[input_date.weekday()])
+
+
+def day_of_month_for_avg_sja(month_start_date, month_end_date):
+    if month_start_date <= date.today() <= month_end_date:
+        return date.today().day
+    if date.today() > month_end_date:
+        return month_end_date.day
+    return month_start_date.day
+
+
+def reference_month_summary(month_date):
+    """Returns (rows, totals) calculated day by day from Days objects of a month."""
+    ref_date = UtilsDatetime(month_date)
+    days = Days.query.filter(Days.user_id == DEFAULT_USER_ID, Days.id >= ref_date.month_first_date,
+                             Days.id <= ref_date.month_last_date).order_by(Days.id).all()
+    totals = {col: timedelta() for col in CATEGORIES}
+    cum_target_hours = cum_target_hours_till_today = cum_productive = cum_negative = timedelta()
+    cum_alk = 0
+    cum_days0 = 0
+    rows = []
+    for i, day in enumerate(days, start=1):
+        target = productive_hours_by_weekday(day.id)
+        productive = timedelta()
+        for col in CATEGORIES:
+            value = getattr(day, col)
+            if value is not None:
+                totals[col] += value
+                productive += value
+        negative = timedelta()
+        if day.alk is not None:
+            negative = max(day.alk - 2.86, 0) * timedelta(minutes=20)
+            cum_alk += day.alk
+            if day.id <= date.today() and day.alk <= 0:
+                cum_days0 += 1
+        elif day.id <= date.today():
+            cum_days0 += 1
+        cum_target_hours += target
+        if day.id <= date.today():
+            cum_target_hours_till_today += target
+        cum_productive += productive
+        cum_negative += negative
+        rows.append({'id': day.id, 's_TargetHours': target, 's_TotalProductive': productive,
+                     's_TotalNegative': negative, 's_PercOfTarget': (productive - negative) / target,
+                     'cum_PercOfTarget': (cum_productive - cum_negative) / cum_target_hours,
+                     'cum_alk': (cum_alk / i) / 7.8 * 750,
+                     'style_today_tr_td': 'today_cell' if day.id == date.today() else ''})
+
+    day_of_month = day_of_month_for_avg_sja(ref_date.month_first_date, ref_date.month_last_date)
+    totals['targethours'] = cum_target_hours
+    totals['totalproductive'] = cum_productive
+    totals['totalnegative'] = cum_negative
+    totals['totalsja'] = round(cum_alk / day_of_month, 2)
+    totals['totalml'] = int(round(totals['totalsja'] / 7.8 * 750, 0))
+    totals['totaldays0'] = cum_days0
+    totals['targethours_tilltoday'] = cum_target_hours_till_today
+    targets = MonthlyTargets.query.get((DEFAULT_USER_ID, ref_date.month_first_date))
+    for col in CATEGORIES:
+        totals[f'{col}_tilltoday'] = getattr(targets, col) * (day_of_month / ref_date.month_last_date.day)
+        totals[f'{col}_backlog'] = UtilsDataConversion.string_from_timedelta_subtraction(
+            totals[col], totals[f'{col}_tilltoday'])
+    totals['total_tilltoday'] = timedelta(seconds=sum(totals[f'{col}_tilltoday'].total_seconds()
+                                                      for col in CATEGORIES))
+    totals['total_backlog'] = UtilsDataConversion.string_from_timedelta_subtraction(totals['totalproductive'],
+                                                                                   totals['total_tilltoday'])
+    return rows, totals
+
+
+def seed_month(month_first_date):
+    """Adds days of a month with all categories, empty categories, missing alk and dates without row, and targets
+    of the month."""
+    last_day = UtilsDatetime(month_first_date).month_last_date.day
+    for day_of_month in range(1, last_day + 1):
+        if day_of_month % 7 == 3:
+            # Date without row in table days
+            Days.query.filter_by(user_id=DEFAULT_USER_ID, id=month_first_date.replace(day=day_of_month)).delete()
+            continue
+        day = Days(user_id=DEFAULT_USER_ID, id=month_first_date.replace(day=day_of_month))
+        if day_of_month % 5:
+            for i, col in enumerate(CATEGORIES):
+                if (day_of_month + i) % 4:
+                    setattr(day, col, timedelta(minutes=17 * day_of_month + 11 * i))
+        if day_of_month % 6:
+            day.alk = [0.0, 1.5, 2.86, 3.17, 7.33][day_of_month % 5]
+        db.session.merge(day)
+    db.session.merge(MonthlyTargets(user_id=DEFAULT_USER_ID, id=month_first_date, ds=timedelta(hours=20),
+                                    dev=timedelta(hours=15, minutes=30), pol=timedelta(hours=7), ge=timedelta(),
+                                    crt=timedelta(hours=3), hs=timedelta(hours=40), alk=10.0, days0=5))
+    db.session.commit()
+    # Days are written without routes (columns of days_store are loaded again)
+    days_store.invalidate(DEFAULT_USER_ID)
+
+
+@pytest.mark.parametrize('month_first_date', [date(2021, 3, 1), date.today().replace(day=1)],
+                         ids=['past_month', 'current_month'])
+def test_month_summary_matches_per_day_loop(app, month_first_date):
+    seed_month(month_first_date)
+    expected_rows, expected_totals = reference_month_summary(month_first_date)
+
+    month_summary = DataSet(month_first_date).create_month_summary()
+
+    days = month_summary.days
+    assert [day.id for day in days] == [row['id'] for row in expected_rows]
+    for day, row in zip(days, expected_rows):
+        for name in ['s_TargetHours', 's_TotalProductive', 's_TotalNegative']:
+            assert getattr(day, name).to_pytimedelta() == row[name], (day.id, name)
+        for name in ['s_PercOfTarget', 'cum_PercOfTarget', 'cum_alk']:
+            assert getattr(day, name) == pytest.approx(row[name]), (day.id, name)
+        assert day.style_today_tr_td == row['style_today_tr_td']
+    for name, value in expected_totals.items():
+        assert getattr(month_summary.totals, name) == (pytest.approx(value) if isinstance(value, float) else value), name
+
+
+def test_month_summary_of_month_without_days(app):
+    month_first_date = date(2021, 3, 1)
+    seed_month(month_first_date)
+    Days.query.filter(Days.id.between(month_first_date, month_first_date + timedelta(days=30))).delete(
+        synchronize_session=False)
+    db.session.commit()
+    days_store.invalidate(DEFAULT_USER_ID)
+    expected_rows, expected_totals = reference_month_summary(month_first_date)
+
+    month_summary = DataSet(month_first_date).create_month_summary()
+
+    assert expected_rows == [] and month_summary.days == []
+    for name, value in expected_totals.items():
+        assert getattr(month_summary.totals, name) == value, name
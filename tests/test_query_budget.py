@@ -0,0 +1,33 @@
+"""Number of SQL statements of each route (see benchmarks.query_budget) on synthetic history."""
+from datetime import date
+
+import pytest
+
+from benchmarks.query_budget import BUDGETS
+from benchmarks.synthetic import write_workbook
+from mymonth import db, dashboard_cache, sql_profiler
+from mymonth.backup import import_data_from_excel
+from mymonth.models import Settings, DEFAULT_USER_ID
+
+
+@pytest.fixture(scope='module')
+def workbook(tmp_path_factory):
+    return write_workbook(str(tmp_path_factory.mktemp('history') / 'import_me.xlsx'), years=2)
+
+
+@pytest.mark.parametrize('route', list(BUDGETS))
+def test_route_within_query_budget(app, workbook, route):
+    import_data_from_excel(input_path=workbook)
+    Settings.query.get(DEFAULT_USER_ID).current_month_date = date.today()
+    db.session.commit()
+    client = app.test_client()
+    url = route.replace(' (cached)', '')
+    if url == route:
+        dashboard_cache.clear()
+    else:
+        client.get(url)
+
+    with sql_profiler.query_budget(BUDGETS[route], allow_repeated=False):
+        response = client.get(url)
+
+    assert response.status_code < 400
@@ -0,0 +1,69 @@
+"""Data of users are kept apart: jobs, dashboard cache, days_store and month_summary of one user are not visible
+to other users."""
+from datetime import date, timedelta
+
+import pytest
+
+from mymonth import create_app, db, days_store, jobs, users
+from mymonth.migrations import set_initial_db
+from mymonth.models import Days, MonthlySummary
+from mymonth.utils import UtilsDataConversion
+
+HEADER = 'X-User'
+
+
+@pytest.fixture
+def app(tmp_path):
+    """Application with users identified by header HEADER."""
+    app = create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite://', 'VERSIONS_PATH': None, 'TESTING': True,
+                      'WTF_CSRF_ENABLED': False, 'USER_HEADER': HEADER, 'JOBS_RESULTS_DIR': str(tmp_path / 'jobs')})
+    with app.app_context():
+        set_initial_db()
+        yield app
+        db.session.remove()
+        db.get_engine(app).dispose()
+
+
+def get(client, url, user, **kwargs):
+    return client.get(url, headers={HEADER: user, 'Accept': 'application/json'}, **kwargs)
+
+
+def test_job_of_other_user_is_not_found(app):
+    client = app.test_client()
+    response = get(client, '/export_to_excel', 'alice')
+    assert response.status_code == 202
+    job = jobs.wait(response.json['id'], timeout=60)
+    assert job.status == 'finished'
+
+    assert get(client, response.json['status_url'], 'alice').status_code == 200
+    assert get(client, f'/jobs/{job.id}/file', 'alice').status_code == 200
+    assert get(client, response.json['status_url'], 'bob').status_code == 404
+    assert get(client, f'/jobs/{job.id}/file', 'bob').status_code == 404
+
+
+def test_edit_of_day_is_visible_only_to_its_user(app):
+    client = app.test_client()
+    today = date.today().isoformat()
+    total_ds = UtilsDataConversion.string_from_timedelta(timedelta(hours=7, minutes=13), 'h mm',
+                                                         show_units_with_zero=True)
+    # Dashboards (and days_store columns) of both users are cached before edit
+    for user in ['alice', 'bob']:
+        assert total_ds not in get(client, '/', user).get_data(as_text=True)
+
+    response = client.post(f'/day/edit/{today}', headers={HEADER: 'alice'},
+                           data={'ds': '7h 13m', 'dev': '', 'pol': '', 'ge': '', 'crt': '', 'hs': '', 'alk': '',
+                                 'submit': 'Save'})
+    assert response.status_code == 302
+
+    assert total_ds in get(client, '/', 'alice').get_data(as_text=True)
+    assert total_ds not in get(client, '/', 'bob').get_data(as_text=True)
+
+    alice_id, bob_id = users.get_id('alice'), users.get_id('bob')
+    assert alice_id != bob_id
+    month_first_date = date.today().replace(day=1)
+    assert days_store.totals(alice_id, month_first_date, date.today())['ds'] == 7 * 3600 + 13 * 60
+    assert days_store.totals(bob_id, month_first_date, date.today())['ds'] == 0
+    assert Days.query.get((bob_id, date.today())).ds is None
+    summaries = {summary.user_id: summary for summary in MonthlySummary.query.filter_by(id=month_first_date)}
+    assert summaries[alice_id].productive_hrs == timedelta(hours=7, minutes=13)
+    assert bob_id not in summaries or not summaries[bob_id].productive_hrs